@@ -1,7 +1,8 @@
 import re
+import sys
 import pytest
 from functools import wraps
-from dogpile.cache import compat
+from yosai_dpcache.cache import compat
 import time
 
 
@@ -27,21 +28,21 @@ def assert_raises_message(except_cls, msg, callable_, *args, **kwargs):
     except except_cls as e:
         assert re.search(msg, str(e)), "%r !~ %s" % (msg, e)
 
-from dogpile.cache.compat import configparser, io  # noqa
+from yosai_dpcache.cache.compat import configparser, io  # noqa
 
 
 def winsleep():
     # sleep a for an amount of time
     # sufficient for windows time.time()
     # to change
-    if compat.win32:
+    if sys.platform.startswith('win'):
         time.sleep(.001)
 
 
 def requires_py3k(fn):
     @wraps(fn)
     def wrap(*arg, **kw):
-        if compat.py2k:
+        if not compat.py3k:
             pytest.skip("Python 3 required")
         return fn(*arg, **kw)
     return wrap
@@ -1,8 +1,13 @@
-from dogpile.cache.api import CacheBackend, NO_VALUE
-from dogpile.cache import register_backend, CacheRegion
-from dogpile.cache.region import _backend_loader
+from yosai_dpcache.cache.api import CacheBackend
+from yosai_dpcache.cache import (
+    register_backend,
+    CacheRegion,
+    SerializationProxy,
+)
+from yosai_dpcache.cache.region import _backend_loader
 from . import eq_, assert_raises_message
 import itertools
+import pickle
 import time
 import pytest
 from threading import Thread, Lock
@@ -11,13 +16,19 @@ import random
 import collections
 
 
+def _loads(value):
+    if value is None:
+        return None
+    return pickle.loads(value)
+
+
 class _GenericBackendFixture(object):
 
     @classmethod
     def setup_class(cls):
         try:
             backend_cls = _backend_loader.load(cls.backend)
-            backend = backend_cls(cls.config_args.get('arguments', {}))
+            backend = backend_cls(dict(cls.config_args.get('arguments', {})))
         except ImportError:
             pytest.skip("Backend %s not installed" % cls.backend)
         cls._check_backend_available(backend)
@@ -37,6 +48,9 @@ class _GenericBackendFixture(object):
     region_args = {}
     config_args = {}
 
+    # regions store values serialized, as a DPCacheHandler's do
+    wrap = [(SerializationProxy, pickle.dumps, _loads)]
+
     _region_inst = None
     _backend_inst = None
 
@@ -45,8 +59,11 @@ class _GenericBackendFixture(object):
     def _region(self, backend=None, region_args={}, config_args={}):
         _region_args = self.region_args.copy()
         _region_args.update(**region_args)
-        _config_args = self.config_args.copy()
+        _config_args = {'expiration_time': 60, 'wrap': self.wrap}
+        _config_args.update(self.config_args)
         _config_args.update(config_args)
+        # backends pop their arguments
+        _config_args['arguments'] = dict(_config_args.get('arguments', {}))
 
         def _store_keys(key):
             if existing_key_mangler:
@@ -54,17 +71,18 @@ class _GenericBackendFixture(object):
             self._keys.add(key)
             return key
         self._region_inst = reg = CacheRegion(**_region_args)
-
-        existing_key_mangler = self._region_inst.key_mangler
-        self._region_inst.key_mangler = _store_keys
-
         reg.configure(backend or self.backend, **_config_args)
+
+        # configure() installs the backend's key mangler
+        existing_key_mangler = reg.key_mangler
+        reg.key_mangler = _store_keys
         return reg
 
     def _backend(self):
         backend_cls = _backend_loader.load(self.backend)
         _config_args = self.config_args.copy()
-        self._backend_inst = backend_cls(_config_args.get('arguments', {}))
+        self._backend_inst = backend_cls(
+            dict(_config_args.get('arguments', {})))
         return self._backend_inst
 
 
@@ -72,7 +90,7 @@ class _GenericBackendTest(_GenericBackendFixture, TestCase):
 
     def test_backend_get_nothing(self):
         backend = self._backend()
-        eq_(backend.get("some_key"), NO_VALUE)
+        eq_(backend.get("some_key"), None)
 
     def test_backend_delete_nothing(self):
         backend = self._backend()
@@ -80,14 +98,14 @@ class _GenericBackendTest(_GenericBackendFixture, TestCase):
 
     def test_backend_set_get_value(self):
         backend = self._backend()
-        backend.set("some_key", "some value")
-        eq_(backend.get("some_key"), "some value")
+        backend.set("some_key", b"some value", 60)
+        eq_(backend.get("some_key"), b"some value")
 
     def test_backend_delete(self):
         backend = self._backend()
-        backend.set("some_key", "some value")
+        backend.set("some_key", b"some value", 60)
         backend.delete("some_key")
-        eq_(backend.get("some_key"), NO_VALUE)
+        eq_(backend.get("some_key"), None)
 
     def test_region_set_get_value(self):
         reg = self._region()
@@ -112,7 +130,8 @@ class _GenericBackendTest(_GenericBackendFixture, TestCase):
 
     def test_region_set_zero_multiple_values_w_decorator(self):
         reg = self._region()
-        values = reg.get_or_create_multi([], lambda: 0)
+        values = reg.get_or_create_multi([], lambda creator, keys: 0,
+                                         None, None)
         eq_(values, [])
 
     def test_region_get_multiple_values(self):
@@ -137,8 +156,8 @@ class _GenericBackendTest(_GenericBackendFixture, TestCase):
             ['key1', 'key2', 'key3', 'key4', 'key5', 'key6'])
         eq_(
             reg_values,
-            ["value1", NO_VALUE, "value3", NO_VALUE,
-                "value5", NO_VALUE
+            ["value1", None, "value3", None,
+                "value5", None
              ]
         )
 
@@ -153,31 +172,32 @@ class _GenericBackendTest(_GenericBackendFixture, TestCase):
         reg.set_multi(values)
         reg.delete_multi(['key2', 'key10'])
         eq_(values['key1'], reg.get('key1'))
-        eq_(NO_VALUE, reg.get('key2'))
+        eq_(None, reg.get('key2'))
         eq_(values['key3'], reg.get('key3'))
-        eq_(NO_VALUE, reg.get('key10'))
+        eq_(None, reg.get('key10'))
 
     def test_region_set_get_nothing(self):
         reg = self._region()
         reg.delete_multi(["some key"])
-        eq_(reg.get("some key"), NO_VALUE)
+        eq_(reg.get("some key"), None)
 
     def test_region_creator(self):
         reg = self._region()
 
-        def creator():
+        def creator_func(creator):
             return "some value"
-        eq_(reg.get_or_create("some key", creator), "some value")
+        eq_(reg.get_or_create("some key", creator_func, None, None),
+            "some value")
 
     def test_threaded_dogpile(self):
         # run a basic dogpile concurrency test.
         # note the concurrency of dogpile itself
         # is intensively tested as part of dogpile.
-        reg = self._region(config_args={"expiration_time": .25})
+        reg = self._region(config_args={"expiration_time": 1})
         lock = Lock()
         canary = []
 
-        def creator():
+        def creator_func(creator):
             ack = lock.acquire(False)
             canary.append(ack)
             time.sleep(.25)
@@ -187,7 +207,7 @@ class _GenericBackendTest(_GenericBackendFixture, TestCase):
 
         def f():
             for x in range(5):
-                reg.get_or_create("some key", creator)
+                reg.get_or_create("some key", creator_func, None, None)
                 time.sleep(.5)
 
         threads = [Thread(target=f) for i in range(10)]
@@ -196,18 +216,18 @@ class _GenericBackendTest(_GenericBackendFixture, TestCase):
         for t in threads:
             t.join()
         assert len(canary) > 2
-        if not reg.backend.has_lock_timeout():
+        if not reg.actual_backend.has_lock_timeout():
             assert False not in canary
         else:
             assert False in canary
 
     def test_threaded_get_multi(self):
-        reg = self._region(config_args={"expiration_time": .25})
+        reg = self._region(config_args={"expiration_time": 1})
         locks = dict((str(i), Lock()) for i in range(11))
 
         canary = collections.defaultdict(list)
 
-        def creator(*keys):
+        def creator_func(creator, keys):
             assert keys
             ack = [locks[key].acquire(False) for key in keys]
 
@@ -232,7 +252,7 @@ class _GenericBackendTest(_GenericBackendFixture, TestCase):
                 reg.get_or_create_multi(
                     [str(random.randint(1, 10))
                         for i in range(random.randint(1, 5))],
-                    creator)
+                    creator_func, None, None)
                 time.sleep(.5)
         f()
         return
@@ -251,55 +271,32 @@ class _GenericBackendTest(_GenericBackendFixture, TestCase):
         reg.set("some key", "some value")
         reg.delete("some key")
         reg.delete("some key")
-        eq_(reg.get("some key"), NO_VALUE)
+        eq_(reg.get("some key"), None)
 
     def test_region_expire(self):
-        reg = self._region(config_args={"expiration_time": .25})
+        reg = self._region(config_args={"expiration_time": 1})
         counter = itertools.count(1)
 
-        def creator():
+        def creator_func(creator):
             return "some value %d" % next(counter)
-        eq_(reg.get_or_create("some key", creator), "some value 1")
-        time.sleep(.4)
-        eq_(reg.get("some key", ignore_expiration=True), "some value 1")
-        eq_(reg.get_or_create("some key", creator), "some value 2")
+        eq_(reg.get_or_create("some key", creator_func, None, None),
+            "some value 1")
+        time.sleep(1.2)
+        eq_(reg.get("some key"), None)
+        eq_(reg.get_or_create("some key", creator_func, None, None),
+            "some value 2")
         eq_(reg.get("some key"), "some value 2")
 
-    def test_decorated_fn_functionality(self):
-        # test for any quirks in the fn decoration that interact
-        # with the backend.
-
-        reg = self._region()
-
-        counter = itertools.count(1)
-
-        @reg.cache_on_arguments()
-        def my_function(x, y):
-            return next(counter) + x + y
-
-        # Start with a clean slate
-        my_function.invalidate(3, 4)
-        my_function.invalidate(5, 6)
-        my_function.invalidate(4, 3)
-
-        eq_(my_function(3, 4), 8)
-        eq_(my_function(5, 6), 13)
-        eq_(my_function(3, 4), 8)
-        eq_(my_function(4, 3), 10)
-
-        my_function.invalidate(4, 3)
-        eq_(my_function(4, 3), 11)
-
     def test_exploding_value_fn(self):
         reg = self._region()
 
-        def boom():
+        def boom(creator):
             raise Exception("boom")
 
         assert_raises_message(
             Exception,
             "boom",
-            reg.get_or_create, "some_key", boom
+            reg.get_or_create, "some_key", boom, None, None
         )
 
 
@@ -365,18 +362,18 @@ class _GenericMutexTest(_GenericBackendFixture, TestCase):
     def test_reentrant_dogpile(self):
         reg = self._region()
 
-        def create_foo():
-            return "foo" + reg.get_or_create("bar", create_bar)
+        def create_foo(creator):
+            return "foo" + reg.get_or_create("bar", create_bar, None, None)
 
-        def create_bar():
+        def create_bar(creator):
             return "bar"
 
         eq_(
-            reg.get_or_create("foo", create_foo),
+            reg.get_or_create("foo", create_foo, None, None),
             "foobar"
         )
         eq_(
-            reg.get_or_create("foo", create_foo),
+            reg.get_or_create("foo", create_foo, None, None),
             "foobar"
         )
 
@@ -403,22 +400,19 @@ class MockBackend(CacheBackend):
         return MockMutex(key)
 
     def get(self, key):
-        try:
-            return self._cache[key]
-        except KeyError:
-            return NO_VALUE
+        return self._cache.get(key)
 
     def get_multi(self, keys):
         return [
             self.get(key) for key in keys
         ]
 
-    def set(self, key, value):
+    def set(self, key, value, expiration):
         self._cache[key] = value
 
-    def set_multi(self, mapping):
+    def set_multi(self, mapping, expiration):
         for key, value in mapping.items():
-            self.set(key, value)
+            self.set(key, value, expiration)
 
     def delete(self, key):
         self._cache.pop(key, None)
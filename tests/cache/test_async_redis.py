@@ -0,0 +1,177 @@
+from unittest import TestCase
+from . import eq_
+import asyncio
+import pickle
+import pytest
+
+aioredis = pytest.importorskip("redis.asyncio")
+
+from yosai_dpcache.cache import (  # noqa
+    make_async_region,
+    AsyncDPCacheHandler,
+    AsyncSerializationProxy,
+)
+
+arguments = {'host': '127.0.0.1', 'port': 6379, 'db': 0}
+
+
+def _loads(value):
+    if value is None:
+        return None
+    return pickle.loads(value)
+
+
+class SerializationManager(object):
+
+    def serialize(self, value):
+        return pickle.dumps(value)
+
+    def deserialize(self, value):
+        return _loads(value)
+
+
+class _AsyncRedisTest(TestCase):
+
+    def setUp(self):
+        async def ping():
+            client = aioredis.StrictRedis(**arguments)
+            try:
+                await client.ping()
+            finally:
+                await client.aclose()
+        try:
+            asyncio.run(ping())
+        except Exception:
+            pytest.skip("redis is not running or "
+                        "otherwise not functioning correctly")
+
+    def _gather(self, count, fn):
+        async def gather():
+            try:
+                return await asyncio.gather(*[fn() for i in range(count)])
+            finally:
+                await self._cleanup()
+        return asyncio.run(gather())
+
+
+class AsyncRedisRegionTest(_AsyncRedisTest):
+
+    def _region(self, **config_args):
+        return make_async_region().configure(
+            'yosai_dpcache.redis_async', expiration_time=60,
+            arguments=dict(arguments),
+            wrap=[(AsyncSerializationProxy, pickle.dumps, _loads)],
+            **config_args)
+
+    async def _cleanup(self):
+        await self.region.delete_pattern("async_test:*")
+        await self.region.actual_backend.client.aclose()
+
+    def test_get_or_create(self):
+        self.region = self._region()
+        calls = []
+
+        async def creator_func(creator):
+            calls.append(creator)
+            await asyncio.sleep(.1)
+            return "value"
+
+        results = self._gather(5, lambda: self.region.get_or_create(
+            "async_test:key", creator_func, "creator", 60))
+        eq_(results, ["value"] * 5)
+        eq_(calls, ["creator"])
+
+    def test_get_or_create_multi(self):
+        self.region = self._region()
+        calls = []
+
+        def creator_func(creator, missing):
+            calls.append(missing)
+            return [key.upper() for key in missing]
+
+        async def run():
+            await self.region.set("async_test:a", "cached")
+            return await self.region.get_or_create_multi(
+                ["async_test:b", "async_test:a", "async_test:c"],
+                creator_func, None, 60)
+
+        eq_(self._gather(1, run),
+            [["ASYNC_TEST:B", "cached", "ASYNC_TEST:C"]])
+        eq_(calls, [["async_test:b", "async_test:c"]])
+
+    def test_get_or_create_multi_concurrent(self):
+        self.region = self._region()
+        calls = []
+
+        async def creator_func(creator, missing):
+            calls.append(missing)
+            await asyncio.sleep(.1)
+            return [key.upper() for key in missing]
+
+        results = self._gather(5, lambda: self.region.get_or_create_multi(
+            ["async_test:b", "async_test:a"], creator_func, None, 60))
+        eq_(results, [["ASYNC_TEST:B", "ASYNC_TEST:A"]] * 5)
+        eq_(calls, [["async_test:a", "async_test:b"]])
+
+
+class AsyncDPCacheHandlerTest(_AsyncRedisTest):
+
+    def _handler(self):
+        return AsyncDPCacheHandler(
+            ttl={'absolute_ttl': 60}, region_name='yosai_dpcache',
+            backend='yosai_dpcache.redis', region_arguments=dict(arguments),
+            serialization_manager=SerializationManager())
+
+    async def _cleanup(self):
+        await self.handler.delete_pattern("yosai:*:async_test")
+        await self.handler.cache_region.actual_backend.client.aclose()
+
+    def test_backend_is_async(self):
+        self.handler = self._handler()
+        eq_(self.handler.backend, 'yosai_dpcache.redis_async')
+
+    def test_get_or_create(self):
+        self.handler = self._handler()
+        calls = []
+
+        async def creator_func(creator):
+            calls.append(creator)
+            await asyncio.sleep(.1)
+            return "secret"
+
+        async def run():
+            value = await self.handler.get_or_create(
+                'async_test', 'alice', creator_func, 'alice')
+            return value, await self.handler.get('async_test', 'alice')
+
+        eq_(self._gather(5, run), [("secret", "secret")] * 5)
+        eq_(calls, ['alice'])
+
+    def test_set_many_get_many_delete(self):
+        self.handler = self._handler()
+
+        async def run():
+            await self.handler.set_many('async_test', ['alice', 'bob'],
+                                        ['secret', 'hunter2'])
+            values = await self.handler.get_many(
+                'async_test', ['alice', None, 'bob', 'carol'])
+            await self.handler.invalidate_domain('async_test', 'alice')
+            return values, await self.handler.get_many('async_test',
+                                                       ['alice', 'bob'])
+
+        eq_(self._gather(1, run),
+            [(['secret', None, 'hunter2', None], [None, 'hunter2'])])
+
+    def test_get_or_create_many(self):
+        self.handler = self._handler()
+        calls = []
+
+        async def creator_func(creator, missing):
+            calls.append(missing)
+            await asyncio.sleep(.1)
+            return [identifier.upper() for identifier in missing]
+
+        results = self._gather(5, lambda: self.handler.get_or_create_many(
+            'async_test', ['bob', 'alice'], creator_func, None))
+        eq_(results, [['BOB', 'ALICE']] * 5)
+        eq_(calls, [['alice', 'bob']])
@@ -0,0 +1,141 @@
+from unittest import TestCase
+from yosai_dpcache.cache import (
+    make_region,
+    BloomFilter,
+    RedisBloomFilter,
+    BloomFilterProxy,
+)
+from yosai_dpcache.cache.api import NEGATIVE_VALUE
+from . import eq_
+import pytest
+
+
+class BloomFilterTest(TestCase):
+
+    def test_no_false_negatives(self):
+        bloom = BloomFilter(capacity=1000, error_rate=0.01)
+        bloom.add_many("key%d" % i for i in range(1000))
+        eq_(all("key%d" % i in bloom for i in range(1000)), True)
+
+    def test_false_positive_rate(self):
+        bloom = BloomFilter(capacity=1000, error_rate=0.01)
+        bloom.add_many("key%d" % i for i in range(1000))
+        false_positives = sum("other%d" % i in bloom for i in range(10000))
+        assert false_positives < 300
+
+    def test_rebuild(self):
+        bloom = BloomFilter(capacity=100)
+        bloom.add("old")
+        bloom.rebuild(["new"])
+        eq_("old" in bloom, False)
+        eq_("new" in bloom, True)
+
+    def test_rebuild_keeps_keys_added_meanwhile(self):
+        bloom = BloomFilter(capacity=100)
+
+        def keys():
+            yield "scanned"
+            bloom.add("added")
+
+        bloom.rebuild(keys())
+        eq_("scanned" in bloom, True)
+        eq_("added" in bloom, True)
+
+
+class RedisBloomFilterTest(TestCase):
+    name = "yosai_dpcache:bloom:test"
+
+    def setUp(self):
+        redis = pytest.importorskip("redis")
+        self.client = redis.StrictRedis()
+        try:
+            self.client.delete(self.name)
+        except redis.exceptions.ConnectionError:
+            pytest.skip("redis is not running")
+
+    def tearDown(self):
+        self.client.delete(self.name)
+
+    def _filter(self):
+        return RedisBloomFilter(self.client, self.name, capacity=100,
+                                refresh_interval=60)
+
+    def test_lookups_read_a_copy(self):
+        ours, theirs = self._filter(), self._filter()
+        theirs.add("theirs")
+        ours.add("ours")
+        eq_(all(self.client.getbit(self.name, p)
+                for p in ours.positions("ours")), True)
+
+        calls = []
+        get = self.client.get
+        self.client.get = lambda name: calls.append(name) or get(name)
+        eq_("ours" in ours, True)
+        # not read again until the refresh interval passes
+        eq_("theirs" in ours, False)
+        eq_(calls, [])
+
+        ours.refresh()
+        eq_("theirs" in ours, True)
+
+    def test_rebuild(self):
+        bloom = self._filter()
+        bloom.add("old")
+        bloom.rebuild(["new"])
+        eq_("old" in bloom, True)
+        eq_("new" in bloom, True)
+
+
+class BloomFilterProxyTest(TestCase):
+
+    def _region(self):
+        return make_region().configure(
+            "yosai_dpcache.memory",
+            expiration_time=60,
+            wrap=[(BloomFilterProxy, None, "yosai:*:credentials")])
+
+    def test_absent_key_skips_backend(self):
+        reg = self._region()
+        reg.set("yosai:alice:credentials", "secret")
+        # written around the proxy, so the filter doesn't know of it
+        reg.backend.proxied.set("yosai:bob:credentials", "hidden", 60)
+
+        eq_(reg.get("yosai:alice:credentials"), "secret")
+        eq_(reg.get("yosai:bob:credentials"), None)
+
+        reg.backend.rebuild()
+        eq_(reg.get("yosai:bob:credentials"), "hidden")
+
+    def test_unfiltered_keys_pass_through(self):
+        reg = self._region()
+        reg.backend.proxied.set("yosai:alice:authz_info", "info", 60)
+        eq_(reg.get("yosai:alice:authz_info"), "info")
+
+    def test_key_added_before_write(self):
+        reg = self._region()
+        proxy = reg.backend
+        seen = []
+        proxied_set = proxy.proxied.set
+
+        def set_(key, value, expiration):
+            seen.append(key in proxy.bloom_filter)
+            proxied_set(key, value, expiration)
+        proxy.proxied.set = set_
+
+        reg.set("yosai:alice:credentials", "secret")
+        eq_(seen, [True])
+
+    def test_negative_values_not_added(self):
+        reg = self._region()
+
+        def creator_func(creator):
+            return None
+
+        eq_(reg.get_or_create("yosai:bob:credentials", creator_func, None,
+                              60, negative_expiration=5), NEGATIVE_VALUE)
+        reg.set_multi({"yosai:carol:credentials": NEGATIVE_VALUE,
+                       "yosai:dave:credentials": "secret"})
+        bloom = reg.backend.bloom_filter
+        eq_("yosai:bob:credentials" in bloom, False)
+        eq_("yosai:carol:credentials" in bloom, False)
+        eq_("yosai:dave:credentials" in bloom, True)
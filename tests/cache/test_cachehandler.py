@@ -0,0 +1,156 @@
+from unittest import TestCase
+from yosai_dpcache.cache import (
+    DPCacheHandler,
+    BloomFilterProxy,
+    NearCacheProxy,
+    ProxyBackend,
+    SerializationProxy,
+)
+from . import eq_
+from threading import Thread
+import pickle
+import time
+
+
+class SerializationManager(object):
+
+    def serialize(self, value):
+        return pickle.dumps(value)
+
+    def deserialize(self, value):
+        if value is None:
+            return None
+        return pickle.loads(value)
+
+
+class DPCacheHandlerTest(TestCase):
+
+    def _handler(self, **ttl):
+        ttl.setdefault('absolute_ttl', 60)
+        return DPCacheHandler(ttl=ttl, region_name='yosai_dpcache',
+                              backend='yosai_dpcache.memory',
+                              region_arguments={'max_size': 1000},
+                              serialization_manager=SerializationManager())
+
+    def _proxies(self, handler):
+        proxies, backend = [], handler.cache_region.backend
+        while isinstance(backend, ProxyBackend):
+            proxies.append(type(backend))
+            backend = backend.proxied
+        return proxies
+
+    def test_empty_options_enable_proxies(self):
+        handler = DPCacheHandler(ttl={}, region_name='yosai_dpcache',
+                                 backend='yosai_dpcache.memory',
+                                 region_arguments={},
+                                 serialization_manager=SerializationManager(),
+                                 bloom_filter={}, near_cache={})
+        eq_(self._proxies(handler),
+            [NearCacheProxy, BloomFilterProxy, SerializationProxy])
+        eq_(handler.absolute_ttl, 60)
+
+    def test_invalidate_domain_with_domain_generations(self):
+        handler = self._handler(generation_local_ttl=5)
+        handler.set('credentials', 'alice', 'secret')
+        handler.set('credentials', 'bob', 'hunter2')
+
+        handler.invalidate_domain('credentials', 'alice')
+        eq_(handler.get('credentials', 'alice'), None)
+        eq_(handler.get('credentials', 'bob'), 'hunter2')
+
+        handler.invalidate_domain('credentials')
+        eq_(handler.get('credentials', 'bob'), None)
+
+    def test_invalidate_domain_with_identifier_generations(self):
+        handler = self._handler(generation_local_ttl=5,
+                                identifier_generations=True)
+        handler.set('credentials', 'alice', 'secret')
+        handler.set('credentials', 'bob', 'hunter2')
+
+        handler.invalidate_domain('credentials', 'alice')
+        eq_(handler.get('credentials', 'alice'), None)
+        eq_(handler.get('credentials', 'bob'), 'hunter2')
+
+    def test_get_or_create_many_across_a_generation_bump(self):
+        handler = self._handler(generation_local_ttl=5)
+
+        def creator_func(creator, missing):
+            handler.invalidate_domain('credentials')
+            return [identifier.upper() for identifier in missing]
+
+        eq_(handler.get_or_create_many('credentials', ['alice', None, 'bob'],
+                                       creator_func, None),
+            ['ALICE', None, 'BOB'])
+
+    def test_set_many_get_many(self):
+        handler = self._handler()
+        handler.set_many('credentials', ['alice', 'bob'],
+                         ['secret', 'hunter2'])
+        eq_(handler.get_many('credentials', ['alice', None, 'bob', 'carol']),
+            ['secret', None, 'hunter2', None])
+
+        handler.set_many(['credentials', 'authz_info'], 'dave',
+                         ['password', 'roles'])
+        eq_(handler.get_many(['credentials', 'authz_info', 'session'],
+                             'dave'),
+            ['password', 'roles', None])
+
+    def test_delete_many(self):
+        handler = self._handler()
+        handler.set_many('credentials', ['alice', 'bob', 'carol'],
+                         ['secret', 'hunter2', 'letmein'])
+        handler.delete_many('credentials', ['alice', None, 'carol'])
+        eq_(handler.get_many('credentials', ['alice', 'bob', 'carol']),
+            [None, 'hunter2', None])
+
+    def test_get_or_create_many(self):
+        handler = self._handler()
+        handler.set('credentials', 'alice', 'secret')
+        calls = []
+
+        def creator_func(creator, missing):
+            calls.append(missing)
+            return [identifier.upper() for identifier in missing]
+
+        eq_(handler.get_or_create_many('credentials', ['alice', 'bob'],
+                                       creator_func, None),
+            ['secret', 'BOB'])
+        eq_(calls, [['bob']])
+        eq_(handler.get('credentials', 'bob'), 'BOB')
+
+    def test_get_or_create_many_threaded(self):
+        handler = self._handler()
+        calls = []
+
+        def creator_func(creator, missing):
+            calls.append(missing)
+            time.sleep(.1)
+            return [identifier.upper() for identifier in missing]
+
+        results = []
+
+        def f():
+            results.append(handler.get_or_create_many(
+                'credentials', ['bob', 'alice'], creator_func, None))
+
+        threads = [Thread(target=f) for i in range(5)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        eq_(results, [['BOB', 'ALICE']] * 5)
+        eq_(calls, [['alice', 'bob']])
+
+    def test_invalidate_identifier(self):
+        handler = self._handler()
+        domains = ['credentials', 'authz_info', 'session', 'other']
+        handler.set_many(domains, 'alice', ['secret', 'roles', 'id', 'x'])
+        handler.set_many(domains, 'bob', ['hunter2', 'roles', 'id', 'y'])
+
+        handler.invalidate_identifier('alice')
+        eq_(handler.get_many(domains, 'alice'), [None, None, None, 'x'])
+        eq_(handler.get_many(domains, 'bob'), ['hunter2', 'roles', 'id', 'y'])
+
+        handler.invalidate_identifier('alice', domains=['other'])
+        eq_(handler.get('other', 'alice'), None)
+        eq_(handler.get('other', 'bob'), 'y')
@@ -0,0 +1,88 @@
+from unittest import TestCase
+from threading import Thread
+import os
+import shutil
+import tempfile
+import pytest
+from . import eq_
+
+try:
+    import fcntl  # noqa
+    has_fcntl = True
+except ImportError:
+    has_fcntl = False
+
+from yosai_dpcache.cache.backends.file import FileLock, FileMutex, \
+    lock_filename
+
+
+@pytest.mark.skipif(not has_fcntl, reason="requires fcntl")
+class _FileLockTest(TestCase):
+
+    def setUp(self):
+        self.lock_dir = tempfile.mkdtemp()
+        self.filename = os.path.join(self.lock_dir, "test.lock")
+
+    def tearDown(self):
+        shutil.rmtree(self.lock_dir)
+
+    def _in_thread(self, fn):
+        result = []
+        t = Thread(target=lambda: result.append(fn()))
+        t.start()
+        t.join()
+        return result[0]
+
+
+class FileMutexTest(_FileLockTest):
+
+    def test_exclusive(self):
+        mutex = FileMutex(self.filename)
+        other = FileMutex(self.filename)
+        eq_(mutex.acquire(), True)
+        eq_(mutex.acquire(False), False)
+        eq_(other.acquire(False), False)
+        mutex.release()
+        eq_(other.acquire(False), True)
+        other.release()
+
+    def test_release_from_other_thread(self):
+        mutex = FileMutex(self.filename)
+        mutex.acquire()
+        self._in_thread(mutex.release)
+        eq_(FileMutex(self.filename).acquire(False), True)
+
+    def test_exclusive_across_processes(self):
+        mutex = FileMutex(self.filename)
+        mutex.acquire()
+        pid = os.fork()
+        if pid == 0:
+            os._exit(0 if FileMutex(self.filename).acquire(False) else 1)
+        _, status = os.waitpid(pid, 0)
+        mutex.release()
+        eq_(os.WEXITSTATUS(status), 1)
+
+    def test_lock_filename(self):
+        eq_(lock_filename(self.lock_dir, u"yosai:bob:credentials"),
+            lock_filename(self.lock_dir, b"yosai:bob:credentials"))
+        eq_(os.path.dirname(lock_filename(self.lock_dir, "a/b")),
+            self.lock_dir)
+
+
+class FileLockTest(_FileLockTest):
+
+    def test_shared_readers(self):
+        lock = FileLock(self.filename)
+        eq_(lock.acquire_read_lock(True), True)
+        eq_(self._in_thread(lambda: lock.acquire_read_lock(False)), True)
+        eq_(self._in_thread(lambda: lock.acquire_write_lock(False)), False)
+        lock.release_read_lock()
+
+    def test_exclusive_writer(self):
+        lock = FileLock(self.filename)
+        with lock.write():
+            eq_(lock.is_open, True)
+            eq_(self._in_thread(lambda: lock.acquire_read_lock(False)),
+                False)
+        eq_(lock.is_open, False)
+        eq_(self._in_thread(lambda: lock.acquire(False)), True)
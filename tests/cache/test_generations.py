@@ -0,0 +1,64 @@
+from unittest import TestCase
+from yosai_dpcache.cache import make_region
+from yosai_dpcache.cache.generations import KeyGenerations
+from . import eq_, assert_raises_message
+import time
+
+
+class KeyGenerationsTest(TestCase):
+
+    def setUp(self):
+        self.region = make_region().configure("yosai_dpcache.memory",
+                                              expiration_time=60)
+
+    def test_suffixes(self):
+        generations = KeyGenerations(self.region)
+        pairs = [('credentials', 'alice'), ('authz_info', 'alice')]
+        eq_(generations.suffixes(pairs), ['', ''])
+
+        eq_(generations.incr('credentials'), 1)
+        eq_(generations.incr('credentials'), 2)
+        eq_(generations.suffixes(pairs), [':g2', ''])
+
+    def test_identifier_suffixes(self):
+        generations = KeyGenerations(self.region, per_identifier=True)
+        pairs = [('credentials', 'alice'), ('credentials', 'bob')]
+        eq_(generations.incr('credentials', 'alice'), 1)
+        eq_(generations.suffixes(pairs), [':g0.1', ''])
+
+        generations.incr('credentials')
+        eq_(generations.suffixes(pairs), [':g1.1', ':g1.0'])
+
+    def test_identifier_requires_per_identifier(self):
+        generations = KeyGenerations(self.region)
+        assert_raises_message(
+            ValueError, "identifier generations require per_identifier=True",
+            generations.incr, 'credentials', 'alice')
+
+    def test_counters_fetched_at_once(self):
+        generations = KeyGenerations(self.region, per_identifier=True)
+        calls = []
+        get_counters = self.region.get_counters
+        self.region.get_counters = \
+            lambda keys: calls.append(keys) or get_counters(keys)
+
+        pairs = [('credentials', 'alice'), ('credentials', 'bob')]
+        generations.suffixes(pairs)
+        generations.suffixes(pairs)
+        eq_(calls, [['yosai:generation:credentials',
+                     'yosai:generation:credentials:alice',
+                     'yosai:generation:credentials:bob']])
+
+    def test_local_ttl(self):
+        generations = KeyGenerations(self.region, local_ttl=.2)
+        other_process = KeyGenerations(self.region, local_ttl=.2)
+        pairs = [('credentials', 'alice')]
+        eq_(generations.suffixes(pairs), [''])
+
+        # this process sees its own invalidation at once, and another
+        # process's once its cached counter expires
+        other_process.incr('credentials')
+        eq_(other_process.suffixes(pairs), [':g1'])
+        eq_(generations.suffixes(pairs), [''])
+        time.sleep(.3)
+        eq_(generations.suffixes(pairs), [':g1'])
@@ -0,0 +1,51 @@
+from unittest import TestCase
+from yosai_dpcache.cache.lease import LeaseTimes, LeaseWatchdog
+from . import eq_
+import time
+
+
+class Lock(object):
+
+    def __init__(self):
+        self.renewals = 0
+
+    def renew(self):
+        self.renewals += 1
+
+
+class LeaseWatchdogTest(TestCase):
+
+    def test_renews_until_unwatched(self):
+        watchdog = LeaseWatchdog()
+        lock, failing = Lock(), Lock()
+        failing.renew = lambda: 1 / 0
+        watchdog.watch(failing, .3)
+        watchdog.watch(lock, .3)
+
+        # renewed every third of its lease, whatever another lock raises
+        time.sleep(.35)
+        assert 2 <= lock.renewals <= 4
+        watchdog.unwatch(lock)
+        renewals = lock.renewals
+        time.sleep(.25)
+        eq_(lock.renewals, renewals)
+
+
+class LeaseTimesTest(TestCase):
+
+    def test_lease(self):
+        times = LeaseTimes(factor=2.0, decay=.5)
+        eq_(times.lease('yosai:alice:credentials', None), None)
+        eq_(times.lease('yosai:alice:credentials', 1), 1)
+
+        times.record('yosai:alice:credentials', 3)
+        # keys are grouped by domain
+        eq_(times.lease('yosai:bob:credentials', 1), 6)
+        eq_(times.lease('yosai:bob:credentials', 10), 10)
+        eq_(times.lease('yosai:bob:session', 1), 1)
+
+        # a faster creator lowers the lease as the record decays
+        times.record('yosai:bob:credentials', .1)
+        eq_(times.lease('yosai:alice:credentials', None), 3)
+        times.record('yosai:bob:credentials', .1)
+        eq_(times.lease('yosai:alice:credentials', None), 1.5)
@@ -1,9 +1,100 @@
-from ._fixtures import _GenericBackendTest
+from unittest import TestCase
+from yosai_dpcache.cache.region import _backend_loader
+from . import eq_, assert_raises_message
+from threading import Thread
+import time
 
 
-class MemoryBackendTest(_GenericBackendTest):
-    backend = "dogpile.cache.memory"
+class MemoryBackendTest(TestCase):
+    backend = "yosai_dpcache.memory"
 
+    def _backend(self, arguments={}):
+        backend_cls = _backend_loader.load(self.backend)
+        return backend_cls(dict(arguments))
 
-class MemoryPickleBackendTest(_GenericBackendTest):
-    backend = "dogpile.cache.memory_pickle"
+    def test_backend_get_nothing(self):
+        backend = self._backend()
+        eq_(backend.get("some_key"), None)
+
+    def test_backend_set_get_value(self):
+        backend = self._backend()
+        backend.set("some_key", "some value", 60)
+        eq_(backend.get("some_key"), "some value")
+
+    def test_backend_delete(self):
+        backend = self._backend()
+        backend.set("some_key", "some value", 60)
+        backend.delete("some_key")
+        backend.delete("some_key")
+        eq_(backend.get("some_key"), None)
+
+    def test_backend_expiration(self):
+        backend = self._backend()
+        backend.set("some_key", "some value", .1)
+        eq_(backend.get("some_key"), "some value")
+        time.sleep(.2)
+        eq_(backend.get("some_key"), None)
+
+    def test_backend_evicts_least_recently_used(self):
+        backend = self._backend({'max_size': 2, 'num_shards': 1})
+        backend.set("key1", "value1", 60)
+        backend.set("key2", "value2", 60)
+        backend.get("key1")
+        backend.set("key3", "value3", 60)
+        eq_(backend.get_multi(["key1", "key2", "key3"]),
+            ["value1", None, "value3"])
+
+    def test_backend_max_size_across_shards(self):
+        backend = self._backend({'max_size': 10, 'num_shards': 4})
+        for i in range(100):
+            backend.set("key%d" % i, i, 60)
+        eq_(len(backend.keys("*")), 10)
+
+    def test_backend_more_shards_than_entries(self):
+        assert_raises_message(ValueError, "may not exceed max_size",
+                              self._backend, {'max_size': 2, 'num_shards': 4})
+
+    def test_backend_counters_not_evicted(self):
+        backend = self._backend({'max_size': 2, 'num_shards': 1})
+        eq_(backend.incr("counter"), 1)
+        for i in range(5):
+            backend.set("key%d" % i, i, 60)
+        eq_(backend.get_counters(["counter"]), [1])
+        eq_(backend.incr("counter"), 2)
+
+    def test_backend_hmset_hmget(self):
+        backend = self._backend()
+        backend.hmset("some_hash", {"a": 1, "b": 2}, 60)
+        eq_(backend.hmget("some_hash", ["a", "c"]), [1, None])
+        assert backend.exists("some_hash")
+
+    def test_backend_hmget_exists(self):
+        backend = self._backend()
+        eq_(backend.hmget_exists("some_hash", ["a", "b"]),
+            (False, [None, None]))
+        backend.hmset("some_hash", {"a": 1}, 60)
+        eq_(backend.hmget_exists("some_hash", ["a", "b"]), (True, [1, None]))
+
+    def test_backend_keys(self):
+        backend = self._backend()
+        backend.set("yosai:thedude:credentials", "value1", 60)
+        backend.set("yosai:walter:credentials", "value2", 60)
+        backend.set("yosai:thedude:authz_info", "value3", 60)
+        eq_(sorted(backend.keys("yosai:thedude:*")),
+            ["yosai:thedude:authz_info", "yosai:thedude:credentials"])
+
+    def test_threaded_set_get(self):
+        backend = self._backend({'max_size': 100, 'num_shards': 4})
+
+        def f(n):
+            for x in range(500):
+                key = "key%d" % (x % 50)
+                backend.set(key, n, 60)
+                backend.get(key)
+
+        threads = [Thread(target=f, args=(i,)) for i in range(8)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        eq_(len(backend.keys("key*")), 50)
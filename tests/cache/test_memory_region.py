@@ -0,0 +1,201 @@
+from unittest import TestCase
+from yosai_dpcache.cache import make_region
+from yosai_dpcache.cache.api import NEGATIVE_VALUE
+from yosai_dpcache.cache.exception import BatchNotExecuted
+from . import eq_, assert_raises_message
+from threading import Thread
+from mock import patch
+import itertools
+import math
+import time
+
+
+class MemoryRegionTest(TestCase):
+    backend = "yosai_dpcache.memory"
+
+    def _region(self, arguments={}, region_args={}, **config_args):
+        return make_region(**region_args).configure(
+            self.backend, expiration_time=60, arguments=dict(arguments),
+            **config_args)
+
+    def _threaded(self, fn, count=5):
+        results = []
+        threads = [Thread(target=lambda: results.append(fn()))
+                   for i in range(count)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        return results
+
+    def test_region_multiple_values(self):
+        reg = self._region()
+        reg.set_multi({'key1': 'value1', 'key2': 'value2'})
+        reg.delete_multi(['key2'])
+        eq_(reg.get_multi(['key1', 'key2']), ['value1', None])
+
+    def test_delete_pattern(self):
+        reg = self._region()
+        reg.set_multi({"tenant1:a": 1, "tenant1:b": 2, "tenant2:a": 3})
+        eq_(sorted(reg.iter_keys("tenant1:*")), ["tenant1:a", "tenant1:b"])
+        eq_(reg.delete_pattern("tenant1:*"), 2)
+        eq_(reg.keys("*"), ["tenant2:a"])
+
+    def test_counters(self):
+        reg = self._region()
+        eq_(reg.get_counters(["c1", "c2"]), [0, 0])
+        eq_(reg.incr("c1"), 1)
+        eq_(reg.incr("c1"), 2)
+        eq_(reg.get_counters(["c1", "c2"]), [2, 0])
+
+    def test_negative_caching(self):
+        reg = self._region()
+        calls = []
+
+        def creator_func(creator):
+            calls.append(creator)
+
+        for _ in range(2):
+            eq_(reg.get_or_create("missing", creator_func, None, 60,
+                                  negative_expiration=5), NEGATIVE_VALUE)
+        eq_(len(calls), 1)
+        eq_(reg.get("missing"), NEGATIVE_VALUE)
+
+    def test_hmget_or_create(self):
+        reg = self._region()
+        calls, reads = [], []
+        hmget_exists = reg.backend.hmget_exists
+        reg.backend.hmget_exists = \
+            lambda *args: reads.append(args) or hmget_exists(*args)
+
+        def creator_func(creator):
+            calls.append(creator)
+            return {"a": 1}
+
+        eq_(reg.hmget_or_create("perms", ["a", "b"], creator_func, None, 60),
+            [1, None])
+        del reads[:]
+        # an existing hash is read in one call, its missing fields included
+        eq_(reg.hmget_or_create("perms", ["a", "b"], creator_func, None, 60),
+            [1, None])
+        eq_(len(reads), 1)
+        eq_(len(calls), 1)
+
+    def test_hmget_field_fill(self):
+        reg = self._region()
+        reg.backend.hmset("perms", {"a": 1}, 60)
+        calls = []
+
+        def field_creator_func(creator, missing):
+            calls.append(missing)
+            return dict((field, field.upper()) for field in missing)
+
+        eq_(reg.hmget_or_create("perms", ["a", "b"], None, None, 60,
+                                field_creator_func=field_creator_func),
+            [1, "B"])
+        eq_(calls, [["b"]])
+        eq_(reg.backend.hmget("perms", ["a", "b"]), [1, "B"])
+
+    def test_tracked_hash(self):
+        reg = self._region()
+        eq_(reg.get_hash("session"), None)
+        reg.set_hash("session", {"user": "u", "last_access": 1}, 60)
+
+        value = reg.get_hash("session")
+        eq_(value.dirty, False)
+        value["last_access"] = 2
+        del value["user"]
+        eq_(value.changes(), ({"last_access": 2}, ["user"]))
+
+        reg.backend.hmset("session", {"other": 3}, 60)
+        reg.set_hash("session", value, 60)
+        eq_(value.dirty, False)
+        eq_(reg.get_hash("session"), {"last_access": 2, "other": 3})
+
+    def test_batch(self):
+        reg = self._region()
+        reg.set("a", 1)
+        reg.backend.hmset("h", {"x": 2}, 60)
+
+        with reg.batch() as batch:
+            a = batch.get("a")
+            batch.set("b", 3)
+            b = batch.get("b")
+            batch.delete("a")
+            h = batch.hmget("h", ["x", "y"])
+            assert_raises_message(BatchNotExecuted, "hasn.t run", a.result)
+
+        eq_((a.result(), b.result(), h.result()), (1, 3, [2, None]))
+        eq_(reg.get("a"), None)
+
+    def test_region_creator(self):
+        reg = self._region()
+
+        def creator_func(creator):
+            return "some value"
+
+        eq_(reg.get_or_create("some key", creator_func, None, 60),
+            "some value")
+        eq_(reg.get("some key"), "some value")
+
+    def test_stale_value_served_while_regenerated(self):
+        reg = self._region(stale_grace_time=60)
+        counter = itertools.count(1)
+
+        def creator_func(creator):
+            time.sleep(.2)
+            return "value %d" % next(counter)
+
+        eq_(reg.get_or_create("key", creator_func, None, 1), "value 1")
+        time.sleep(1.1)
+
+        # one caller regenerates the value, the others don't wait for it
+        started = time.time()
+        results = self._threaded(
+            lambda: (reg.get_or_create("key", creator_func, None, 1),
+                     time.time() - started))
+        eq_(sorted(value for value, _ in results),
+            ["value 1"] * 4 + ["value 2"])
+        assert all(elapsed < .15 for value, elapsed in results
+                   if value == "value 1")
+        eq_(reg.get_or_create("key", creator_func, None, 1), "value 2")
+
+    def test_value_expires_after_stale_grace_time(self):
+        reg = self._region(stale_grace_time=1)
+        counter = itertools.count(1)
+
+        def creator_func(creator):
+            return "value %d" % next(counter)
+
+        eq_(reg.get_or_create("key", creator_func, None, 1), "value 1")
+        time.sleep(2.1)
+        eq_(reg.get("key"), None)
+        eq_(reg.get_or_create("key", creator_func, None, 1), "value 2")
+
+    def test_early_expiration(self):
+        reg = self._region(early_expiration_beta=1)
+        counter = itertools.count(1)
+        calls = []
+
+        def creator_func(creator):
+            calls.append(creator)
+            time.sleep(.2)
+            return "value %d" % next(counter)
+
+        eq_(reg.get_or_create("key", creator_func, None, 1), "value 1")
+
+        # a draw near 0 keeps the value until it expires
+        with patch("yosai_dpcache.cache.region.random.random",
+                   return_value=0):
+            eq_(reg.get_or_create("key", creator_func, None, 1), "value 1")
+        eq_(len(calls), 1)
+
+        # a draw near 1 moves the expiration ahead by beta * 10 times the
+        # creation time, so a single caller regenerates it early
+        with patch("yosai_dpcache.cache.region.random.random",
+                   return_value=1 - math.exp(-10)):
+            results = self._threaded(
+                lambda: reg.get_or_create("key", creator_func, None, 1))
+        eq_(sorted(results), ["value 1"] * 4 + ["value 2"])
+        eq_(len(calls), 2)
+        eq_(reg.get("key"), "value 2")
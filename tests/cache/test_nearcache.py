@@ -0,0 +1,128 @@
+from unittest import TestCase
+from yosai_dpcache.cache import (
+    make_region,
+    NearCacheProxy,
+    LocalInvalidationBus,
+    RedisInvalidationBus,
+)
+from yosai_dpcache.cache.backends.memory import MemoryBackend
+from . import eq_
+import pytest
+import time
+
+
+class NearCacheProxyTest(TestCase):
+
+    def _region(self):
+        return make_region().configure(
+            "yosai_dpcache.memory",
+            expiration_time=60,
+            wrap=[(NearCacheProxy, None, 100, 30)])
+
+    def _nodes(self, bus):
+        # two nodes' near caches in front of one shared backend
+        backend = MemoryBackend({})
+        return [NearCacheProxy(bus).wrap(backend) for i in range(2)]
+
+    def test_reads_are_served_locally(self):
+        reg = self._region()
+        reg.set("key", "value")
+        proxy = reg.backend
+        gets = []
+        get = proxy.proxied.get
+        proxy.proxied.get = lambda key: gets.append(key) or get(key)
+
+        eq_([reg.get("key") for i in range(3)], ["value"] * 3)
+        eq_(gets, [])
+        proxy.invalidate_local(["key"])
+        eq_([reg.get("key") for i in range(3)], ["value"] * 3)
+        eq_(gets, ["key"])
+
+    def test_local_ttl(self):
+        node, _ = self._nodes(LocalInvalidationBus())
+        node.local_ttl = .1
+        node.set("key", "value", 60)
+        node.proxied.set("key", "changed", 60)
+        eq_(node.get("key"), "value")
+        time.sleep(.2)
+        eq_(node.get("key"), "changed")
+
+    def test_cross_node_invalidation(self):
+        node1, node2 = self._nodes(LocalInvalidationBus())
+        node1.set("key1", "value1", 60)
+        node1.set("key2", "value2", 60)
+        eq_(node2.get_multi(["key1", "key2"]), ["value1", "value2"])
+
+        node1.set("key1", "changed", 60)
+        node1.delete("key2")
+        eq_(node2.get_multi(["key1", "key2"]), ["changed", None])
+
+        node2.set_multi({"key1": "again", "key2": "back"}, 60)
+        eq_(node1.get_multi(["key1", "key2"]), ["again", "back"])
+
+    def _race(self, reg, write):
+        # runs write while a read of the near cache's miss is in flight
+        proxy = reg.backend
+        get = proxy.proxied.get
+
+        def racing_get(key):
+            value = get(key)
+            write()
+            return value
+        proxy.proxied.get = racing_get
+        try:
+            return reg.get("key")
+        finally:
+            proxy.proxied.get = get
+
+    def test_read_racing_a_set(self):
+        reg = self._region()
+        reg.set("key", "old")
+        reg.backend.invalidate_local()
+
+        eq_(self._race(reg, lambda: reg.set("key", "new")), "old")
+        eq_(reg.get("key"), "new")
+
+    def test_read_racing_a_delete(self):
+        reg = self._region()
+        reg.set("key", "old")
+        reg.backend.invalidate_local()
+
+        eq_(self._race(reg, lambda: reg.delete("key")), "old")
+        eq_(reg.get("key"), None)
+
+
+class RedisInvalidationBusTest(TestCase):
+
+    def setUp(self):
+        redis = pytest.importorskip("redis")
+        self.client = redis.StrictRedis()
+        try:
+            self.client.ping()
+        except redis.exceptions.ConnectionError:
+            pytest.skip("redis is not running")
+        self.buses = []
+
+    def tearDown(self):
+        for bus in self.buses:
+            bus.close()
+
+    def _bus(self):
+        bus = RedisInvalidationBus(self.client,
+                                   channel="yosai_dpcache:invalidate:test")
+        self.buses.append(bus)
+        return bus
+
+    def test_cross_node_invalidation(self):
+        received = []
+        self._bus().subscribe(lambda keys, origin: received.append(
+            (keys, origin)))
+        # let the subscriber's thread subscribe before publishing
+        time.sleep(.2)
+        self._bus().publish(["key1", b"key2"], "node1")
+
+        for i in range(30):
+            if received:
+                break
+            time.sleep(.1)
+        eq_(received, [(["key1", "key2"], "node1")])
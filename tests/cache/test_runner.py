@@ -0,0 +1,92 @@
+from unittest import TestCase
+from yosai_dpcache.cache import make_region, ThreadPoolCreationRunner
+from . import eq_
+from threading import Event, Thread
+import itertools
+import time
+
+
+class Mutex(object):
+
+    def __init__(self):
+        self.released = Event()
+
+    def release(self):
+        self.released.set()
+
+
+class ThreadPoolCreationRunnerTest(TestCase):
+
+    def setUp(self):
+        self.runner = ThreadPoolCreationRunner(max_workers=1,
+                                               max_queue_size=1)
+
+    def tearDown(self):
+        self.runner.shutdown()
+
+    def test_runs_creator_and_releases_mutex(self):
+        calls, mutex = [], Mutex()
+        self.runner(None, "key", lambda: calls.append("key"), mutex)
+        assert mutex.released.wait(1)
+        eq_(calls, ["key"])
+
+    def test_drops_key_in_flight(self):
+        proceed = Event()
+        first, second = Mutex(), Mutex()
+        self.runner(None, "key", proceed.wait, first)
+        self.runner(None, "key", proceed.wait, second)
+        # the second request is dropped, releasing its mutex at once
+        assert second.released.is_set()
+        eq_(self.runner.in_flight, 1)
+        proceed.set()
+        assert first.released.wait(1)
+
+    def test_drops_beyond_max_queue_size(self):
+        proceed = Event()
+        mutexes = [Mutex() for i in range(3)]
+        for i, mutex in enumerate(mutexes):
+            self.runner(None, "key%d" % i, proceed.wait, mutex)
+        eq_([mutex.released.is_set() for mutex in mutexes],
+            [False, False, True])
+        proceed.set()
+        assert all(mutex.released.wait(1) for mutex in mutexes)
+        eq_(self.runner.in_flight, 0)
+
+    def test_failed_creator_releases_mutex(self):
+        mutex = Mutex()
+
+        def creator():
+            raise Exception("boom")
+
+        self.runner(None, "key", creator, mutex)
+        assert mutex.released.wait(1)
+        eq_(self.runner.in_flight, 0)
+
+    def test_region_regenerates_in_background(self):
+        reg = make_region(async_creation_runner=self.runner).configure(
+            "yosai_dpcache.memory", expiration_time=60, stale_grace_time=60)
+        counter = itertools.count(1)
+        calls = []
+
+        def creator_func(creator):
+            calls.append(creator)
+            time.sleep(.2)
+            return "value %d" % next(counter)
+
+        eq_(reg.get_or_create("key", creator_func, None, 1), "value 1")
+        time.sleep(1.1)
+
+        results = []
+        threads = [Thread(target=lambda: results.append(
+            reg.get_or_create("key", creator_func, None, 1)))
+            for i in range(5)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        # every caller is returned the stale value without waiting
+        eq_(results, ["value 1"] * 5)
+
+        time.sleep(.4)
+        eq_(reg.get("key"), "value 2")
+        eq_(len(calls), 2)
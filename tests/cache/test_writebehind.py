@@ -0,0 +1,88 @@
+from unittest import TestCase
+from yosai_dpcache.cache import make_region, WriteBehindProxy
+from . import eq_
+
+
+class WriteBehindProxyTest(TestCase):
+
+    def _region(self, flush_interval=60):
+        return make_region().configure(
+            "yosai_dpcache.memory",
+            expiration_time=60,
+            wrap=[(WriteBehindProxy, flush_interval)])
+
+    def test_read_your_writes(self):
+        reg = self._region()
+        reg.set("key", "value")
+        eq_(reg.backend.proxied.get("key"), None)
+        eq_(reg.get("key"), "value")
+        eq_(reg.get_multi(["key", "other"]), ["value", None])
+
+        reg.delete("key")
+        eq_(reg.get("key"), None)
+
+    def test_flush(self):
+        reg = self._region()
+        reg.set("key", "value")
+        reg.set_multi({"a": 1, "b": 2})
+        reg.backend.flush()
+        eq_(reg.backend.proxied.get_multi(["key", "a", "b"]),
+            ["value", 1, 2])
+
+    def test_coalesce(self):
+        reg = self._region()
+        writes = []
+        proxied = reg.backend.proxied
+        execute_batch = proxied.execute_batch
+
+        def record(ops):
+            writes.extend(ops)
+            return execute_batch(ops)
+        proxied.execute_batch = record
+
+        for value in range(10):
+            reg.set("key", value)
+        reg.backend.flush()
+        eq_(writes, [("set", ("key", 9, 60))])
+
+    def test_read_while_settling(self):
+        reg = self._region()
+        reg.set("key", "value")
+        seen = []
+        proxied = reg.backend.proxied
+        execute_batch = proxied.execute_batch
+
+        def record(ops):
+            # the write isn't in the backend yet, nor in the queue
+            seen.append(reg.get("key"))
+            return execute_batch(ops)
+        proxied.execute_batch = record
+
+        reg.backend._settle("key")
+        eq_(seen, ["value"])
+        eq_(proxied.get("key"), "value")
+
+    def test_background_flush(self):
+        reg = self._region(flush_interval=0.01)
+        reg.set("key", "value")
+        reg.backend.flush()
+        eq_(reg.backend._pending, {})
+        eq_(reg.backend.proxied.get("key"), "value")
+
+    def test_bounded_queue(self):
+        reg = make_region().configure(
+            "yosai_dpcache.memory",
+            expiration_time=60,
+            wrap=[(WriteBehindProxy, 60, 5)])
+        for i in range(20):
+            reg.set("key%d" % i, i)
+        assert len(reg.backend._pending) <= 5
+        reg.backend.flush()
+        eq_(reg.backend.proxied.get("key0"), 0)
+        eq_(reg.backend.proxied.get("key19"), 19)
+
+    def test_hash_operations_settle(self):
+        reg = self._region()
+        reg.delete("perms")
+        reg.backend.proxied.hmset("perms", {"a": 1}, 60)
+        eq_(reg.get_hash("perms"), None)
@@ -16,6 +16,43 @@ from .proxybackend import (
     SerializationProxy,
 )
 
+from .runner import (
+    ThreadPoolCreationRunner,
+)
+
+from .nearcache import (
+    NearCacheProxy,
+    LocalInvalidationBus,
+    RedisInvalidationBus,
+)
+
+from .bloom import (
+    BloomFilter,
+    RedisBloomFilter,
+    BloomFilterProxy,
+)
+
+from .writebehind import (
+    WriteBehindProxy,
+)
+
 from .cachehandler import (
     DPCacheHandler,
 )
+
+from .compat import py37
+
+if py37:
+    from .async_region import (
+        AsyncCacheRegion,
+        make_async_region,
+    )
+
+    from .async_proxy import (
+        AsyncProxyBackend,
+        AsyncSerializationProxy,
+    )
+
+    from .async_cachehandler import (
+        AsyncDPCacheHandler,
+    )
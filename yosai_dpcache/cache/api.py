@@ -1,3 +1,147 @@
+import operator
+
+
+class CachedValue(tuple):
+    """Represent a value stored in the cache along with its metadata.
+
+    :class:`.CachedValue` is a two-tuple of
+    ``(payload, metadata)``, where ``metadata``
+    is dogpile.cache's tracking information (such as the creation
+    time, ``ct``).  A :class:`.CacheRegion` stores a :class:`.CachedValue`
+    only when it needs that metadata, such as for soft expiration, and
+    returns just the payload to its callers.
+
+    """
+
+    payload = property(operator.itemgetter(0))
+    """Named accessor for the payload."""
+
+    metadata = property(operator.itemgetter(1))
+    """Named accessor for the dogpile.cache metadata dictionary."""
+
+    def __new__(cls, payload, metadata):
+        return tuple.__new__(cls, (payload, metadata))
+
+    def __reduce__(self):
+        return CachedValue, (self.payload, self.metadata)
+
+
+class NegativeValue(object):
+    """Describe a value that is known not to exist.
+
+    A :class:`.CacheRegion` caches the :data:`.NEGATIVE_VALUE` token when
+    a creator finds nothing to create, and returns it from a later
+    lookup of the same key as a hit, so that the source isn't consulted again
+    until the token expires.  It evaluates to False.
+
+    """
+
+    def __bool__(self):
+        return False
+
+    __nonzero__ = __bool__
+
+    def __repr__(self):
+        return "<yosai_dpcache.cache.api.NegativeValue object>"
+
+    def __reduce__(self):
+        return "NEGATIVE_VALUE"
+
+
+NEGATIVE_VALUE = NegativeValue()
+"""The token cached in place of a value that doesn't exist."""
+
+
+class TrackedHash(dict):
+    """A dict mirroring a hash stored in the cache, which records the fields
+    set or deleted since it was read, so that saving it writes only those
+    fields.
+
+    :meth:`.CacheRegion.get_hash` returns a :class:`.TrackedHash`, and
+    :meth:`.CacheRegion.set_hash` saves one.  Setting a field to None
+    deletes it, as a hash can't hold None.
+
+    """
+
+    def __init__(self, *args, **kw):
+        super(TrackedHash, self).__init__(*args, **kw)
+        self.loaded = False
+        self._changed = set()
+        self._deleted = set()
+
+    @classmethod
+    def from_cache(cls, mapping):
+        """Return a hash read from the cache, with no changes recorded."""
+        value = cls(mapping)
+        value.loaded = True
+        return value
+
+    def _change(self, field):
+        self._changed.add(field)
+        self._deleted.discard(field)
+
+    def _delete(self, field):
+        self._deleted.add(field)
+        self._changed.discard(field)
+
+    def __setitem__(self, field, value):
+        super(TrackedHash, self).__setitem__(field, value)
+        self._change(field)
+
+    def __delitem__(self, field):
+        super(TrackedHash, self).__delitem__(field)
+        self._delete(field)
+
+    def update(self, *args, **kw):
+        for field, value in dict(*args, **kw).items():
+            self[field] = value
+
+    def setdefault(self, field, default=None):
+        if field not in self:
+            self[field] = default
+        return self[field]
+
+    def pop(self, field, *default):
+        if field in self:
+            self._delete(field)
+        return super(TrackedHash, self).pop(field, *default)
+
+    def popitem(self):
+        field, value = super(TrackedHash, self).popitem()
+        self._delete(field)
+        return field, value
+
+    def clear(self):
+        self._deleted.update(self)
+        self._changed.clear()
+        super(TrackedHash, self).clear()
+
+    @property
+    def dirty(self):
+        return bool(self._changed or self._deleted)
+
+    def changes(self):
+        """
+        :returns: a (mapping, deleted) tuple of the fields set since the
+                  hash was read, with their values, and of the fields deleted
+        """
+        mapping = {}
+        deleted = set(self._deleted)
+        for field in self._changed:
+            value = self[field]
+            if value is None:
+                deleted.add(field)
+            else:
+                mapping[field] = value
+        return mapping, sorted(deleted)
+
+    def mark_clean(self):
+        """Record that the hash now matches the cache."""
+        self.loaded = True
+        self._changed.clear()
+        self._deleted.clear()
+
+
 class CacheBackend(object):
     """Base class for backend implementations."""
 
@@ -124,6 +268,19 @@ class CacheBackend(object):
         """
         raise NotImplementedError()
 
+    def execute_batch(self, ops):
+        """Run the operations queued by a :class:`.Batch`.
+
+        ``ops`` is a list of ``(method, args)`` tuples, in which method
+        names ``get``, ``set``, ``delete`` or ``hmget``, and the return
+        value is the list of their results, in order.
+
+        The default implementation calls each method in turn.  Backends
+        that can send the operations in a single round trip override it.
+
+        """
+        return [getattr(self, name)(*args) for name, args in ops]
+
     def delete(self, key):  # pragma NO COVERAGE
         """Delete a value from the cache.
 
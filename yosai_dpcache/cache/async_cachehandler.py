@@ -0,0 +1,236 @@
+"""
+Licensed to the Apache Software Foundation (ASF) under one
+or more contributor license agreements.  See the NOTICE file
+distributed with this work for additional information
+regarding copyright ownership.  The ASF licenses this file
+to you under the Apache License, Version 2.0 (the
+"License"); you may not use this file except in compliance
+with the License.  You may obtain a copy of the License at
+
+    http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing,
+software distributed under the License is distributed on an
+"AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+KIND, either express or implied.  See the License for the
+specific language governing permissions and limitations
+under the License.
+"""
+
+from .async_proxy import AsyncSerializationProxy
+from .async_region import make_async_region
+from .cachehandler import DPCacheHandler, positive
+
+# the asyncio counterpart of each synchronous backend
+ASYNC_BACKENDS = {'yosai_dpcache.redis': 'yosai_dpcache.redis_async'}
+
+
+class AsyncDPCacheHandler(DPCacheHandler):
+    """
+    An asyncio facade over DPCacheHandler, configured the same way, whose
+    cache operations are coroutines.  A synchronous backend named in the
+    settings, such as yosai_dpcache.redis, is replaced by its asyncio
+    counterpart.
+    """
+
+    region_factory = staticmethod(make_async_region)
+    serialization_proxy = AsyncSerializationProxy
+
+    def create_cache_region(self, name):
+        self.backend = ASYNC_BACKENDS.get(self.backend, self.backend)
+        return super(AsyncDPCacheHandler, self).create_cache_region(name)
+
+    def bloom_filter_proxy(self):
+        raise NotImplementedError('AsyncDPCacheHandler does not support '
+                                  'bloom filters')
+
+    def near_cache_proxy(self):
+        raise NotImplementedError('AsyncDPCacheHandler does not support '
+                                  'near caches')
+
+    def write_behind_proxy(self):
+        raise NotImplementedError('AsyncDPCacheHandler does not support '
+                                  'write-behind')
+
+    def create_generations(self):
+        # generation counters would need to be read from within generate_key
+        if self.generation_local_ttl is not None:
+            raise NotImplementedError('AsyncDPCacheHandler does not support '
+                                      'generation counters')
+        return None
+
+    async def invalidate_domain(self, domain, identifier=None):
+        """
+        See DPCacheHandler.invalidate_domain.  Without generation counters,
+        the domain's keys are removed with a delete_pattern.
+        """
+        if identifier is not None:
+            await self.delete(domain, identifier)
+        else:
+            await self.delete_pattern("yosai:*:{0}".format(domain))
+
+    async def get(self, domain, identifier):
+        if identifier is None:
+            return
+        full_key = self.generate_key(identifier, domain)
+        return positive(await self.cache_region.get(full_key))
+
+    async def get_or_create(self, domain, identifier, creator_func, creator):
+        """
+        See DPCacheHandler.get_or_create.  creator_func may be a coroutine
+        function.  Concurrent coroutines that request the same missing object
+        await a single call of creator_func.
+        """
+        if identifier is None:
+            return
+        full_key = self.generate_key(identifier, domain)
+        ttl = self.get_ttl(domain)
+        return positive(await self.cache_region.get_or_create(
+            key=full_key,
+            creator_func=creator_func,
+            creator=creator,
+            expiration=ttl,
+            negative_expiration=self.get_negative_ttl(domain)))
+
+    async def hmget_or_create(self, domain, identifier, keys, creator_func,
+                              creator, field_creator_func=None):
+        """
+        See DPCacheHandler.hmget_or_create.  creator_func and
+        field_creator_func may be coroutine functions.
+        """
+        if identifier is None:
+            return
+        full_key = self.generate_key(identifier, domain)
+        ttl = self.get_ttl(domain)
+        return await self.cache_region.hmget_or_create(
+            key=full_key,
+            keys=keys,
+            creator_func=creator_func,
+            creator=creator,
+            expiration=ttl,
+            field_creator_func=field_creator_func)
+
+    async def set(self, domain, identifier, value):
+        """
+        :param value:  the Serializable object to cache
+        """
+        if value is None:
+            return
+        full_key = self.generate_key(identifier, domain)
+        ttl = self.get_ttl(domain)
+        await self.cache_region.set(full_key, value, expiration=ttl)
+
+    async def get_hash(self, domain, identifier):
+        """
+        See DPCacheHandler.get_hash
+        """
+        if identifier is None:
+            return
+        full_key = self.generate_key(identifier, domain)
+        return await self.cache_region.get_hash(full_key)
+
+    async def set_hash(self, domain, identifier, value):
+        """
+        See DPCacheHandler.set_hash
+        """
+        if identifier is None or value is None:
+            return
+        full_key = self.generate_key(identifier, domain)
+        ttl = self.get_ttl(domain)
+        await self.cache_region.set_hash(full_key, value, expiration=ttl)
+
+    async def update_hash(self, domain, identifier, mapping, deleted=()):
+        """
+        See DPCacheHandler.update_hash
+        """
+        if identifier is None:
+            return False
+        full_key = self.generate_key(identifier, domain)
+        ttl = self.get_ttl(domain)
+        return await self.cache_region.hupdate(full_key, mapping, deleted,
+                                               expiration=ttl)
+
+    async def delete(self, domain, identifier):
+        """
+        Removes an object from cache
+        """
+        if identifier is None:
+            return
+        full_key = self.generate_key(identifier, domain)
+        await self.cache_region.delete(full_key)
+
+    async def get_many(self, domain, identifier):
+        """
+        See DPCacheHandler.get_many
+        """
+        batch = self.generate_keys(domain, identifier)
+        full_keys = [full_key for _, _, full_key in batch if full_key]
+        values = dict(zip(full_keys,
+                          await self.cache_region.get_multi(full_keys)))
+        return [positive(values.get(full_key)) for _, _, full_key in batch]
+
+    async def get_or_create_many(self, domain, identifier, creator_func,
+                                 creator):
+        """
+        See DPCacheHandler.get_or_create_many.  creator_func may be a
+        coroutine function.
+        """
+        keys, full_keys, batch_creator, ttl = self._get_or_create_many_args(
+            domain, identifier, creator_func)
+        values = dict(zip(full_keys,
+                          await self.cache_region.get_or_create_multi(
+                              keys=full_keys,
+                              creator_func=batch_creator,
+                              creator=creator,
+                              expiration=ttl)))
+
+        return [positive(values.get(full_key)) for full_key in keys]
+
+    async def set_many(self, domain, identifier, values):
+        """
+        See DPCacheHandler.set_many
+        """
+        mapping, ttl = self._set_many_args(domain, identifier, values)
+        await self.cache_region.set_multi(mapping, expiration=ttl)
+
+    async def delete_many(self, domain, identifier):
+        """
+        See DPCacheHandler.delete_many
+        """
+        full_keys = [full_key for _, _, full_key in
+                     self.generate_keys(domain, identifier) if full_key]
+        await self.cache_region.delete_multi(full_keys)
+
+    async def invalidate_identifier(self, identifier, domains=None):
+        """
+        See DPCacheHandler.invalidate_identifier
+        """
+        if identifier is None:
+            return
+        await self.delete_many(list(domains or self.identifier_domains),
+                               identifier)
+
+    async def keys(self, pattern):
+        """
+        obtains keys from cache that match pattern
+
+        CAUTION:  this walks the entire keyspace
+
+        :returns: list of bytestrings
+        """
+        return await self.cache_region.keys(pattern)
+
+    def iter_keys(self, pattern, count=None):
+        """
+        obtains keys from cache that match pattern, incrementally
+
+        :returns: an asynchronous iterator of bytestrings, for use with
+                  ``async for``
+        """
+        return self.cache_region.iter_keys(pattern, count)
+
+    async def delete_pattern(self, pattern, count=None):
+        """
+        See DPCacheHandler.delete_pattern
+        """
+        return await self.cache_region.delete_pattern(pattern, count)
@@ -0,0 +1,109 @@
+"""
+Async Proxy Backends
+--------------------
+
+Coroutine counterparts of :class:`.ProxyBackend` and
+:class:`.SerializationProxy`, for wrapping the backend of an
+:class:`.AsyncCacheRegion`.
+
+"""
+
+from .proxy import ProxyBackend
+from .proxybackend import SerializationProxy
+
+
+class AsyncProxyBackend(ProxyBackend):
+    """A :class:`.ProxyBackend` whose delegating methods are coroutines."""
+
+    async def get(self, key):
+        return await self.proxied.get(key)
+
+    async def set(self, key, value, expiration):
+        await self.proxied.set(key, value, expiration)
+
+    async def delete(self, key):
+        await self.proxied.delete(key)
+
+    async def get_multi(self, keys):
+        return await self.proxied.get_multi(keys)
+
+    async def set_multi(self, mapping, expiration):
+        await self.proxied.set_multi(mapping, expiration)
+
+    async def delete_multi(self, keys):
+        await self.proxied.delete_multi(keys)
+
+    async def keys(self, pattern):
+        return await self.proxied.keys(pattern)
+
+    def iter_keys(self, pattern, count=None):
+        return self.proxied.iter_keys(pattern, count)
+
+    async def delete_pattern(self, pattern, count=None):
+        return await self.proxied.delete_pattern(pattern, count)
+
+    async def incr(self, key):
+        return await self.proxied.incr(key)
+
+    async def get_counters(self, keys):
+        return await self.proxied.get_counters(keys)
+
+    async def hmget(self, name, keys):
+        return await self.proxied.hmget(name, keys)
+
+    async def hmset(self, name, mapping, expiration):
+        return await self.proxied.hmset(name, mapping, expiration)
+
+    async def hmget_exists(self, name, keys):
+        return await self.proxied.hmget_exists(name, keys)
+
+    async def hupdate(self, name, mapping, deleted=(), expiration=None):
+        return await self.proxied.hupdate(name, mapping, deleted, expiration)
+
+    async def hgetall(self, name):
+        return await self.proxied.hgetall(name)
+
+    async def exists(self, key):
+        return await self.proxied.exists(key)
+
+    async def execute_batch(self, ops):
+        return await self.proxied.execute_batch(ops)
+
+
+class AsyncSerializationProxy(AsyncProxyBackend):
+
+    def __init__(self, serialize, deserialize):
+        """
+        serialization and de-serialization functionality is injected
+        """
+        super(AsyncSerializationProxy, self).__init__()
+        self.serialize = serialize
+        self.deserialize = deserialize
+
+    dumps = SerializationProxy.dumps
+    loads = SerializationProxy.loads
+    _serialize_payload = SerializationProxy._serialize_payload
+    _deserialize_payload = SerializationProxy._deserialize_payload
+    _dumps_ops = SerializationProxy._dumps_ops
+    _loads_results = SerializationProxy._loads_results
+
+    async def get(self, key):
+        serialized = await self.proxied.get(key)
+        return self.loads(serialized)
+
+    async def set(self, key, value, expiration):
+        serialized = self.dumps(value)
+        await self.proxied.set(key, serialized, expiration)
+
+    async def get_multi(self, keys):
+        multi_serialized = await self.proxied.get_multi(keys)
+        return [self.loads(value) for value in multi_serialized]
+
+    async def set_multi(self, mapping, expiration):
+        serialized_mapping = {key: self.dumps(value) for key, value in
+                              mapping.items()}
+        await self.proxied.set_multi(serialized_mapping, expiration)
+
+    async def execute_batch(self, ops):
+        results = await self.proxied.execute_batch(self._dumps_ops(ops))
+        return self._loads_results(ops, results)
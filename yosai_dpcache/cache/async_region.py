@@ -0,0 +1,427 @@
+"""
+Async Region
+------------
+
+Provides :class:`.AsyncCacheRegion`, an asyncio front end to a backend whose
+data methods are coroutines, such as :class:`.AsyncRedisBackend`.
+
+"""
+
+import asyncio
+import time
+
+from yosai_dpcache.dogpile.core import NeedRegenerationException
+from yosai_dpcache.dogpile.core.async_lock import AsyncLock, AsyncMutex, \
+    await_creation, fail_creation
+from .api import NEGATIVE_VALUE, TrackedHash
+from .batch import AsyncBatch
+from .region import CacheRegion
+
+
+class AsyncCacheRegion(CacheRegion):
+    """An asyncio front end to a particular cache backend.
+
+    :class:`.AsyncCacheRegion` is configured exactly as a
+    :class:`.CacheRegion` is, but with a backend and proxies whose data
+    methods are coroutines::
+
+        region = make_async_region().configure(
+            'yosai_dpcache.redis_async',
+            expiration_time=3600,
+            arguments={'host': 'localhost'},
+            wrap=[(AsyncSerializationProxy, sm.serialize, sm.deserialize)]
+        )
+
+        value = await region.get_or_create(key, creator_func, creator, 60)
+
+    Its creator functions may be either plain functions or coroutine
+    functions.  Concurrent coroutines that miss the same key are coalesced:
+    one of them runs the creator while the others await its result.
+
+    ``async_creation_runner`` is not supported.
+
+    """
+
+    def _create_mutex(self, key):
+        return AsyncMutex(self.backend.get_mutex(key))
+
+    async def _create(self, creator_func, creator, *args):
+        created = creator_func(creator, *args)
+        if asyncio.iscoroutine(created):
+            created = await created
+        return created
+
+    async def get(self, key):
+        """
+        Return a value from the cache based on the given key, or ``None`` if
+        the value is not present.
+        """
+        if self.key_mangler:
+            key = self.key_mangler(key)
+        return self._unwrap(await self.backend.get(key))
+
+    async def get_multi(self, keys):
+        """
+        Return multiple values from the cache, based on the given keys, using
+        a single backend call.
+        """
+        if not keys:
+            return []
+
+        if self.key_mangler:
+            keys = list(map(lambda key: self.key_mangler(key), keys))
+
+        return [self._unwrap(value) for value in
+                await self.backend.get_multi(keys)]
+
+    async def get_or_create(self, key, creator_func, creator, expiration,
+                            negative_expiration=None):
+        """
+        Return a cached value based on the given key, creating and caching
+        it with ``creator_func(creator)`` if it is not available.
+
+        See :meth:`.CacheRegion.get_or_create`.
+        """
+        if self.key_mangler:
+            key = self.key_mangler(key)
+
+        exp = expiration if expiration else self.expiration_time
+        early = self._early_expiration()
+
+        async def get_value():
+            return self._value_and_created(await self.backend.get(key), early)
+
+        async def gen_value():
+            started = time.time()
+            created_value = await self._create(creator_func, creator)
+            createdtime = time.time()
+            if created_value is None and negative_expiration is not None:
+                await self.backend.set(
+                    key, self._value(NEGATIVE_VALUE, createdtime),
+                    negative_expiration)
+                return NEGATIVE_VALUE, createdtime
+
+            await self.backend.set(key,
+                                   self._value(created_value, createdtime,
+                                               createdtime - started),
+                                   self._backend_expiration(exp))
+            return created_value, createdtime
+
+        expiretime = exp if self._tracks_metadata else None
+        async with AsyncLock(self._mutex(key), gen_value, get_value,
+                             expiretime) as value:
+            return value
+
+    async def get_or_create_multi(self, keys, creator_func, creator,
+                                  expiration):
+        """
+        Return a sequence of cached values based on a sequence of keys,
+        calling ``creator_func(creator, missing_keys)`` once for the keys
+        that are missing.  Keys already being created by another coroutine
+        are awaited rather than created again.
+
+        See :meth:`.CacheRegion.get_or_create_multi`.
+        """
+        if not keys:
+            return []
+
+        sorted_unique_keys = sorted(set(keys))
+        if self.key_mangler:
+            mangled_keys = [self.key_mangler(k) for k in sorted_unique_keys]
+        else:
+            mangled_keys = sorted_unique_keys
+        orig_to_mangled = dict(zip(sorted_unique_keys, mangled_keys))
+
+        values = dict(zip(mangled_keys, map(
+            self._unwrap, await self.backend.get_multi(mangled_keys))))
+
+        pending = {}
+        owned = {}
+        for orig_key in sorted_unique_keys:
+            mangled = orig_to_mangled[orig_key]
+            if values[mangled] is not None:
+                continue
+            mutex = self._mutex(mangled)
+            if mutex.locked:
+                pending[orig_key] = mutex.future
+            else:
+                mutex.future = asyncio.get_event_loop().create_future()
+                owned[orig_key] = mutex
+
+        try:
+            if owned:
+                missing = sorted(owned)
+                created_values = await self._create(creator_func, creator,
+                                                    missing)
+                created = dict((orig_to_mangled[k], v) for k, v in
+                               zip(missing, created_values))
+                values.update(created)
+
+                cacheable = dict((k, self._value(v)) for k, v in
+                                 created.items() if v is not None)
+                if cacheable:
+                    exp = self._backend_expiration(expiration)
+                    if isinstance(exp, dict):
+                        exp = dict((orig_to_mangled[k], exp.get(k))
+                                   for k in missing)
+                    await self.backend.set_multi(cacheable, exp)
+
+                now = time.time()
+                for orig_key, mutex in owned.items():
+                    mutex.future.set_result(
+                        (values[orig_to_mangled[orig_key]], now))
+        except BaseException as exc:
+            for mutex in owned.values():
+                fail_creation(mutex.future, exc)
+            raise
+        finally:
+            for mutex in owned.values():
+                mutex.future = None
+
+        retry = []
+        for orig_key, future in pending.items():
+            created = await await_creation(future)
+            if created is None:
+                # its creator was cancelled
+                retry.append(orig_key)
+            else:
+                values[orig_to_mangled[orig_key]] = created[0]
+        if retry:
+            values.update(zip(
+                [orig_to_mangled[k] for k in retry],
+                await self.get_or_create_multi(retry, creator_func, creator,
+                                               expiration)))
+
+        return [values[orig_to_mangled[k]] for k in keys]
+
+    async def hmget_or_create(self, key, keys, creator_func, creator,
+                              expiration, field_creator_func=None):
+        """
+        Returns one or more cached values from a hash based on the given keys,
+        creating and caching the hash with ``creator_func(creator)`` if it
+        does not exist, and the requested fields missing from it with
+        ``field_creator_func(creator, missing_fields)``, when given.
+
+        See :meth:`.CacheRegion.hmget_or_create`.
+        """
+        if self.key_mangler:
+            key = self.key_mangler(key)
+
+        async def get_value():
+            exists, values = await self.backend.hmget_exists(key, keys)
+            if not exists:
+                raise NeedRegenerationException()
+            return values, time.time()
+
+        async def gen_value():
+            created_value = await self._create(creator_func, creator)
+            await self.backend.hmset(key, created_value, expiration)
+            return [created_value.get(k) for k in keys], time.time()
+
+        async with AsyncLock(self._mutex(key), gen_value, get_value) as value:
+            pass
+
+        if field_creator_func is None or None not in value:
+            return value
+        return await self._fill_fields(key, keys, value, field_creator_func,
+                                       creator)
+
+    async def _fill_fields(self, key, keys, values, field_creator_func,
+                           creator):
+        """Create the requested fields that are missing from the hash at
+        key, and add them to the hash.  Concurrent coroutines that miss the
+        same field await the coroutine creating it."""
+        found = dict(zip(keys, values))
+        missing = sorted(set(k for k, v in found.items() if v is None))
+
+        pending = {}
+        owned = {}
+        for field in missing:
+            mutex = self._mutex('{0}:{1}'.format(key, field))
+            if mutex.locked:
+                pending[field] = mutex.future
+            else:
+                mutex.future = asyncio.get_event_loop().create_future()
+                owned[field] = mutex
+
+        acquired = []
+        try:
+            for mutex in owned.values():
+                if mutex.distributed is not None:
+                    await mutex.distributed.acquire()
+                    acquired.append(mutex.distributed)
+
+            if owned:
+                # see whether other processes created some of the fields
+                fields = list(owned)
+                exists, refreshed = await self.backend.hmget_exists(key,
+                                                                    fields)
+                found.update(zip(fields, refreshed))
+                fields = [field for field in fields if found[field] is None]
+
+                if fields and exists:
+                    created = await self._create(field_creator_func, creator,
+                                                 fields) or {}
+                    created = dict((field, created[field]) for field in fields
+                                   if created.get(field) is not None)
+                    if created and await self.backend.hupdate(key, created):
+                        found.update(created)
+
+            now = time.time()
+            for field, mutex in owned.items():
+                mutex.future.set_result((found[field], now))
+        except BaseException as exc:
+            for mutex in owned.values():
+                fail_creation(mutex.future, exc)
+            raise
+        finally:
+            for distributed in acquired:
+                await distributed.release()
+            for mutex in owned.values():
+                mutex.future = None
+
+        retry = []
+        for field, future in pending.items():
+            created = await await_creation(future)
+            if created is None:
+                # its creator was cancelled
+                retry.append(field)
+            else:
+                found[field] = created[0]
+        if retry:
+            found.update(zip(retry, await self._fill_fields(
+                key, retry, [None] * len(retry), field_creator_func,
+                creator)))
+
+        return [found[k] for k in keys]
+
+    async def set(self, key, value, expiration=None):
+        """Place a new value in the cache under the given key."""
+
+        if self.key_mangler:
+            key = self.key_mangler(key)
+
+        await self.backend.set(key, self._value(value),
+                               self._backend_expiration(expiration))
+
+    async def set_multi(self, mapping, expiration=None):
+        """Place new values in the cache under the given keys, using a
+        single backend call."""
+        if not mapping:
+            return
+
+        exp = self._backend_expiration(expiration)
+        mapping = dict((k, self._value(v)) for k, v in mapping.items())
+
+        if self.key_mangler:
+            mapping = dict((self.key_mangler(k), v)
+                           for k, v in mapping.items())
+            if isinstance(exp, dict):
+                exp = dict((self.key_mangler(k), v) for k, v in exp.items())
+
+        await self.backend.set_multi(mapping, exp)
+
+    def batch(self):
+        """Return an :class:`.AsyncBatch`, used with ``async with``.  See
+        :meth:`.CacheRegion.batch`."""
+        return AsyncBatch(self)
+
+    async def get_hash(self, key):
+        """See :meth:`.CacheRegion.get_hash`."""
+
+        if self.key_mangler:
+            key = self.key_mangler(key)
+
+        value = await self.backend.hgetall(key)
+        return TrackedHash.from_cache(value) if value else None
+
+    async def set_hash(self, key, value, expiration=None):
+        """See :meth:`.CacheRegion.set_hash`."""
+
+        if self.key_mangler:
+            key = self.key_mangler(key)
+
+        exp = expiration if expiration else self.expiration_time
+        changes = self._hash_changes(value)
+        if changes is not None:
+            if not changes[0] and not changes[1]:
+                return
+            if await self.backend.hupdate(key, changes[0], changes[1], exp):
+                value.mark_clean()
+                return
+
+        fields = self._hash_fields(value)
+        if fields:
+            await self.backend.hmset(key, fields, exp)
+        else:
+            await self.backend.delete(key)
+        if isinstance(value, TrackedHash):
+            value.mark_clean()
+
+    async def hupdate(self, key, mapping, deleted=(), expiration=None):
+        """See :meth:`.CacheRegion.hupdate`."""
+
+        if self.key_mangler:
+            key = self.key_mangler(key)
+
+        return await self.backend.hupdate(
+            key, mapping, deleted,
+            expiration if expiration else self.expiration_time)
+
+    async def delete(self, key):
+        """Remove a value from the cache."""
+
+        if self.key_mangler:
+            key = self.key_mangler(key)
+
+        await self.backend.delete(key)
+
+    async def delete_multi(self, keys):
+        """Remove multiple values from the cache, using a single backend
+        call."""
+        if not keys:
+            return
+
+        if self.key_mangler:
+            keys = list(map(lambda key: self.key_mangler(key), keys))
+
+        await self.backend.delete_multi(keys)
+
+    async def keys(self, pattern):
+        return await self.backend.keys(pattern)
+
+    def iter_keys(self, pattern, count=None):
+        """
+        Returns an asynchronous iterator over the keys matching pattern, for
+        use with ``async for``.
+
+        See :meth:`.CacheRegion.iter_keys`.
+        """
+        return self.backend.iter_keys(pattern, count)
+
+    async def delete_pattern(self, pattern, count=None):
+        """See :meth:`.CacheRegion.delete_pattern`."""
+        return await self.backend.delete_pattern(pattern, count)
+
+    async def incr(self, key):
+        """See :meth:`.CacheRegion.incr`."""
+
+        if self.key_mangler:
+            key = self.key_mangler(key)
+
+        return await self.backend.incr(key)
+
+    async def get_counters(self, keys):
+        """See :meth:`.CacheRegion.get_counters`."""
+        if not keys:
+            return []
+
+        if self.key_mangler:
+            keys = list(map(lambda key: self.key_mangler(key), keys))
+
+        return await self.backend.get_counters(keys)
+
+
+def make_async_region(*arg, **kw):
+    """Instantiate a new :class:`.AsyncCacheRegion`."""
+    return AsyncCacheRegion(*arg, **kw)
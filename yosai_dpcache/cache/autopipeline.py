@@ -0,0 +1,129 @@
+"""
+Auto-Pipelining
+---------------
+
+Provides :class:`.AutoPipelineClient`, which sends the commands that
+threads issue to the same Redis concurrently as a single pipeline, over a
+single connection, instead of a round trip and a connection checkout each.
+
+"""
+
+import time
+
+from .compat import threading
+
+# the commands of the backends and proxies that are safely pipelined;  any
+# other attribute, such as pipeline(), lock() or register_script(), is that
+# of the wrapped client
+PIPELINED_COMMANDS = frozenset([
+    'get', 'mget', 'set', 'delete', 'unlink', 'exists', 'expire',
+    'hget', 'hmget', 'hset', 'hdel', 'hgetall', 'incr', 'getbit', 'setbit',
+])
+
+
+class _Command(object):
+
+    def __init__(self, name, args, kwargs):
+        self.name = name
+        self.args = args
+        self.kwargs = kwargs
+        self.done = False
+        self.result = None
+        self.error = None
+        self.event = threading.Event()
+
+    def resolve(self, result):
+        if isinstance(result, Exception):
+            self.error = result
+        else:
+            self.result = result
+        self.done = True
+        self.event.set()
+
+
+class AutoPipelineClient(object):
+    """Wraps a redis-py client so that the commands issued concurrently by
+    different threads are sent together, as one pipeline, with each thread
+    given its own reply.
+
+    The first thread to issue a command while no pipeline is in flight
+    sends it, waiting ``window`` seconds beforehand to collect others.
+    Commands issued while a pipeline is in flight are queued, and the first
+    of their threads sends them all as the next pipeline once the current
+    one returns.  At low concurrency a command is therefore sent at once,
+    as it would be without the wrapper, when ``window`` is 0.
+
+    Only the commands in :data:`.PIPELINED_COMMANDS` are pipelined.  An
+    error reply is raised in the thread whose command caused it, while a
+    connection error is raised in every thread of the failed pipeline.
+
+    :param client: a redis-py client
+    :param window: the number of seconds to wait for further commands
+     before sending a pipeline
+    """
+
+    def __init__(self, client, window=0):
+        self.client = client
+        self.window = window
+        self._queue = []
+        self._flushing = False
+        self._lock = threading.Lock()
+
+    def __getattr__(self, name):
+        if name not in PIPELINED_COMMANDS:
+            return getattr(self.client, name)
+
+        def command(*args, **kwargs):
+            return self._execute(name, args, kwargs)
+        command.__name__ = name
+        return command
+
+    def _execute(self, name, args, kwargs):
+        command = _Command(name, args, kwargs)
+        with self._lock:
+            self._queue.append(command)
+            lead = not self._flushing
+            self._flushing = True
+
+        if lead:
+            self._flush()
+        else:
+            # wait for the reply, or to be handed the next pipeline to send
+            command.event.wait()
+            if not command.done:
+                self._flush()
+
+        if command.error is not None:
+            raise command.error
+        return command.result
+
+    def _flush(self):
+        """Send the queued commands as a pipeline, then hand the commands
+        queued meanwhile to the first of their threads to send."""
+        if self.window:
+            time.sleep(self.window)
+        with self._lock:
+            commands, self._queue = self._queue, []
+
+        try:
+            self._send(commands)
+        finally:
+            with self._lock:
+                if self._queue:
+                    leader = self._queue[0]
+                else:
+                    leader = None
+                    self._flushing = False
+            if leader is not None:
+                leader.event.set()
+
+    def _send(self, commands):
+        try:
+            pipe = self.client.pipeline(transaction=False)
+            for command in commands:
+                getattr(pipe, command.name)(*command.args, **command.kwargs)
+            results = pipe.execute(raise_on_error=False)
+        except Exception as exc:
+            results = [exc] * len(commands)
+        for command, result in zip(commands, results):
+            command.resolve(result)
@@ -2,3 +2,8 @@ from yosai_dpcache.cache.region import register_backend
 
 register_backend(
     "yosai_dpcache.redis", "yosai_dpcache.cache.backends.redis", "RedisBackend")
+register_backend(
+    "yosai_dpcache.memory", "yosai_dpcache.cache.backends.memory", "MemoryBackend")
+register_backend(
+    "yosai_dpcache.redis_async", "yosai_dpcache.cache.backends.redis_async",
+    "AsyncRedisBackend")
@@ -0,0 +1,276 @@
+"""
+File Locks
+----------
+
+Provides file-based locks that synchronize the processes of a single host,
+using `fcntl.flock() <http://docs.python.org/library/fcntl.html>`_, so that
+the prefork workers of a server can share a dogpile lock without a
+distributed one.  Only works on Unix systems.
+
+"""
+
+from contextlib import contextmanager
+import hashlib
+import os
+
+from yosai_dpcache.cache import compat
+from yosai_dpcache.cache.util import memoized_property
+
+__all__ = 'AbstractFileLock', 'FileLock', 'FileMutex', 'lock_filename'
+
+
+def lock_filename(lock_dir, key):
+    """Return the lock file of key within lock_dir, named by a hash of the
+    key so that any key makes a valid filename."""
+    if not isinstance(key, bytes):
+        key = key.encode('utf-8')
+    return os.path.join(lock_dir,
+                        hashlib.sha1(key).hexdigest() + '.lock')
+
+
+def _open_locked(filename, wrflag, lockflag, wait, fcntl):
+    """Open filename and flock it, returning the file descriptor, or None
+    when ``wait`` is False and the lock is held elsewhere."""
+    fileno = os.open(filename, wrflag | os.O_CREAT)
+    try:
+        if not wait:
+            lockflag |= fcntl.LOCK_NB
+        fcntl.flock(fileno, lockflag)
+    except IOError:
+        os.close(fileno)
+        if not wait:
+            # this is typically
+            # "[Errno 35] Resource temporarily unavailable",
+            # because of LOCK_NB
+            return None
+        else:
+            raise
+    return fileno
+
+
+class AbstractFileLock(object):
+    """Coordinate read/write access to a file.
+
+    typically is a file-based lock but doesn't necessarily have to be.
+
+    The default implementation here is :class:`.FileLock`.
+
+    Implementations should provide the following methods::
+
+        * __init__()
+        * acquire_read_lock()
+        * acquire_write_lock()
+        * release_read_lock()
+        * release_write_lock()
+
+    The ``__init__()`` method accepts a single argument "filename", which
+    may be used as the "lock file", for those implementations that use a lock
+    file.
+
+    Note that multithreaded environments must provide a thread-safe
+    version of this lock.  The recommended approach for file-
+    descriptor-based locks is to use a Python ``threading.local()``
+    so that a unique file descriptor is held per thread.  See the source
+    code of :class:`.FileLock` for an implementation example.
+
+    """
+
+    def __init__(self, filename):
+        """Constructor, is given the filename of a potential lockfile.
+
+        The usage of this filename is optional and no file is
+        created by default.
+
+        Raises ``NotImplementedError`` by default, must be
+        implemented by subclasses.
+        """
+        raise NotImplementedError()
+
+    def acquire(self, wait=True):
+        """Acquire the "write" lock.
+
+        This is a direct call to :meth:`.AbstractFileLock.acquire_write_lock`.
+
+        """
+        return self.acquire_write_lock(wait)
+
+    def release(self):
+        """Release the "write" lock.
+
+        This is a direct call to :meth:`.AbstractFileLock.release_write_lock`.
+
+        """
+        self.release_write_lock()
+
+    @contextmanager
+    def read(self):
+        """Provide a context manager for the "read" lock.
+
+        This method makes use of :meth:`.AbstractFileLock.acquire_read_lock`
+        and :meth:`.AbstractFileLock.release_read_lock`
+
+        """
+
+        self.acquire_read_lock(True)
+        try:
+            yield
+        finally:
+            self.release_read_lock()
+
+    @contextmanager
+    def write(self):
+        """Provide a context manager for the "write" lock.
+
+        This method makes use of :meth:`.AbstractFileLock.acquire_write_lock`
+        and :meth:`.AbstractFileLock.release_write_lock`
+
+        """
+
+        self.acquire_write_lock(True)
+        try:
+            yield
+        finally:
+            self.release_write_lock()
+
+    @property
+    def is_open(self):
+        """optional method."""
+        raise NotImplementedError()
+
+    def acquire_read_lock(self, wait):
+        """Acquire a 'reader' lock.
+
+        Raises ``NotImplementedError`` by default, must be
+        implemented by subclasses.
+        """
+        raise NotImplementedError()
+
+    def acquire_write_lock(self, wait):
+        """Acquire a 'write' lock.
+
+        Raises ``NotImplementedError`` by default, must be
+        implemented by subclasses.
+        """
+        raise NotImplementedError()
+
+    def release_read_lock(self):
+        """Release a 'reader' lock.
+
+        Raises ``NotImplementedError`` by default, must be
+        implemented by subclasses.
+        """
+        raise NotImplementedError()
+
+    def release_write_lock(self):
+        """Release a 'writer' lock.
+
+        Raises ``NotImplementedError`` by default, must be
+        implemented by subclasses.
+        """
+        raise NotImplementedError()
+
+
+class FileLock(AbstractFileLock):
+    """Use lockfiles to coordinate read/write access to a file.
+
+    This is the cross-process counterpart of :class:`.ReadWriteMutex`:
+    many readers or a single writer hold the lock at a time, across the
+    threads and processes of a host.  Each thread holds a file descriptor of
+    its own, so a lock must be released by the thread that acquired it.
+
+    Only works on Unix systems, using
+    `fcntl.flock() <http://docs.python.org/library/fcntl.html>`_.
+
+    """
+
+    def __init__(self, filename):
+        self._filedescriptor = compat.threading.local()
+        self.filename = filename
+
+    @memoized_property
+    def _module(self):
+        import fcntl
+        return fcntl
+
+    @property
+    def is_open(self):
+        return hasattr(self._filedescriptor, 'fileno')
+
+    def acquire_read_lock(self, wait):
+        return self._acquire(wait, os.O_RDONLY, self._module.LOCK_SH)
+
+    def acquire_write_lock(self, wait):
+        return self._acquire(wait, os.O_WRONLY, self._module.LOCK_EX)
+
+    def release_read_lock(self):
+        self._release()
+
+    def release_write_lock(self):
+        self._release()
+
+    def _acquire(self, wait, wrflag, lockflag):
+        fileno = _open_locked(self.filename, wrflag, lockflag, wait,
+                              self._module)
+        if fileno is None:
+            return False
+        self._filedescriptor.fileno = fileno
+        return True
+
+    def _release(self):
+        try:
+            fileno = self._filedescriptor.fileno
+        except AttributeError:
+            return
+        else:
+            self._module.flock(fileno, self._module.LOCK_UN)
+            os.close(fileno)
+            del self._filedescriptor.fileno
+
+
+class FileMutex(object):
+    """An exclusive lock on a file, held by a single thread of a single
+    process at a time, for use as a dogpile lock.
+
+    Unlike :class:`.FileLock`, it may be released by a thread other than the
+    one that acquired it, as a :class:`.CacheRegion` does when it
+    regenerates a value with an ``async_creation_runner``.  Threads of the
+    same process are serialized with a ``threading.Lock`` before they reach
+    the file lock.
+
+    Only works on Unix systems, using
+    `fcntl.flock() <http://docs.python.org/library/fcntl.html>`_.
+
+    """
+
+    def __init__(self, filename):
+        self.filename = filename
+        self._lock = compat.threading.Lock()
+        self._fileno = None
+
+    @memoized_property
+    def _module(self):
+        import fcntl
+        return fcntl
+
+    def acquire(self, wait=True):
+        if not self._lock.acquire(wait):
+            return False
+        try:
+            fileno = _open_locked(self.filename, os.O_WRONLY,
+                                  self._module.LOCK_EX, wait, self._module)
+        except Exception:
+            self._lock.release()
+            raise
+        if fileno is None:
+            self._lock.release()
+            return False
+        self._fileno = fileno
+        return True
+
+    def release(self):
+        fileno, self._fileno = self._fileno, None
+        try:
+            self._module.flock(fileno, self._module.LOCK_UN)
+            os.close(fileno)
+        finally:
+            self._lock.release()
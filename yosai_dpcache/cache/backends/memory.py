@@ -0,0 +1,240 @@
+"""
+Memory Backend
+--------------
+
+Provides a bounded, thread-safe in-process backend that expires each
+entry according to the expiration time passed to it.
+
+"""
+
+import collections
+import fnmatch
+import time
+
+from yosai_dpcache.cache.api import CacheBackend
+from yosai_dpcache.cache.compat import threading
+from yosai_dpcache.cache.util import delete_in_batches
+
+
+__all__ = 'MemoryBackend',
+
+
+class _Shard(object):
+    """An LRU-ordered portion of the keyspace, guarded by its own lock."""
+
+    def __init__(self, max_size):
+        self.max_size = max_size
+        self.lock = threading.Lock()
+        # key -> (value, expires_at), where expires_at is None for no expiry
+        self.entries = collections.OrderedDict()
+        # key -> the value of an integer counter, which is never evicted
+        self.counters = {}
+
+    def get(self, key, now):
+        entry = self.entries.get(key)
+        if entry is None:
+            return None
+        value, expires_at = entry
+        if expires_at is not None and expires_at <= now:
+            del self.entries[key]
+            return None
+        self.entries.move_to_end(key)
+        return value
+
+    def set(self, key, value, expires_at):
+        self.entries[key] = (value, expires_at)
+        self.entries.move_to_end(key)
+        while len(self.entries) > self.max_size:
+            self.entries.popitem(last=False)
+
+
+class MemoryBackend(CacheBackend):
+    """A backend that stores values in process memory.
+
+    Entries are spread across a number of shards, each of which is an
+    LRU-ordered dictionary guarded by its own lock, so that concurrent
+    threads operating on different keys rarely contend on the same lock.
+    Once a shard holds more than its share of ``max_size`` entries, its
+    least recently used entries are evicted.  The counters of :meth:`.incr`
+    are held apart from the entries and are never evicted, since a counter
+    that restarted from 0 would, say, make the keys of an old generation
+    current again;  they don't count towards ``max_size``.
+
+    Example configuration::
+
+        from yosai_dpcache.cache import make_region
+
+        region = make_region().configure(
+            'yosai_dpcache.memory',
+            expiration_time=3600,
+            arguments={
+                'max_size': 10000,
+                'num_shards': 16
+                }
+        )
+
+    Arguments accepted in the arguments dictionary:
+
+    :param max_size: integer, the maximum number of entries held by the
+     backend.  Default is ``10000``.
+
+    :param num_shards: integer, the number of independently locked shards
+     that the keyspace is divided into, which may not exceed ``max_size``.
+     Default is ``16``.
+
+    """
+
+    def __init__(self, arguments):
+        self.max_size = arguments.pop('max_size', 10000)
+        self.num_shards = arguments.pop('num_shards', 16)
+        if self.num_shards > self.max_size:
+            raise ValueError('num_shards ({0}) may not exceed max_size ({1})'
+                             .format(self.num_shards, self.max_size))
+
+        # max_size is spread across the shards, the first of which hold one
+        # entry more than the others when it doesn't divide evenly
+        shard_size, extra = divmod(self.max_size, self.num_shards)
+        self._shards = [_Shard(shard_size + (i < extra))
+                        for i in range(self.num_shards)]
+
+    def _shard(self, key):
+        return self._shards[hash(key) % self.num_shards]
+
+    def _expires_at(self, expiration):
+        if not expiration:
+            return None
+        return time.time() + expiration
+
+    def get(self, key):
+        shard = self._shard(key)
+        with shard.lock:
+            return shard.get(key, time.time())
+
+    def get_multi(self, keys):
+        now = time.time()
+        values = []
+        for key in keys:
+            shard = self._shard(key)
+            with shard.lock:
+                values.append(shard.get(key, now))
+        return values
+
+    def set(self, key, value, expiration):
+        shard = self._shard(key)
+        expires_at = self._expires_at(expiration)
+        with shard.lock:
+            shard.set(key, value, expires_at)
+
+    def set_multi(self, mapping, expiration):
+        for key, value in mapping.items():
+            if isinstance(expiration, dict):
+                self.set(key, value, expiration.get(key))
+            else:
+                self.set(key, value, expiration)
+
+    def hmset(self, name, mapping, expiration):
+        """
+        Set key to value within hash ``name`` for each corresponding
+        key and value from the ``mapping`` dict.
+        """
+        shard = self._shard(name)
+        expires_at = self._expires_at(expiration)
+        with shard.lock:
+            current = dict(shard.get(name, time.time()) or {})
+            current.update(mapping)
+            shard.set(name, current, expires_at)
+
+    def hmget(self, name, keys):
+        return self.hmget_exists(name, keys)[1]
+
+    def hgetall(self, name):
+        shard = self._shard(name)
+        with shard.lock:
+            return dict(shard.get(name, time.time()) or {})
+
+    def hupdate(self, name, mapping, deleted=(), expiration=None):
+        shard = self._shard(name)
+        with shard.lock:
+            current = shard.get(name, time.time())
+            if current is None:
+                return False
+            current = dict(current)
+            current.update(mapping)
+            for field in deleted:
+                current.pop(field, None)
+            if expiration:
+                expires_at = self._expires_at(expiration)
+            else:
+                expires_at = shard.entries[name][1]
+            shard.set(name, current, expires_at)
+        return True
+
+    def hmget_exists(self, name, keys):
+        shard = self._shard(name)
+        with shard.lock:
+            current = shard.get(name, time.time())
+        if current is None:
+            return False, [None] * len(keys)
+        return True, [current.get(key) for key in keys]
+
+    def delete(self, key):
+        shard = self._shard(key)
+        with shard.lock:
+            shard.entries.pop(key, None)
+            shard.counters.pop(key, None)
+
+    def delete_multi(self, keys):
+        for key in keys:
+            self.delete(key)
+
+    def keys(self, pattern):
+        """
+        Returns a list of the unexpired keys matching pattern
+
+        :param pattern: a glob-style pattern, as understood by redis
+        :returns: a list of keys
+        """
+        return list(self.iter_keys(pattern))
+
+    def iter_keys(self, pattern, count=None):
+        """
+        Yields the unexpired keys matching pattern, one shard at a time, so
+        that a shard's lock is held only while that shard is scanned.
+        ``count`` is accepted for compatibility with the Redis backend.
+        """
+        for shard in self._shards:
+            now = time.time()
+            with shard.lock:
+                matched = [key for key, (_, expires_at) in
+                           shard.entries.items()
+                           if (expires_at is None or expires_at > now) and
+                           fnmatch.fnmatchcase(key, pattern)]
+                matched.extend(key for key in shard.counters
+                               if fnmatch.fnmatchcase(key, pattern))
+            for key in matched:
+                yield key
+
+    def delete_pattern(self, pattern, count=None):
+        return delete_in_batches(self.delete_multi,
+                                 self.iter_keys(pattern, count),
+                                 self.max_size)
+
+    def exists(self, key):
+        shard = self._shard(key)
+        with shard.lock:
+            return (key in shard.counters or
+                    shard.get(key, time.time()) is not None)
+
+    def incr(self, key):
+        shard = self._shard(key)
+        with shard.lock:
+            value = shard.counters[key] = shard.counters.get(key, 0) + 1
+        return value
+
+    def get_counters(self, keys):
+        values = []
+        for key in keys:
+            shard = self._shard(key)
+            with shard.lock:
+                values.append(shard.counters.get(key, 0))
+        return values
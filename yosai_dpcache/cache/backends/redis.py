@@ -7,14 +7,271 @@ Provides backends for talking to `Redis <http://redis.io>`_.
 """
 
 from __future__ import absolute_import
+import logging
+import os
+import time
+import uuid
+
 from yosai_dpcache.cache.api import CacheBackend
-from yosai_dpcache.cache.compat import u
+from yosai_dpcache.cache.autopipeline import AutoPipelineClient
+from yosai_dpcache.cache.backends.file import FileMutex, lock_filename
+from yosai_dpcache.cache.compat import threading, u
+from yosai_dpcache.cache.lease import (
+    LeaseTimes,
+    LeaseWatchdog,
+    default_lock_key_prefix,
+)
+from yosai_dpcache.cache.util import delete_in_batches
 
 redis = None
 
+logger = logging.getLogger(__name__)
+
 __all__ = 'RedisBackend',
 
 
+def lock_name(key):
+    return u('_lock{0}').format(key)
+
+
+def lock_channel(key):
+    return u('_lock_released{0}').format(key)
+
+
+class RedisMutex(object):
+    """Adapts a redis-py ``Lock`` to the ``acquire(wait)`` signature used by
+    the dogpile lock.  redis-py's own ``acquire`` takes ``sleep`` as its first
+    positional argument.
+
+    The lease of each acquisition is given by the backend's
+    :meth:`.RedisBackend.lease_time`, and is renewed by its watchdog, if
+    any, until the mutex is released."""
+
+    def __init__(self, lock, backend, key):
+        self.lock = lock
+        self.backend = backend
+        self.key = key
+
+    def acquire(self, wait=True):
+        self.lock.timeout = self.backend.lease_time(self.key)
+        acquired = self.lock.acquire(blocking=wait)
+        if acquired:
+            self.backend.lease_acquired(self, self.lock.timeout)
+        return acquired
+
+    def release(self):
+        self.backend.lease_released(self)
+        try:
+            self.lock.release()
+        except redis.exceptions.LockError:
+            # the created value has been stored regardless
+            logger.warning("The lease of %s expired before its release",
+                           self.lock.name)
+
+    def renew(self):
+        self.lock.reacquire()
+
+
+# deletes the lock if it is still held under the given token and, given a
+# channel, publishes the value stored under the key to the processes waiting
+# for the lock;  a key that doesn't hold a string, such as a hash whose
+# fields are filled under the lock, is published as '' for the waiters to
+# read it themselves
+RELEASE_AND_NOTIFY = """
+if redis.call('get', KEYS[1]) == ARGV[1] then
+    redis.call('del', KEYS[1])
+    if ARGV[2] ~= '' then
+        local value = ''
+        if redis.call('type', KEYS[2]).ok == 'string' then
+            value = redis.call('get', KEYS[2])
+        end
+        redis.call('publish', ARGV[2], value)
+    end
+    return 1
+end
+return 0
+"""
+
+# returns {1, value} when the key has a value, {2, token} when the lock was
+# acquired under the given token, or {0, ''} when the lock is held elsewhere
+GET_OR_LEASE = """
+local value = redis.call('get', KEYS[1])
+if value then
+    return {1, value}
+end
+local acquired
+if tonumber(ARGV[2]) > 0 then
+    acquired = redis.call('set', KEYS[2], ARGV[1], 'NX', 'PX', ARGV[2])
+else
+    acquired = redis.call('set', KEYS[2], ARGV[1], 'NX')
+end
+if acquired then
+    return {2, ARGV[1]}
+end
+return {0, ''}
+"""
+
+# stores the value and, if the lock is still held under the given token,
+# releases it and publishes the value on the given channel, if any
+SET_AND_RELEASE = """
+if tonumber(ARGV[2]) > 0 then
+    redis.call('set', KEYS[1], ARGV[1], 'PX', ARGV[2])
+else
+    redis.call('set', KEYS[1], ARGV[1])
+end
+if redis.call('get', KEYS[2]) == ARGV[3] then
+    redis.call('del', KEYS[2])
+    if ARGV[4] ~= '' then
+        redis.call('publish', ARGV[4], ARGV[1])
+    end
+end
+return 1
+"""
+
+# resets the lease of the lock if it is still held under the given token
+RENEW = """
+if redis.call('get', KEYS[1]) == ARGV[1] then
+    return redis.call('pexpire', KEYS[1], ARGV[2])
+end
+return 0
+"""
+
+
+class RedisNotifyMutex(object):
+    """A distributed mutex whose waiters are woken by a pub/sub message
+    published as it is released, rather than by polling for it every
+    ``lock_sleep`` seconds.
+
+    The message carries the value that the holder stored under the key.  A
+    waiter that receives one hands it to the backend, for the next ``get``
+    of the key on the waiter's thread to return without a round trip, and
+    returns False from ``acquire`` without taking the lock:  the dogpile
+    lock then reads that value rather than creating it again.  A waiter
+    woken without a value, because the holder's creator failed, competes
+    for the lock again.
+
+    Each waiting thread holds a pub/sub connection of its own while it
+    waits.
+    """
+
+    # the longest a waiter waits for a message before checking the lock
+    # itself, in case the holder's lease expired without a release
+    poll_interval = 1.0
+
+    def __init__(self, backend, key):
+        self.backend = backend
+        self.client = backend.client
+        self.key = key
+        self.name = lock_name(key)
+        self.channel = lock_channel(key)
+        self.token = None
+        self.lease = None
+
+    def _try_acquire(self):
+        token = uuid.uuid4().hex
+        lease = self.backend.lease_time(self.key)
+        if self.client.set(self.name, token, nx=True,
+                           px=int(lease * 1000) if lease else None):
+            self.token = token
+            self.lease = lease
+            self.backend.lease_acquired(self, lease)
+            return True
+        return False
+
+    def acquire(self, wait=True):
+        if self._try_acquire():
+            return True
+        if not wait:
+            return False
+
+        pubsub = self.client.pubsub()
+        try:
+            pubsub.subscribe(self.channel)
+            while True:
+                message = pubsub.get_message(timeout=self.poll_interval)
+                if message is not None and message['type'] == 'message' \
+                        and message['data']:
+                    self.backend.deliver(self.key, message['data'])
+                    return False
+                # subscribed, woken without a value, or timed out
+                if self._try_acquire():
+                    return True
+        finally:
+            pubsub.close()
+
+    def release(self):
+        self.backend.lease_released(self)
+        token, self.token = self.token, None
+        self.backend.release_and_notify(keys=[self.name, self.key],
+                                        args=[token, self.channel])
+
+    def renew(self):
+        if self.token is not None and self.lease:
+            self.backend.renew_lease(keys=[self.name],
+                                     args=[self.token,
+                                           int(self.lease * 1000)])
+
+
+# sets ARGV[2] field/value pairs (ARGV[3] onwards) of an existing hash,
+# deletes the fields that follow them and, when ARGV[1] is positive, resets
+# its ttl to ARGV[1] milliseconds;  a hash that doesn't exist isn't created.
+# The arguments are unpacked 1000 at a time, within Lua's stack limit.
+HUPDATE = """
+if redis.call('exists', KEYS[1]) == 0 then
+    return 0
+end
+local last = 2 + 2 * tonumber(ARGV[2])
+for i = 3, last, 1000 do
+    redis.call('hset', KEYS[1], unpack(ARGV, i, math.min(i + 999, last)))
+end
+for i = last + 1, #ARGV, 1000 do
+    redis.call('hdel', KEYS[1], unpack(ARGV, i, math.min(i + 999, #ARGV)))
+end
+if tonumber(ARGV[1]) > 0 then
+    redis.call('pexpire', KEYS[1], ARGV[1])
+end
+return 1
+"""
+
+
+def queue_batch(pipe, ops):
+    """Queue the (method, args) operations of a batch on a pipeline."""
+    for name, args in ops:
+        if name == 'set':
+            key, value, expiration = args
+            pipe.set(key, value, ex=expiration)
+        else:
+            getattr(pipe, name)(*args)
+
+
+def decode_fields(mapping):
+    return dict((field.decode('utf-8') if isinstance(field, bytes) else field,
+                 value) for field, value in mapping.items())
+
+
+def hupdate_args(mapping, deleted, expiration):
+    """Return the ARGV of the HUPDATE script."""
+    args = [int(expiration * 1000) if expiration else 0, len(mapping)]
+    for field, value in mapping.items():
+        args.extend((field, value))
+    args.extend(deleted)
+    return args
+
+
+class ScriptLease(object):
+    """A distributed lock acquired by :meth:`.RedisBackend.get_or_lease`."""
+
+    def __init__(self, backend, key, token, lease):
+        self.backend = backend
+        self.key = key
+        self.token = token
+        self.lease = lease
+
+    def renew(self):
+        self.backend.renew_lease(keys=[lock_name(self.key)],
+                                 args=[self.token, int(self.lease * 1000)])
+
+
 class RedisBackend(CacheBackend):
     """A `Redis <http://redis.io/>`_ backend, using the
     `redis-py <http://pypi.python.org/pypi/redis/>`_ backend.
@@ -65,14 +322,115 @@ class RedisBackend(CacheBackend):
      acquire a lock.  This argument is only valid when
      ``distributed_lock`` is ``True``.
 
+    :param lock_watchdog: boolean, when True, the lease of a distributed
+     lock is renewed by a background thread while its holder runs the
+     creator, so that a creator slower than the lease doesn't lose the lock
+     to a second process.  The lease then defaults to 10 seconds when no
+     ``lock_timeout`` is given, which bounds how long a crashed holder
+     blocks others.  This argument is only valid when ``distributed_lock``
+     is ``True``.
+
+    :param adaptive_lock_timeout: boolean, when True, the lease of a
+     distributed lock is twice the longest time (decaying with each
+     acquisition) that locks of the same key prefix were recently held,
+     with ``lock_timeout`` as its minimum.  See :class:`.LeaseTimes`.
+
+    :param lock_key_prefix: a function that maps a key to the prefix that
+     its lock hold times are recorded under.  Defaults to grouping the keys
+     of a :class:`.DPCacheHandler` by domain.
+
+    :param lock_scripts: boolean, when True, ``get_or_create`` reads a
+     value and, if it is missing, acquires the distributed lock in a single
+     round trip, then stores the created value and releases the lock in a
+     second one, using Lua scripts registered with the server.  A process
+     that finds the lock held waits for it as before.  This argument is only
+     valid when ``distributed_lock`` is ``True``, and isn't used by regions
+     that configure a ``stale_grace_time`` or ``early_expiration_beta``.
+
+    :param lock_dir: string, the path of a directory in which a lock file
+     is kept per key, used for the dogpile lock when ``distributed_lock`` is
+     False.  The processes of a single host, such as the prefork workers of
+     a server, then create a value once between them, without the round
+     trips of a distributed lock.  The directory is created if needed, and
+     its lock files are left in place.  Only works on Unix systems.  See
+     :class:`.FileMutex`.
+
+    :param lock_factory: the class of the locks kept in ``lock_dir``,
+     given the path of a lock file.  Default is :class:`.FileMutex`;  an
+     :class:`.AbstractFileLock` such as :class:`.FileLock` may be used
+     instead when a lock is always released by the thread that acquired it.
+
+    :param lock_notify: boolean, when True, processes waiting for a
+     distributed lock are notified of its release through pub/sub, along
+     with the value that was created, instead of polling every
+     ``lock_sleep`` seconds.  See :class:`.RedisNotifyMutex`.  This argument
+     is only valid when ``distributed_lock`` is ``True``.
+
+    :param auto_pipeline: boolean, when True, the commands that threads
+     issue concurrently are sent together as a single pipeline, with each
+     thread given its own reply, which saves round trips and connection
+     checkouts under load.  See :class:`.AutoPipelineClient`.
+
+    :param auto_pipeline_window: float, the number of seconds to wait for
+     further commands before sending a pipeline.  Default is ``0``, which
+     batches only the commands issued while a pipeline is in flight.  This
+     argument is only valid when ``auto_pipeline`` is ``True``.
+
+    :param max_connections: integer, the maximum number of connections
+     that the connection pool opens.  Default is redis-py's.
+
+    :param blocking_pool: boolean, when True, a ``BlockingConnectionPool``
+     is used, so that a thread that finds every connection in use waits up
+     to ``pool_timeout`` seconds for one to be released, instead of the
+     pool opening connections beyond ``max_connections``.
+
+    :param pool_timeout: float, the number of seconds that a thread waits
+     for a connection from a blocking pool before a ``ConnectionError`` is
+     raised.  Default is ``20``.
+
+    :param socket_connect_timeout: float, seconds for the connection
+     timeout.  Default is ``socket_timeout``.
+
+    :param socket_keepalive: boolean, whether TCP keepalive is enabled on
+     connections.
+
+    :param health_check_interval: integer, the number of seconds that a
+     connection may be idle before it is checked with a PING when next
+     taken from the pool.
+
+    :param warm_connections: integer, the number of connections opened
+     when the backend is created, so that the first requests don't pay for
+     the TCP (and TLS) handshakes.  See :meth:`.warm_up`.
+
+    :param bulk_max_connections: integer, when given, the bulk operations
+     of the backend (the SCANs of :meth:`.keys`, :meth:`.iter_keys` and
+     :meth:`.delete_pattern`, and their deletes) use a connection pool of
+     their own, of this size, so that a bulk job can't take the
+     connections that other cache operations, such as credentials
+     lookups, need.  The pool is configured as the main one otherwise.
+     See :attr:`.bulk_client`.
+
     :param connection_pool: ``redis.ConnectionPool`` object.  If provided,
      this object supersedes other connection arguments passed to the
      ``redis.StrictRedis`` instance, including url and/or host as well as
-     socket_timeout, and will be passed to ``redis.StrictRedis`` as the
-     source of connectivity.
+     socket_timeout and the pool options above, and will be passed to
+     ``redis.StrictRedis`` as the source of connectivity.  Bulk operations
+     then share it.
+
+    :param delete_chunk_size: integer, maximum number of keys sent in a
+     single UNLINK (or DEL) command by :meth:`.delete_multi`.  All chunks
+     are sent within one pipeline.  Default is ``500``.
+
+    :param scan_count: integer, the ``COUNT`` hint given to each SCAN
+     command issued by :meth:`.iter_keys`, which is the approximate number
+     of keys that Redis examines per call.  Default is ``1000``.
 
     """
 
+    # how long a value delivered with a lock release notification may be
+    # returned in place of reading it
+    delivery_ttl = 1.0
+
     def __init__(self, arguments):
         self._imports()
         self.url = arguments.pop('url', None)
@@ -82,53 +440,284 @@ class RedisBackend(CacheBackend):
         self.db = arguments.pop('db', 0)
         self.distributed_lock = arguments.get('distributed_lock', False)
         self.socket_timeout = arguments.pop('socket_timeout', None)
+        self.socket_connect_timeout = arguments.pop('socket_connect_timeout',
+                                                    None)
+        self.socket_keepalive = arguments.pop('socket_keepalive', False)
+        self.health_check_interval = arguments.pop('health_check_interval',
+                                                   0)
+        self.max_connections = arguments.pop('max_connections', None)
+        self.blocking_pool = arguments.pop('blocking_pool', False)
+        self.pool_timeout = arguments.pop('pool_timeout', 20)
+        self.warm_connections = arguments.pop('warm_connections', 0)
+        self.bulk_max_connections = arguments.pop('bulk_max_connections',
+                                                  None)
 
         self.lock_timeout = arguments.get('lock_timeout', None)
         self.lock_sleep = arguments.get('lock_sleep', 0.1)
+        self.lock_notify = arguments.pop('lock_notify', False)
+        self.lock_dir = arguments.pop('lock_dir', None)
+        self.lock_factory = arguments.pop('lock_factory', FileMutex)
+        if self.lock_dir is not None and not os.path.isdir(self.lock_dir):
+            try:
+                os.makedirs(self.lock_dir)
+            except OSError:
+                # created by another process meanwhile
+                if not os.path.isdir(self.lock_dir):
+                    raise
+        self.lock_scripts = (arguments.pop('lock_scripts', False) and
+                             self.distributed_lock)
+        self.lock_watchdog = arguments.pop('lock_watchdog', False)
+        self.adaptive_lock_timeout = arguments.pop('adaptive_lock_timeout',
+                                                   False)
+        self.lock_key_prefix = arguments.pop('lock_key_prefix',
+                                             default_lock_key_prefix)
 
         self.redis_expiration_time = arguments.pop('redis_expiration_time', 0)
         self.connection_pool = arguments.get('connection_pool', None)
+        self.delete_chunk_size = arguments.pop('delete_chunk_size', 500)
+        self.scan_count = arguments.pop('scan_count', 1000)
+        self.auto_pipeline = arguments.pop('auto_pipeline', False)
+        self.auto_pipeline_window = arguments.pop('auto_pipeline_window', 0)
         self.client = self._create_client()
+        if self.bulk_max_connections and self.connection_pool is None:
+            self.bulk_client = self._create_client(self.bulk_max_connections)
+        else:
+            self.bulk_client = self.client
+        if self.warm_connections:
+            self.warm_up(self.warm_connections)
+        if self.auto_pipeline:
+            self.client = self._auto_pipeline_client(self.client)
+
+        # UNLINK requires redis >= 4.0;  DEL is used once it is known to be
+        # unsupported by the server
+        self._use_unlink = True
+
+        if self.lock_notify or self.lock_scripts:
+            self.release_and_notify = self.client.register_script(
+                RELEASE_AND_NOTIFY)
+            self.renew_lease = self.client.register_script(RENEW)
+        if self.lock_scripts:
+            self._get_or_lease = self.client.register_script(GET_OR_LEASE)
+            self._set_and_release = self.client.register_script(
+                SET_AND_RELEASE)
+
+        self._hupdate = self.client.register_script(HUPDATE)
+
+        self._watchdog = LeaseWatchdog() if self.lock_watchdog else None
+        self._lease_times = (LeaseTimes(self.lock_key_prefix)
+                             if self.adaptive_lock_timeout else None)
+        self._acquired_at = {}
+        # values received with a lock release notification, per thread
+        self._delivered = threading.local()
+
+    def _auto_pipeline_client(self, client):
+        return AutoPipelineClient(client, self.auto_pipeline_window)
 
     def _imports(self):
         # defer imports until backend is used
         global redis
         import redis  # noqa
 
-    def _create_client(self):
+    def _create_client(self, max_connections=None):
+        return self._client(redis, max_connections or self.max_connections)
+
+    def _client(self, module, max_connections):
+        """Return a client of the redis-py ``module``, either redis or
+        redis.asyncio, with a pool of up to max_connections."""
         if self.connection_pool is not None:
             # the connection pool already has all other connection
             # options present within, so here we disregard socket_timeout
             # and others.
-            return redis.StrictRedis(connection_pool=self.connection_pool)
-
-        args = {}
-        if self.socket_timeout:
-            args['socket_timeout'] = self.socket_timeout
+            return module.StrictRedis(connection_pool=self.connection_pool)
+
+        args = self._connection_args(max_connections)
+        if self.blocking_pool:
+            args['timeout'] = self.pool_timeout
+            pool_cls = module.BlockingConnectionPool
+            if self.url is not None:
+                pool = pool_cls.from_url(url=self.url, **args)
+            else:
+                pool = pool_cls(**args)
+            return module.StrictRedis(connection_pool=pool)
 
         if self.url is not None:
             args.update(url=self.url)
-            return redis.StrictRedis.from_url(**args)
+            return module.StrictRedis.from_url(**args)
         else:
+            return module.StrictRedis(**args)
+
+    def _connection_args(self, max_connections):
+        args = {}
+        if self.socket_timeout:
+            args['socket_timeout'] = self.socket_timeout
+        if self.socket_connect_timeout:
+            args['socket_connect_timeout'] = self.socket_connect_timeout
+        if self.socket_keepalive:
+            args['socket_keepalive'] = True
+        if self.health_check_interval:
+            args['health_check_interval'] = self.health_check_interval
+        if max_connections:
+            args['max_connections'] = max_connections
+
+        if self.url is None:
             args.update(
                 host=self.host, password=self.password,
                 port=self.port, db=self.db
             )
-            return redis.StrictRedis(**args)
+        return args
+
+    def warm_up(self, count):
+        """
+        Opens up to ``count`` connections of the connection pool, checking
+        each with a PING, and returns them to the pool for later use
+        """
+        pool = self.client.connection_pool
+        connections = []
+        try:
+            for _ in range(count):
+                try:
+                    connection = pool.get_connection()
+                except TypeError:
+                    # redis-py < 5.3 requires a command name
+                    connection = pool.get_connection('PING')
+                connections.append(connection)
+                connection.send_command('PING')
+                connection.read_response()
+        finally:
+            for connection in connections:
+                pool.release(connection)
 
     def get_mutex(self, key):
-        if self.distributed_lock:
-            return self.client.lock(u('_lock{0}').format(key),
-                                    self.lock_timeout, self.lock_sleep)
+        if self.distributed_lock and self.lock_notify:
+            return RedisNotifyMutex(self, key)
+        elif self.distributed_lock:
+            # the lock token isn't thread-local so that the lock may be
+            # released by an async_creation_runner's thread
+            return RedisMutex(self.client.lock(lock_name(key),
+                                               self.lock_timeout,
+                                               self.lock_sleep,
+                                               thread_local=False),
+                              self, key)
+        elif self.lock_dir is not None:
+            return self.lock_factory(lock_filename(self.lock_dir, key))
         else:
             return None
 
+    def lease_time(self, key):
+        """Return the number of seconds to lease the lock of key for, or
+        None for a lock that doesn't expire."""
+        lease = self.lock_timeout
+        if lease is None and self._watchdog is not None:
+            lease = 10
+        if self._lease_times is not None:
+            lease = self._lease_times.lease(key, lease)
+        return lease
+
+    def lease_acquired(self, mutex, lease):
+        self._acquired_at[mutex] = time.time()
+        if self._watchdog is not None and lease:
+            self._watchdog.watch(mutex, lease)
+
+    def lease_released(self, mutex):
+        acquired_at = self._acquired_at.pop(mutex, None)
+        if self._watchdog is not None:
+            self._watchdog.unwatch(mutex)
+        if self._lease_times is not None and acquired_at is not None:
+            self._lease_times.record(mutex.key, time.time() - acquired_at)
+
+    def get_or_lease(self, key):
+        """
+        Returns the value of key or, when it has none, attempts to acquire
+        its distributed lock, using a single round trip
+
+        :returns: a (value, lease) tuple, in which lease is a ScriptLease
+                  when the lock was acquired, and both are None when the
+                  lock is held elsewhere
+        """
+        lease = self.lease_time(key)
+        status, result = self._get_or_lease(
+            keys=[key, lock_name(key)],
+            args=[uuid.uuid4().hex, int(lease * 1000) if lease else 0])
+        if status == 1:
+            return result, None
+        if status == 2:
+            if isinstance(result, bytes):
+                result = result.decode('utf-8')
+            script_lease = ScriptLease(self, key, result, lease)
+            self.lease_acquired(script_lease, lease)
+            return None, script_lease
+        return None, None
+
+    def set_and_release(self, key, value, expiration, lease):
+        """
+        Stores the value of key and releases the lease obtained from
+        get_or_lease, using a single round trip
+        """
+        self.lease_released(lease)
+        self._set_and_release(
+            keys=[key, lock_name(key)],
+            args=[value, int(expiration * 1000) if expiration else 0,
+                  lease.token, lock_channel(key) if self.lock_notify else ''])
+
+    def release_lease(self, lease):
+        """Releases a lease obtained from get_or_lease without storing a
+        value."""
+        self.lease_released(lease)
+        self.release_and_notify(
+            keys=[lock_name(lease.key), lease.key],
+            args=[lease.token,
+                  lock_channel(lease.key) if self.lock_notify else ''])
+
+    def deliver(self, key, value):
+        """Hold a value received with a lock release notification, to be
+        returned by the next get of key on this thread, provided that it
+        follows within ``delivery_ttl`` seconds."""
+        self._delivered.key = key
+        self._delivered.value = value
+        self._delivered.expires_at = time.time() + self.delivery_ttl
+
     def get(self, key):
+        if getattr(self._delivered, 'key', None) == key:
+            value = self._delivered.value
+            self._delivered.key = self._delivered.value = None
+            if time.time() < self._delivered.expires_at:
+                return value
         return self.client.get(key)
 
+    def get_multi(self, keys):
+        """
+        Retrieves the values of ``keys`` using a single MGET
+
+        :returns: a list of values, ordered as ``keys``, in which a missing
+                  key is represented by ``None``
+        """
+        if not keys:
+            return []
+        return self.client.mget(keys)
+
     def set(self, key, value, expiration):
         self.client.set(key, value, ex=expiration)
 
+    def set_multi(self, mapping, expiration):
+        """
+        Sets every key/value of ``mapping`` in a single pipeline of SET
+        commands, each carrying its own expiration
+
+        :param expiration: either a ttl applied to every key or a dict that
+                           maps a key to its ttl
+        """
+        if not mapping:
+            return
+
+        pipe = self.client.pipeline(transaction=False)
+        for key, value in mapping.items():
+            if isinstance(expiration, dict):
+                ex = expiration.get(key)
+            else:
+                ex = expiration
+            pipe.set(key, value, ex=ex)
+        pipe.execute()
+
     def hmset(self, name, mapping, expiration):
         """
         Set key to value within hash ``name`` for each corresponding
@@ -142,19 +731,137 @@ class RedisBackend(CacheBackend):
     def hmget(self, name, keys):
         return self.client.hmget(name, keys)
 
+    def hupdate(self, name, mapping, deleted=(), expiration=None):
+        """
+        Sets the fields of ``mapping`` within the hash ``name`` and deletes
+        the ``deleted`` fields, leaving its other fields as they are, using
+        a single round trip.  A hash that doesn't exist is left absent
+        rather than created with only these fields.
+
+        :param expiration: when given, the hash's ttl is reset to this
+                           many seconds;  otherwise its ttl is unchanged
+        :returns: whether the hash exists and was updated
+        """
+        return bool(self._hupdate(keys=[name], args=hupdate_args(
+            mapping, deleted, expiration)))
+
+    def hgetall(self, name):
+        """
+        :returns: a dict of every field of the hash ``name``, which is empty
+                  when it doesn't exist.  Field names are decoded from UTF-8,
+                  while values are returned as stored, as from hmget.
+        """
+        return decode_fields(self.client.hgetall(name))
+
+    def hmget_exists(self, name, keys):
+        """
+        Returns whether the hash ``name`` exists along with the values of
+        ``keys`` within it, using a single round trip
+
+        :returns: an (exists, values) tuple
+        """
+        pipe = self.client.pipeline(transaction=False)
+        pipe.exists(name)
+        pipe.hmget(name, keys)
+        exists, values = pipe.execute()
+        return bool(exists), values
+
+    def execute_batch(self, ops):
+        """
+        Runs the operations of a batch in a single pipeline
+        """
+        pipe = self.client.pipeline(transaction=False)
+        queue_batch(pipe, ops)
+        return pipe.execute()
+
     def delete(self, key):
         self.client.delete(key)
 
+    def delete_multi(self, keys):
+        """
+        Removes ``keys`` using UNLINK, falling back to DEL for servers that
+        do not support it.  Keys are sent in chunks of ``delete_chunk_size``
+        within a single pipeline.
+        """
+        self._delete_multi(keys, self.client)
+
+    def _delete_multi(self, keys, client):
+        keys = list(keys)
+        if not keys:
+            return
+
+        if self._use_unlink:
+            try:
+                self._delete_chunks(keys, 'unlink', client)
+                return
+            except redis.exceptions.ResponseError as exc:
+                if 'unknown command' not in str(exc).lower():
+                    raise
+                self._use_unlink = False
+
+        self._delete_chunks(keys, 'delete', client)
+
+    def _delete_chunks(self, keys, command, client):
+        size = self.delete_chunk_size
+        pipe = client.pipeline(transaction=False)
+        for i in range(0, len(keys), size):
+            getattr(pipe, command)(*keys[i:i + size])
+        pipe.execute()
+
     def keys(self, pattern):
         """
-        Returns a list of keys (bytestrings) matching pattern
+        Returns a list of keys (bytestrings) matching pattern, obtained
+        incrementally using SCAN rather than KEYS
 
         :param pattern: the string by which to search for keys with,
                         containing wildcards and expressions understood by
                         redis
         :returns: a list of bytestrings
         """
-        return self.client.keys(pattern)
+        return list(self.iter_keys(pattern))
+
+    def iter_keys(self, pattern, count=None):
+        """
+        Yields the keys (bytestrings) matching pattern, using a cursor-based
+        SCAN so that Redis is never blocked for the whole keyspace.  A key may
+        be yielded more than once.
+
+        :param count: the COUNT hint given to each SCAN, defaulting to
+                      ``scan_count``
+        """
+        return self.bulk_client.scan_iter(match=pattern,
+                                          count=count or self.scan_count)
+
+    def delete_pattern(self, pattern, count=None):
+        """
+        Removes every key matching pattern, streaming the keys found by SCAN
+        into pipelined UNLINK batches of ``delete_chunk_size`` keys, using
+        the bulk connection pool
+
+        :returns: the number of keys sent for deletion
+        """
+        def delete_multi(keys):
+            self._delete_multi(keys, self.bulk_client)
+        return delete_in_batches(delete_multi, self.iter_keys(pattern, count),
+                                 self.delete_chunk_size)
 
     def exists(self, key):
         return self.client.exists(key)
+
+    def incr(self, key):
+        """
+        Atomically increments the integer counter stored at key, which never
+        expires
+
+        :returns: the new value of the counter
+        """
+        return self.client.incr(key)
+
+    def get_counters(self, keys):
+        """
+        :returns: the values of the integer counters stored at keys, using 0
+                  for a counter that doesn't exist
+        """
+        if not keys:
+            return []
+        return [int(value or 0) for value in self.client.mget(keys)]
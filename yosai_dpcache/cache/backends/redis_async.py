@@ -0,0 +1,220 @@
+"""
+Async Redis Backend
+-------------------
+
+Provides an asyncio backend for talking to `Redis <http://redis.io>`_,
+for use with an :class:`.AsyncCacheRegion`.
+
+"""
+
+from __future__ import absolute_import
+from yosai_dpcache.cache.backends.redis import RedisBackend, \
+    decode_fields, hupdate_args, queue_batch
+from yosai_dpcache.cache.compat import u
+
+aioredis = None
+
+__all__ = 'AsyncRedisBackend',
+
+
+class AsyncRedisMutex(object):
+    """Adapts a ``redis.asyncio`` ``Lock`` to the coroutine ``acquire(wait)``
+    and ``release()`` methods used by the async dogpile lock."""
+
+    def __init__(self, lock):
+        self.lock = lock
+
+    async def acquire(self, wait=True):
+        return await self.lock.acquire(blocking=wait)
+
+    async def release(self):
+        await self.lock.release()
+
+
+class AsyncRedisBackend(RedisBackend):
+    """A `Redis <http://redis.io/>`_ backend, using the ``redis.asyncio``
+    client of `redis-py <http://pypi.python.org/pypi/redis/>`_ (4.2 or
+    later).  Every data method is a coroutine.
+
+    Example configuration::
+
+        from yosai_dpcache.cache import make_async_region
+
+        region = make_async_region().configure(
+            'yosai_dpcache.redis_async',
+            arguments = {
+                'host': 'localhost',
+                'port': 6379,
+                'db': 0,
+                'distributed_lock': True
+                }
+        )
+
+    Accepts the same arguments as :class:`.RedisBackend`, except that a
+    ``connection_pool``, if provided, must be a ``redis.asyncio``
+    connection pool, and that the lock options listed in
+    ``unsupported_arguments`` raise ``NotImplementedError``.
+
+    """
+
+    # the lock options whose mutexes and scripts are synchronous
+    unsupported_arguments = ('lock_notify', 'lock_scripts', 'lock_watchdog',
+                             'adaptive_lock_timeout', 'lock_dir')
+
+    def __init__(self, arguments):
+        for name in self.unsupported_arguments:
+            if arguments.get(name):
+                raise NotImplementedError('AsyncRedisBackend does not '
+                                          'support {0}'.format(name))
+        super(AsyncRedisBackend, self).__init__(arguments)
+
+    def _imports(self):
+        # defer imports until backend is used
+        global aioredis
+        import redis.asyncio as aioredis  # noqa
+
+    def _create_client(self, max_connections=None):
+        return self._client(aioredis, max_connections or self.max_connections)
+
+    def warm_up(self, count):
+        raise NotImplementedError('AsyncRedisBackend does not support '
+                                  'warm_connections')
+
+    def _auto_pipeline_client(self, client):
+        raise NotImplementedError('AsyncRedisBackend does not support '
+                                  'auto_pipeline')
+
+    def get_mutex(self, key):
+        if self.distributed_lock:
+            return AsyncRedisMutex(self.client.lock(u('_lock{0}').format(key),
+                                                    self.lock_timeout,
+                                                    self.lock_sleep,
+                                                    thread_local=False))
+        else:
+            return None
+
+    async def get(self, key):
+        return await self.client.get(key)
+
+    async def get_multi(self, keys):
+        if not keys:
+            return []
+        return await self.client.mget(keys)
+
+    async def set(self, key, value, expiration):
+        await self.client.set(key, value, ex=expiration)
+
+    async def set_multi(self, mapping, expiration):
+        if not mapping:
+            return
+
+        pipe = self.client.pipeline(transaction=False)
+        for key, value in mapping.items():
+            if isinstance(expiration, dict):
+                ex = expiration.get(key)
+            else:
+                ex = expiration
+            pipe.set(key, value, ex=ex)
+        await pipe.execute()
+
+    async def hmset(self, name, mapping, expiration):
+        pipe = self.client.pipeline()
+        pipe.hset(name, mapping=mapping)
+        pipe.expire(name, expiration)
+        return await pipe.execute()
+
+    async def hmget(self, name, keys):
+        return await self.client.hmget(name, keys)
+
+    async def hupdate(self, name, mapping, deleted=(), expiration=None):
+        return bool(await self._hupdate(keys=[name], args=hupdate_args(
+            mapping, deleted, expiration)))
+
+    async def hgetall(self, name):
+        return decode_fields(await self.client.hgetall(name))
+
+    async def hmget_exists(self, name, keys):
+        pipe = self.client.pipeline(transaction=False)
+        pipe.exists(name)
+        pipe.hmget(name, keys)
+        exists, values = await pipe.execute()
+        return bool(exists), values
+
+    async def execute_batch(self, ops):
+        pipe = self.client.pipeline(transaction=False)
+        queue_batch(pipe, ops)
+        return await pipe.execute()
+
+    async def delete(self, key):
+        await self.client.delete(key)
+
+    async def delete_multi(self, keys):
+        await self._delete_multi(keys, self.client)
+
+    async def _delete_multi(self, keys, client):
+        keys = list(keys)
+        if not keys:
+            return
+
+        if self._use_unlink:
+            try:
+                await self._delete_chunks(keys, 'unlink', client)
+                return
+            except aioredis.ResponseError as exc:
+                if 'unknown command' not in str(exc).lower():
+                    raise
+                self._use_unlink = False
+
+        await self._delete_chunks(keys, 'delete', client)
+
+    async def _delete_chunks(self, keys, command, client):
+        size = self.delete_chunk_size
+        pipe = client.pipeline(transaction=False)
+        for i in range(0, len(keys), size):
+            getattr(pipe, command)(*keys[i:i + size])
+        await pipe.execute()
+
+    async def keys(self, pattern):
+        """
+        Returns a list of keys (bytestrings) matching pattern, obtained
+        incrementally using SCAN rather than KEYS
+        """
+        return [key async for key in self.iter_keys(pattern)]
+
+    def iter_keys(self, pattern, count=None):
+        """
+        Returns an asynchronous iterator over the keys (bytestrings)
+        matching pattern, using a cursor-based SCAN.  A key may be yielded
+        more than once.
+        """
+        return self.bulk_client.scan_iter(match=pattern,
+                                          count=count or self.scan_count)
+
+    async def delete_pattern(self, pattern, count=None):
+        """
+        Removes every key matching pattern, deleting the keys returned by
+        each SCAN before requesting the next page, using the bulk connection
+        pool
+
+        :returns: the number of keys sent for deletion
+        """
+        deleted = 0
+        cursor = None
+        while cursor != 0:
+            cursor, keys = await self.bulk_client.scan(
+                cursor or 0, match=pattern, count=count or self.scan_count)
+            if keys:
+                await self._delete_multi(keys, self.bulk_client)
+                deleted += len(keys)
+        return deleted
+
+    async def exists(self, key):
+        return await self.client.exists(key)
+
+    async def incr(self, key):
+        return await self.client.incr(key)
+
+    async def get_counters(self, keys):
+        if not keys:
+            return []
+        return [int(value or 0) for value in await self.client.mget(keys)]
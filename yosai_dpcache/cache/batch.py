@@ -0,0 +1,140 @@
+"""
+Batches
+-------
+
+Provides :class:`.Batch`, returned by :meth:`.CacheRegion.batch`, which
+queues region operations and sends them to the backend together, as a
+single pipeline on Redis.
+
+"""
+
+from . import exception
+
+
+class BatchResult(object):
+    """The result of an operation queued in a :class:`.Batch`, which is
+    available once the batch has run."""
+
+    def __init__(self, convert=None):
+        self._convert = convert
+        self._done = False
+        self._value = None
+
+    def done(self):
+        return self._done
+
+    def result(self):
+        if not self._done:
+            raise exception.BatchNotExecuted(
+                "The batch of this result hasn't run yet.")
+        return self._value
+
+    def _resolve(self, value):
+        self._value = self._convert(value) if self._convert else value
+        self._done = True
+
+
+class Batch(object):
+    """Queues the ``get``, ``set``, ``delete`` and ``hmget`` operations
+    of a :class:`.CacheRegion`, which are sent to its backend in a single
+    call, and so in a single round trip on Redis, when the batch runs.
+    Each operation returns a :class:`.BatchResult`.
+
+    Usage::
+
+        with region.batch() as batch:
+            session = batch.get(session_key)
+            credentials = batch.get(credentials_key)
+            batch.set(authz_key, authz_info)
+
+        session.result()
+
+    The batch runs as the ``with`` block exits, unless it exits with an
+    exception, in which case the queued operations are discarded.  Values
+    pass through the region's proxies, such as a
+    :class:`.SerializationProxy`, as they do outside a batch.  Operations
+    run in the order queued, so a ``get`` sees a ``set`` of the same key
+    queued before it.
+    """
+
+    def __init__(self, region):
+        self.region = region
+        self._ops = []
+        self._results = []
+
+    def _key(self, key):
+        if self.region.key_mangler:
+            return self.region.key_mangler(key)
+        return key
+
+    def _queue(self, name, args, convert=None):
+        result = BatchResult(convert)
+        self._ops.append((name, args))
+        self._results.append(result)
+        return result
+
+    def get(self, key):
+        """Queue a :meth:`.CacheRegion.get`."""
+        return self._queue('get', (self._key(key),), self.region._unwrap)
+
+    def set(self, key, value, expiration=None):
+        """Queue a :meth:`.CacheRegion.set`."""
+        region = self.region
+        return self._queue('set', (self._key(key), region._value(value),
+                                   region._backend_expiration(expiration)),
+                           lambda value: None)
+
+    def delete(self, key):
+        """Queue a :meth:`.CacheRegion.delete`."""
+        return self._queue('delete', (self._key(key),), lambda value: None)
+
+    def hmget(self, name, keys):
+        """Queue a read of the ``keys`` fields of the hash ``name``."""
+        return self._queue('hmget', (self._key(name), list(keys)))
+
+    def _take(self):
+        ops, results = self._ops, self._results
+        self._ops, self._results = [], []
+        return ops, results
+
+    def execute(self):
+        """Run the queued operations, resolving their results."""
+        ops, results = self._take()
+        if ops:
+            for result, value in zip(results,
+                                     self.region.backend.execute_batch(ops)):
+                result._resolve(value)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, type, value, traceback):
+        if type is None:
+            self.execute()
+        else:
+            self._take()
+
+
+class AsyncBatch(Batch):
+    """The :class:`.Batch` of an :class:`.AsyncCacheRegion`, used with
+    ``async with``."""
+
+    async def execute(self):
+        ops, results = self._take()
+        if ops:
+            values = await self.region.backend.execute_batch(ops)
+            for result, value in zip(results, values):
+                result._resolve(value)
+
+    def __enter__(self):
+        raise TypeError("Use 'async with' with the batch of an "
+                        "AsyncCacheRegion")
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, type, value, traceback):
+        if type is None:
+            await self.execute()
+        else:
+            self._take()
@@ -0,0 +1,344 @@
+"""
+Bloom Filters
+-------------
+
+Provides :class:`.BloomFilterProxy`, which answers lookups for keys that
+were never cached without a round trip to the backend, using either an
+in-process :class:`.BloomFilter` or a :class:`.RedisBloomFilter` shared by
+every process.
+
+"""
+
+import fnmatch
+import hashlib
+import math
+import struct
+import time
+import uuid
+
+from yosai_dpcache.cache import ProxyBackend
+from yosai_dpcache.cache.api import CachedValue, NEGATIVE_VALUE
+from yosai_dpcache.cache.compat import threading
+
+_hashes = struct.Struct('!QQ')
+
+
+def _set_bits(bits, positions):
+    # the bits of each byte are numbered from the most significant one, as
+    # Redis numbers those of a string
+    for p in positions:
+        bits[p >> 3] |= 0x80 >> (p & 7)
+
+
+def _negative(value):
+    if isinstance(value, CachedValue):
+        value = value.payload
+    return value is NEGATIVE_VALUE
+
+
+class BloomFilter(object):
+    """An in-process Bloom filter:  a set of keys that may report that a key
+    it doesn't hold is present, at a rate of about ``error_rate`` while it
+    holds no more than ``capacity`` keys, but never reports that a key it
+    holds is absent.
+
+    :param capacity: the number of keys that the filter is sized for
+    :param error_rate: the target false positive rate at capacity
+    """
+
+    def __init__(self, capacity=100000, error_rate=0.01):
+        self.capacity = capacity
+        self.error_rate = error_rate
+        self.num_bits = int(math.ceil(
+            -capacity * math.log(error_rate) / math.log(2) ** 2))
+        self.num_hashes = max(1, int(round(
+            self.num_bits / float(capacity) * math.log(2))))
+        self._bits = bytearray(self._num_bytes)
+        self._lock = threading.Lock()
+        # the positions added while each rebuild or refresh in progress
+        # loads the bits that replace the filter's
+        self._rebuilds = []
+
+    @property
+    def _num_bytes(self):
+        return (self.num_bits + 7) // 8
+
+    def positions(self, key):
+        """Return the bit positions of key, by double hashing."""
+        if not isinstance(key, bytes):
+            key = str(key).encode('utf-8')
+        h1, h2 = _hashes.unpack_from(hashlib.sha1(key).digest())
+        return [(h1 + i * h2) % self.num_bits
+                for i in range(self.num_hashes)]
+
+    def add(self, key):
+        self.add_many([key])
+
+    def add_many(self, keys):
+        self._add([p for key in keys for p in self.positions(key)])
+
+    def _add(self, positions):
+        with self._lock:
+            _set_bits(self._bits, positions)
+            for added in self._rebuilds:
+                added.extend(positions)
+
+    def __contains__(self, key):
+        bits = self._bits
+        return all(bits[p >> 3] & (0x80 >> (p & 7))
+                   for p in self.positions(key))
+
+    def _replace(self, load):
+        """Replace the bits of the filter with those returned by load, and
+        with the positions added while it runs."""
+        added = []
+        with self._lock:
+            self._rebuilds.append(added)
+        bits = None
+        try:
+            bits = load()
+        finally:
+            with self._lock:
+                self._rebuilds.remove(added)
+                if bits is not None:
+                    _set_bits(bits, added)
+                    self._bits = bits
+
+    def rebuild(self, keys):
+        """Replace the contents of the filter with keys, and with the keys
+        added while they are enumerated."""
+        def load():
+            bits = bytearray(self._num_bytes)
+            for key in keys:
+                _set_bits(bits, self.positions(key))
+            return bits
+        self._replace(load)
+
+
+class RedisBloomFilter(BloomFilter):
+    """A Bloom filter whose bits are stored in a Redis string, so that every
+    process sharing it sees the keys added by the others.
+
+    Membership is tested against a copy of the bits held in process, so
+    that it costs no round trip.  The copy is replaced by a GET of the
+    string once ``refresh_interval`` seconds have passed since it was last
+    read, by the first lookup to find it due;  the keys added by the
+    process itself are set in the copy as they are added.  A key added by
+    another process may thus be reported absent for up to
+    ``refresh_interval`` seconds, at the cost of a lookup that misses a
+    value already cached.
+
+    :param client: a redis-py client
+    :param name: the Redis key under which the bits are stored
+    :param refresh_interval: the number of seconds after which the copy of
+     the bits is read again
+    """
+
+    def __init__(self, client, name='yosai_dpcache:bloom', capacity=100000,
+                 error_rate=0.01, refresh_interval=1.0):
+        super(RedisBloomFilter, self).__init__(capacity, error_rate)
+        self.client = client
+        self.name = name
+        self.refresh_interval = refresh_interval
+        self._refresh_lock = threading.Lock()
+        self.refresh()
+
+    def add_many(self, keys):
+        positions = [p for key in keys for p in self.positions(key)]
+        pipe = self.client.pipeline(transaction=False)
+        for p in positions:
+            pipe.setbit(self.name, p, 1)
+        pipe.execute()
+        self._add(positions)
+
+    def __contains__(self, key):
+        if time.time() >= self._refresh_at:
+            # one lookup refreshes the copy while the others use it as is
+            if self._refresh_lock.acquire(False):
+                try:
+                    self.refresh()
+                finally:
+                    self._refresh_lock.release()
+        return super(RedisBloomFilter, self).__contains__(key)
+
+    def refresh(self):
+        """Replace the copy of the bits with those stored in Redis, keeping
+        the keys added meanwhile."""
+        self._refresh_at = time.time() + self.refresh_interval
+
+        def load():
+            size = self._num_bytes
+            bits = bytearray(self.client.get(self.name) or b'')[:size]
+            # SETBIT creates the string only as long as its highest bit
+            bits.extend(bytearray(size - len(bits)))
+            return bits
+        self._replace(load)
+
+    def rebuild(self, keys):
+        """Add keys to the filter.  They are set under a temporary key of
+        this rebuild's own, which is then merged into the shared filter with
+        a BITOP OR, so that the keys that other processes add meanwhile, or
+        that a concurrent rebuild adds, are kept.
+
+        Unlike that of an in-process filter, a rebuild doesn't drop the keys
+        that no longer exist, since the filter can't tell them from those
+        being added by another process;  delete its key to start afresh.
+        """
+        temp_name = '{0}:rebuild:{1}'.format(self.name, uuid.uuid4().hex)
+        try:
+            pipe = self.client.pipeline(transaction=False)
+            for key in keys:
+                for p in self.positions(key):
+                    pipe.setbit(temp_name, p, 1)
+                if len(pipe) >= 10000:
+                    pipe.execute()
+            pipe.execute()
+            self.client.bitop('OR', self.name, self.name, temp_name)
+        finally:
+            self.client.delete(temp_name)
+        self.refresh()
+
+
+class BloomFilterProxy(ProxyBackend):
+    """Tracks which keys matching ``key_pattern`` have been cached, so that a
+    get for one that never was returns None without consulting the wrapped
+    backend.  Keys that don't match the pattern are passed through.
+
+    Every key set through the proxy is added to the filter before it is
+    written to the backend, so that it is in the filter by the time it is
+    in the backend, even for a lookup made while it is written.  Deleted or
+    expired keys can't be removed from a Bloom filter, so they cost a
+    backend lookup as before.  Keys cached with the :data:`.NEGATIVE_VALUE`
+    token aren't added, as they stand for objects that don't exist.
+    :meth:`.rebuild` adds the keys found by a SCAN of the backend, such as
+    those cached before the filter was deployed;  being a full-keyspace
+    SCAN, it runs as the proxy wraps the backend only when ``rebuild`` is
+    True.
+
+    In front of Redis the filter is, by default, a :class:`.RedisBloomFilter`
+    shared by every process.  Each process tests its lookups against a copy
+    of the filter, read again every ``refresh_interval`` seconds, so that
+    they cost no round trip;  a key cached by another process meanwhile may
+    be reported absent until the next refresh.  An in-process
+    filter knows only of the keys set by its own process, so in front of a
+    backend shared with other processes the proxy doesn't trust its misses
+    and passes every lookup through;  it suits a process-local backend such
+    as ``yosai_dpcache.memory``.
+
+    Usage::
+
+        region = make_region().configure(
+            'yosai_dpcache.redis',
+            wrap=[(BloomFilterProxy, None, 'yosai:*:credentials*'),
+                  (SerializationProxy, sm.serialize, sm.deserialize)]
+        )
+
+    :param bloom_filter: a :class:`.BloomFilter`.  When None, one is created
+     with ``capacity`` and ``error_rate``:  a :class:`.RedisBloomFilter`
+     using the client of the wrapped backend when ``shared`` is True and
+     the backend has a Redis client, or else an in-process
+     :class:`.BloomFilter`.
+    :param key_pattern: a glob-style pattern matching the keys to filter,
+     defaulting to those of the credentials domain
+    :param capacity: the number of keys that a created filter is sized for
+    :param error_rate: the false positive rate of a created filter
+    :param shared: whether a created filter is stored in Redis
+    :param rebuild: whether to add the backend's keys to the filter once
+     the proxy wraps it
+    :param refresh_interval: the number of seconds after which a created
+     :class:`.RedisBloomFilter` reads its bits again
+    """
+
+    def __init__(self, bloom_filter=None, key_pattern='yosai:*:credentials*',
+                 capacity=100000, error_rate=0.01, shared=True, rebuild=False,
+                 refresh_interval=1.0):
+        super(BloomFilterProxy, self).__init__()
+        self.bloom_filter = bloom_filter
+        self.key_pattern = key_pattern
+        self.capacity = capacity
+        self.error_rate = error_rate
+        self.shared = shared
+        self.rebuild_on_wrap = rebuild
+        self.refresh_interval = refresh_interval
+        self.definite = True
+
+    def wrap(self, backend):
+        proxy = super(BloomFilterProxy, self).wrap(backend)
+        while isinstance(backend, ProxyBackend):
+            backend = backend.proxied
+        client = getattr(backend, 'client', None)
+        if self.bloom_filter is None:
+            if self.shared and client is not None:
+                self.bloom_filter = RedisBloomFilter(
+                    client, capacity=self.capacity,
+                    error_rate=self.error_rate,
+                    refresh_interval=self.refresh_interval)
+            else:
+                self.bloom_filter = BloomFilter(self.capacity,
+                                                self.error_rate)
+        # an in-process filter can't know of the keys that other processes
+        # set in a shared backend, so its misses aren't definite there
+        self.definite = (client is None or
+                         isinstance(self.bloom_filter, RedisBloomFilter))
+        if self.rebuild_on_wrap:
+            self.rebuild()
+        return proxy
+
+    def _filtered(self, key):
+        if isinstance(key, bytes):
+            key = key.decode('utf-8')
+        return fnmatch.fnmatchcase(key, self.key_pattern)
+
+    def _absent(self, key):
+        return (self.definite and self._filtered(key) and
+                key not in self.bloom_filter)
+
+    def rebuild(self):
+        """Add the keys matching ``key_pattern`` to the filter, from a SCAN
+        of the backend."""
+        self.bloom_filter.rebuild(self.proxied.iter_keys(self.key_pattern))
+
+    def get(self, key):
+        if self._absent(key):
+            return None
+        return self.proxied.get(key)
+
+    def get_multi(self, keys):
+        present = [key for key in keys if not self._absent(key)]
+        values = dict(zip(present, self.proxied.get_multi(present)
+                          if present else []))
+        return [values.get(key) for key in keys]
+
+    def execute_batch(self, ops):
+        absent, written = [], set()
+        for name, args in ops:
+            if name == 'set':
+                written.add(args[0])
+            absent.append(name == 'get' and args[0] not in written and
+                          self._absent(args[0]))
+        keys = [args[0] for name, args in ops
+                if name == 'set' and self._filtered(args[0]) and
+                not _negative(args[1])]
+        if keys:
+            self.bloom_filter.add_many(keys)
+
+        sent = [op for op, skip in zip(ops, absent) if not skip]
+        results = iter(self.proxied.execute_batch(sent) if sent else [])
+        return [None if skip else next(results) for skip in absent]
+
+    def set(self, key, value, expiration):
+        if self._filtered(key) and not _negative(value):
+            self.bloom_filter.add(key)
+        self.proxied.set(key, value, expiration)
+
+    def set_and_release(self, key, value, expiration, lease):
+        if self._filtered(key) and not _negative(value):
+            self.bloom_filter.add(key)
+        self.proxied.set_and_release(key, value, expiration, lease)
+
+    def set_multi(self, mapping, expiration):
+        keys = [key for key, value in mapping.items()
+                if self._filtered(key) and not _negative(value)]
+        if keys:
+            self.bloom_filter.add_many(keys)
+        self.proxied.set_multi(mapping, expiration)
@@ -26,23 +26,102 @@ from yosai_dpcache.cache import (
     CacheSettings,
     SerializationProxy,
 )
+from yosai_dpcache.cache.api import NEGATIVE_VALUE
+from yosai_dpcache.cache.bloom import BloomFilterProxy
+from yosai_dpcache.cache.generations import KeyGenerations
+from yosai_dpcache.cache.nearcache import NearCacheProxy
+from yosai_dpcache.cache.writebehind import WriteBehindProxy
+
+
+def positive(value):
+    """Return None in place of a cached negative value."""
+    return None if value is NEGATIVE_VALUE else value
 
 
 class DPCacheHandler(cache_abcs.CacheHandler):
 
+    # the region and serialization proxy that create_cache_region configures
+    region_factory = staticmethod(make_region)
+    serialization_proxy = SerializationProxy
+
+    # the domains given a ttl of their own by the ttl settings (see get_ttl)
+    ttl_domains = ('credentials', 'authz_info', 'session')
+
     def __init__(self, settings=None, ttl=None, region_name=None, backend=None,
-                 region_arguments=None, serialization_manager=None):
+                 region_arguments=None, serialization_manager=None,
+                 async_creation_runner=None, bloom_filter=None,
+                 write_behind=None, identifier_domains=None,
+                 near_cache=None):
         """
         You may either explicitly configure the CacheHandler or default to
         settings defined in a yaml file.
+
+        An async_creation_runner, such as a ThreadPoolCreationRunner,
+        regenerates stale values in the background and requires a
+        stale_grace_time to be configured.
+
+        Configuring a generation_local_ttl enables generation counters (see
+        invalidate_domain), which are cached in process memory for that many
+        seconds.  identifier_generations additionally gives each identifier
+        within a domain a counter of its own.
+
+        Configuring a negative_ttl, or a per-domain ttl such as
+        credentials_negative_ttl, enables negative caching:  when
+        get_or_create's creator_func finds no object, that absence is cached
+        for the negative ttl so that the lookups that follow don't reach the
+        creator_func again.
+
+        bloom_filter, a dict that may specify a capacity, an error_rate,
+        whether the filter is shared through Redis (the default), how often
+        each process reads the shared filter again (refresh_interval) and
+        whether to rebuild it from a SCAN of the cached credentials at
+        startup, places a BloomFilterProxy in front of the credentials domain
+        so that lookups of identifiers that were never cached don't reach
+        the backend.
+
+        write_behind, a dict that may specify a flush_interval and a
+        max_pending, places a WriteBehindProxy in front of the backend so that
+        sets and deletes are queued and written in the background.
+
+        near_cache, a dict that may specify a max_size, a local_ttl and a
+        num_shards, places a NearCacheProxy in front of the backend so that
+        recently used objects are read from process memory, de-serialized.
+        Their copies on other processes are evicted over Redis pub/sub when
+        they change.
+
+        identifier_domains lists the domains that invalidate_identifier
+        clears by default, defaulting to the ttl_domains.
         """
-        if not all([ttl, region_name, region_arguments]):
+        self.async_creation_runner = async_creation_runner
+        self.bloom_filter = bloom_filter
+        self.write_behind = write_behind
+        self.near_cache = near_cache
+        self.identifier_domains = identifier_domains or self.ttl_domains
+
+        if None in (ttl, region_name, region_arguments):
             cache_settings = CacheSettings(settings)
             self.absolute_ttl = cache_settings.absolute_ttl
             self.credentials_ttl = cache_settings.credentials_ttl
             self.authz_info_ttl = cache_settings.authz_info_ttl
             self.session_ttl = cache_settings.session_abs_ttl
+            self.stale_grace_time = cache_settings.stale_grace_time
+            self.early_expiration_beta = cache_settings.early_expiration_beta
+            self.generation_local_ttl = cache_settings.generation_local_ttl
+            self.identifier_generations = \
+                cache_settings.identifier_generations
+            self.negative_ttl = cache_settings.negative_ttl
+            self.credentials_negative_ttl = \
+                cache_settings.credentials_negative_ttl
             self.region_name = cache_settings.region_name
+            if bloom_filter is None:
+                self.bloom_filter = cache_settings.bloom_filter
+            if write_behind is None:
+                self.write_behind = cache_settings.write_behind
+            if near_cache is None:
+                self.near_cache = cache_settings.near_cache
+            self.identifier_domains = (identifier_domains or
+                                       cache_settings.identifier_domains or
+                                       self.ttl_domains)
             self.backend = cache_settings.backend
             self.region_arguments = cache_settings.region_arguments
         else:
@@ -50,6 +129,14 @@ class DPCacheHandler(cache_abcs.CacheHandler):
             self.credentials_ttl = ttl.get('credentials_ttl', 10)
             self.authz_info_ttl = ttl.get('authz_info_ttl', 60)
             self.session_ttl = ttl.get('session_abs_ttl', 60)
+            self.stale_grace_time = ttl.get('stale_grace_time')
+            self.early_expiration_beta = ttl.get('early_expiration_beta')
+            self.generation_local_ttl = ttl.get('generation_local_ttl')
+            self.identifier_generations = ttl.get('identifier_generations',
+                                                  False)
+            self.negative_ttl = ttl.get('negative_ttl')
+            self.credentials_negative_ttl = ttl.get('credentials_negative_ttl',
+                                                    self.negative_ttl)
             self.region_name = region_name
             self.backend = backend
             self.region_arguments = region_arguments
@@ -59,6 +146,7 @@ class DPCacheHandler(cache_abcs.CacheHandler):
         else:
             self._serialization_manager = None
             self.cache_region = None  # initializes when serialization_manager is set
+            self.generations = None
 
     @property
     def serialization_manager(self):
@@ -68,17 +156,30 @@ class DPCacheHandler(cache_abcs.CacheHandler):
     def serialization_manager(self, manager):
         self._serialization_manager = manager
         self.cache_region = self.create_cache_region(name=self.region_name)
+        self.generations = self.create_generations()
 
     def create_cache_region(self, name):
         sm = self.serialization_manager
 
         try:
-            cache_region = make_region(name=name)
+            wrap = [(self.serialization_proxy, sm.serialize, sm.deserialize)]
+            # an empty dict of options enables a proxy with its defaults
+            if self.bloom_filter is not None:
+                wrap.insert(0, self.bloom_filter_proxy())
+            if self.near_cache is not None:
+                wrap.insert(0, self.near_cache_proxy())
+            if self.write_behind is not None:
+                wrap.insert(0, self.write_behind_proxy())
+
+            cache_region = self.region_factory(
+                name=name, async_creation_runner=self.async_creation_runner)
             cache_region.configure(backend=self.backend,
                                    expiration_time=self.absolute_ttl,
                                    arguments=self.region_arguments,
-                                   wrap=[(SerializationProxy,
-                                          sm.serialize, sm.deserialize)])
+                                   wrap=wrap,
+                                   stale_grace_time=self.stale_grace_time,
+                                   early_expiration_beta=(
+                                       self.early_expiration_beta))
         except AttributeError:
             msg = 'Failed to Initialize a CacheRegion. {one}'.\
                 format(one='serialization_manager not set'
@@ -87,18 +188,87 @@ class DPCacheHandler(cache_abcs.CacheHandler):
 
         return cache_region
 
+    def bloom_filter_proxy(self):
+        """
+        :returns: the wrap entry of the BloomFilterProxy for the credentials
+                  domain
+        """
+        options = self.bloom_filter
+        return (BloomFilterProxy, None,
+                "yosai:*:credentials*",
+                options.get('capacity', 100000),
+                options.get('error_rate', 0.01),
+                options.get('shared', True),
+                options.get('rebuild', False),
+                options.get('refresh_interval', 1.0))
+
+    def near_cache_proxy(self):
+        """
+        :returns: the wrap entry of the NearCacheProxy
+        """
+        options = self.near_cache
+        return (NearCacheProxy, None,
+                options.get('max_size', 1000),
+                options.get('local_ttl', 30),
+                options.get('num_shards', 8))
+
+    def write_behind_proxy(self):
+        """
+        :returns: the wrap entry of the WriteBehindProxy
+        """
+        options = self.write_behind
+        return (WriteBehindProxy,
+                options.get('flush_interval', 0.05),
+                options.get('max_pending', 10000))
+
+    def create_generations(self):
+        if self.generation_local_ttl is None:
+            return None
+        return KeyGenerations(self.cache_region,
+                              local_ttl=self.generation_local_ttl,
+                              per_identifier=self.identifier_generations)
+
     def get_ttl(self, key):
         return getattr(self, key + '_ttl', self.absolute_ttl)
 
-    def generate_key(self, identifier, domain):
+    def get_negative_ttl(self, key):
+        return getattr(self, key + '_negative_ttl', self.negative_ttl)
+
+    def _base_key(self, identifier, domain):
         # simple for now yet TBD:
         return "yosai:{0}:{1}".format(identifier, domain)
 
+    def generate_key(self, identifier, domain):
+        full_key = self._base_key(identifier, domain)
+        if self.generations is not None:
+            full_key += self.generations.suffixes([(domain, identifier)])[0]
+        return full_key
+
+    def invalidate_domain(self, domain, identifier=None):
+        """
+        Invalidates every cached object of a domain or, when identifier is
+        given, of that identifier within the domain.
+
+        When generation counters are enabled, this is a single INCR:  the
+        domain's keys move on to a new generation and the entries of the
+        old one expire by their ttl.  Otherwise, the domain's keys are
+        removed with a SCAN-based delete_pattern.  An identifier's key is
+        deleted, unless identifier_generations gives it a counter of its
+        own.
+        """
+        if self.generations is not None and (
+                identifier is None or self.generations.per_identifier):
+            self.generations.incr(domain, identifier)
+        elif identifier is not None:
+            self.delete(domain, identifier)
+        else:
+            self.delete_pattern("yosai:*:{0}".format(domain))
+
     def get(self, domain, identifier):
         if identifier is None:
             return
         full_key = self.generate_key(identifier, domain)
-        return self.cache_region.get(full_key)
+        return positive(self.cache_region.get(full_key))
 
     def get_or_create(self, domain, identifier, creator_func, creator):
         """
@@ -120,12 +290,15 @@ class DPCacheHandler(cache_abcs.CacheHandler):
             return
         full_key = self.generate_key(identifier, domain)
         ttl = self.get_ttl(domain)
-        return self.cache_region.get_or_create(key=full_key,
-                                               creator_func=creator_func,
-                                               creator=creator,
-                                               expiration=ttl)
+        return positive(self.cache_region.get_or_create(
+            key=full_key,
+            creator_func=creator_func,
+            creator=creator,
+            expiration=ttl,
+            negative_expiration=self.get_negative_ttl(domain)))
 
-    def hmget_or_create(self, domain, identifier, keys, creator_func, creator):
+    def hmget_or_create(self, domain, identifier, keys, creator_func, creator,
+                        field_creator_func=None):
         """
         This method will try to obtain an object from cache.  If the object is
         not available from cache, the creator_func function is called to generate
@@ -140,16 +313,24 @@ class DPCacheHandler(cache_abcs.CacheHandler):
         :type creator_func:  function
 
         :param creator: the object calling get_or_create
+
+        :param field_creator_func: Optional.  The function called, as
+                                   field_creator_func(creator, missing_fields),
+                                   to create the requested fields missing from
+                                   a cached hash.  It returns a dict, and the
+                                   fields it creates are added to the hash.
         """
         if identifier is None:
             return
         full_key = self.generate_key(identifier, domain)
         ttl = self.get_ttl(domain)
-        return self.cache_region.hmget_or_create(key=full_key,
-                                                 keys=keys,
-                                                 creator_func=creator_func,
-                                                 creator=creator,
-                                                 expiration=ttl)
+        return self.cache_region.hmget_or_create(
+            key=full_key,
+            keys=keys,
+            creator_func=creator_func,
+            creator=creator,
+            expiration=ttl,
+            field_creator_func=field_creator_func)
 
     def set(self, domain, identifier, value):
         """
@@ -161,6 +342,50 @@ class DPCacheHandler(cache_abcs.CacheHandler):
         ttl = self.get_ttl(domain)
         self.cache_region.set(full_key, value, expiration=ttl)
 
+    def get_hash(self, domain, identifier):
+        """
+        Obtains an object cached as a hash, such as a session whose
+        attributes are stored as fields
+
+        :returns: a TrackedHash, which records the fields changed through
+                  it so that set_hash writes only those, or None
+        """
+        if identifier is None:
+            return
+        full_key = self.generate_key(identifier, domain)
+        return self.cache_region.get_hash(full_key)
+
+    def set_hash(self, domain, identifier, value):
+        """
+        Caches an object as a hash, resetting its ttl.  When value is a
+        TrackedHash obtained from get_hash, only the fields changed through
+        it are written.
+
+        :param value:  a dict or TrackedHash of field values
+        """
+        if identifier is None or value is None:
+            return
+        full_key = self.generate_key(identifier, domain)
+        ttl = self.get_ttl(domain)
+        self.cache_region.set_hash(full_key, value, expiration=ttl)
+
+    def update_hash(self, domain, identifier, mapping, deleted=()):
+        """
+        Sets the fields of mapping within a cached hash, and deletes the
+        deleted fields, resetting its ttl, without first reading the hash.
+        Suits frequent small updates, such as of a session's last access
+        time.
+
+        :returns: whether the hash was cached and so updated.  A hash that
+                  isn't cached is left uncached, to be written in full.
+        """
+        if identifier is None:
+            return False
+        full_key = self.generate_key(identifier, domain)
+        ttl = self.get_ttl(domain)
+        return self.cache_region.hupdate(full_key, mapping, deleted,
+                                         expiration=ttl)
+
     def delete(self, domain, identifier):
         """
         Removes an object from cache
@@ -170,12 +395,177 @@ class DPCacheHandler(cache_abcs.CacheHandler):
         full_key = self.generate_key(identifier, domain)
         self.cache_region.delete(full_key)
 
+    def generate_keys(self, domain, identifier):
+        """
+        Generates the full keys of a batch operation.  Either ``domain`` is a
+        single domain and ``identifier`` a list of identifiers, or ``domain``
+        is a list of domains and ``identifier`` a single identifier.
+
+        :returns: a list of (domain, identifier, full_key) tuples, ordered as
+                  the list argument, in which full_key is None when the
+                  identifier is None
+        """
+        if isinstance(domain, (list, tuple)):
+            pairs = [(d, identifier) for d in domain]
+        else:
+            pairs = [(domain, i) for i in identifier]
+
+        if self.generations is None:
+            suffixes = [''] * len(pairs)
+        else:
+            # the generations of the whole batch are fetched at once
+            suffixes = self.generations.suffixes(
+                [pair for pair in pairs if pair[1] is not None])
+            suffixes.reverse()
+
+        return [(d, i, None if i is None else
+                 self._base_key(i, d) + suffixes.pop())
+                for d, i in pairs]
+
+    def get_many(self, domain, identifier):
+        """
+        Obtains multiple objects from cache using a single round trip.
+
+        :param domain: a domain, or a list of domains
+        :param identifier: a list of identifiers, or an identifier when
+                           domain is a list
+
+        :returns: a list of values ordered as the list argument
+        """
+        batch = self.generate_keys(domain, identifier)
+        full_keys = [full_key for _, _, full_key in batch if full_key]
+        values = dict(zip(full_keys, self.cache_region.get_multi(full_keys)))
+        return [positive(values.get(full_key)) for _, _, full_key in batch]
+
+    def get_or_create_many(self, domain, identifier, creator_func, creator):
+        """
+        The batch form of get_or_create.  All objects are obtained from cache
+        using a single round trip and dogpile locks are acquired only for
+        those that are missing.  creator_func is then called once, as
+        ``creator_func(creator, missing)``, where ``missing`` is the list of
+        identifiers (or domains, when domain is a list) whose objects need to
+        be created, and must return a list of objects corresponding to it.
+
+        :param domain: a domain, or a list of domains
+        :param identifier: a list of identifiers, or an identifier when
+                           domain is a list
+
+        :param creator_func: the function called to generate the missing
+                             Serializable objects for cache
+        :type creator_func:  function
+
+        :param creator: the object calling get_or_create_many
+
+        :returns: a list of values ordered as the list argument
+        """
+        keys, full_keys, batch_creator, ttl = self._get_or_create_many_args(
+            domain, identifier, creator_func)
+        values = dict(zip(full_keys, self.cache_region.get_or_create_multi(
+            keys=full_keys,
+            creator_func=batch_creator,
+            creator=creator,
+            expiration=ttl)))
+
+        return [positive(values.get(full_key)) for full_key in keys]
+
+    def _get_or_create_many_args(self, domain, identifier, creator_func):
+        """
+        :returns: the full key of each list item (None for an item without
+                  one), the full keys to obtain, the region-level
+                  creator_func and the ttl of each key for a
+                  get_or_create_many call
+        """
+        entries = self.generate_keys(domain, identifier)
+        batch = [entry for entry in entries if entry[2]]
+        by_domain = isinstance(domain, (list, tuple))
+        key_to_item = dict((full_key, d if by_domain else i)
+                           for d, i, full_key in batch)
+        ttl = dict((full_key, self.get_ttl(d)) for d, _, full_key in batch)
+
+        def batch_creator(creator, missing_keys):
+            return creator_func(creator,
+                                [key_to_item[key] for key in missing_keys])
+
+        return ([full_key for _, _, full_key in entries],
+                [full_key for _, _, full_key in batch], batch_creator, ttl)
+
+    def set_many(self, domain, identifier, values):
+        """
+        Caches multiple objects using a single round trip, applying the ttl
+        of each object's domain
+
+        :param domain: a domain, or a list of domains
+        :param identifier: a list of identifiers, or an identifier when
+                           domain is a list
+        :param values:  the Serializable objects to cache, ordered as the
+                        list argument
+        """
+        mapping, ttl = self._set_many_args(domain, identifier, values)
+        self.cache_region.set_multi(mapping, expiration=ttl)
+
+    def _set_many_args(self, domain, identifier, values):
+        """
+        :returns: the mapping of full keys to values and the ttl of each key
+                  for a set_many call
+        """
+        mapping = {}
+        ttl = {}
+        for (d, _, full_key), value in zip(
+                self.generate_keys(domain, identifier), values):
+            if full_key is None or value is None:
+                continue
+            mapping[full_key] = value
+            ttl[full_key] = self.get_ttl(d)
+        return mapping, ttl
+
+    def delete_many(self, domain, identifier):
+        """
+        Removes multiple objects from cache using a single round trip
+
+        :param domain: a domain, or a list of domains
+        :param identifier: a list of identifiers, or an identifier when
+                           domain is a list
+        """
+        full_keys = [full_key for _, _, full_key in
+                     self.generate_keys(domain, identifier) if full_key]
+        self.cache_region.delete_multi(full_keys)
+
+    def invalidate_identifier(self, identifier, domains=None):
+        """
+        Removes every object cached for an identifier, such as when a user
+        logs out or their roles change, using a single round trip
+
+        :param domains: the domains to clear, defaulting to
+                        identifier_domains
+        """
+        if identifier is None:
+            return
+        self.delete_many(list(domains or self.identifier_domains), identifier)
+
     def keys(self, pattern):
         """
         obtains keys from cache that match pattern
 
-        CAUTION:  use for debugging only as it is taxes redis hard and is slow
+        CAUTION:  this walks the entire keyspace.  Prefer iter_keys, which
+                  doesn't hold every matching key in memory at once
 
         :returns: list of bytestrings
         """
         return self.cache_region.keys(pattern)
+
+    def iter_keys(self, pattern, count=None):
+        """
+        obtains keys from cache that match pattern, incrementally
+
+        :returns: an iterator of bytestrings
+        """
+        return self.cache_region.iter_keys(pattern, count)
+
+    def delete_pattern(self, pattern, count=None):
+        """
+        removes every key from cache that matches pattern, such as all of the
+        keys of a tenant, in batches as they are found
+
+        :returns: the number of keys deleted
+        """
+        return self.cache_region.delete_pattern(pattern, count)
@@ -2,6 +2,7 @@ import sys
 
 py3k = sys.version_info >= (3, 0)
 py32 = sys.version_info >= (3, 2)
+py37 = sys.version_info >= (3, 7)
 
 try:
     import threading
@@ -15,3 +15,8 @@ class RegionNotConfigured(DogpileCacheException):
 
 class ValidationError(DogpileCacheException):
     """Error validating a value or option."""
+
+
+class BatchNotExecuted(DogpileCacheException):
+    """The result of a batched operation was requested before the batch
+    ran."""
@@ -0,0 +1,110 @@
+"""
+Key Generations
+---------------
+
+Provides :class:`.KeyGenerations`, namespace generation counters that
+invalidate every key of a domain, or of an identifier within a domain, with
+a single INCR.
+
+"""
+
+from .backends.memory import MemoryBackend
+
+
+class KeyGenerations(object):
+    """Generation counters folded into cache keys.
+
+    Each domain has a counter stored in the cache, and when
+    ``per_identifier`` is True so does each identifier within a domain.
+    The current generations are appended to the keys of that domain, so
+    incrementing a counter moves readers on to a fresh set of keys.  The
+    entries written under the previous generation are never read again and
+    simply expire by their ttl.
+
+    Counters are cached in process memory for ``local_ttl`` seconds, so an
+    invalidation made by another process takes effect here within that
+    time.  An invalidation made by this process takes effect immediately.
+
+    :param region: the :class:`.CacheRegion` in which the counters are
+     stored
+    :param local_ttl: the number of seconds that a counter is cached in
+     process memory
+    :param per_identifier: whether each identifier within a domain has a
+     counter of its own, in addition to the domain's counter.  Identifier
+     counters don't expire, so this adds one small key to the cache per
+     identifier that is ever invalidated.
+    :param prefix: the prefix of the keys under which counters are stored
+    :param max_size: the maximum number of counters cached in process memory
+    """
+
+    def __init__(self, region, local_ttl=5, per_identifier=False,
+                 prefix='yosai:generation', max_size=10000):
+        self.region = region
+        self.local_ttl = local_ttl
+        self.per_identifier = per_identifier
+        self.prefix = prefix
+        self.local = MemoryBackend({'max_size': max_size, 'num_shards': 8})
+
+    def counter_key(self, domain, identifier=None):
+        if identifier is None:
+            return "{0}:{1}".format(self.prefix, domain)
+        return "{0}:{1}:{2}".format(self.prefix, domain, identifier)
+
+    def _counter_keys(self, domain, identifier):
+        keys = [self.counter_key(domain)]
+        if self.per_identifier:
+            keys.append(self.counter_key(domain, identifier))
+        return keys
+
+    def get_counters(self, counter_keys):
+        """
+        :returns: the value of each counter, fetching those not cached in
+                  process memory with a single region call
+        """
+        counters = self.local.get_multi(counter_keys)
+        missing = sorted(set(key for key, value in
+                             zip(counter_keys, counters) if value is None))
+        if not missing:
+            return counters
+
+        fetched = dict(zip(missing, self.region.get_counters(missing)))
+        self.local.set_multi(fetched, self.local_ttl)
+        return [fetched[key] if value is None else value
+                for key, value in zip(counter_keys, counters)]
+
+    def suffixes(self, pairs):
+        """
+        :param pairs: a list of (domain, identifier) tuples
+
+        :returns: the generation suffix to append to the key of each pair,
+                  which is empty while none of its counters was incremented
+        """
+        counter_keys = [self._counter_keys(domain, identifier)
+                        for domain, identifier in pairs]
+        counters = iter(self.get_counters(
+            [key for keys in counter_keys for key in keys]))
+
+        suffixes = []
+        for keys in counter_keys:
+            generations = [next(counters) for _ in keys]
+            if any(generations):
+                suffixes.append(':g' + '.'.join(map(str, generations)))
+            else:
+                suffixes.append('')
+        return suffixes
+
+    def incr(self, domain, identifier=None):
+        """
+        Invalidates every key of the domain or, when identifier is given and
+        ``per_identifier`` is True, every key of the identifier within the
+        domain.
+
+        :returns: the new generation
+        """
+        if identifier is not None and not self.per_identifier:
+            raise ValueError('identifier generations require '
+                             'per_identifier=True')
+        counter_key = self.counter_key(domain, identifier)
+        generation = self.region.incr(counter_key)
+        self.local.set(counter_key, generation, self.local_ttl)
+        return generation
@@ -0,0 +1,130 @@
+"""
+Lock Leases
+-----------
+
+Provides :class:`.LeaseWatchdog`, which keeps the leases of held
+distributed locks from expiring while their creators run, and
+:class:`.LeaseTimes`, which sizes those leases from the time that locks
+of the same key prefix were previously held.
+
+"""
+
+import logging
+import time
+
+from .compat import threading
+
+logger = logging.getLogger(__name__)
+
+
+def default_lock_key_prefix(key):
+    """Group the keys of a :class:`.DPCacheHandler`,
+    ``yosai:{identifier}:{domain}``, by domain, as ``yosai:{domain}``.
+    Keys of any other form are grouped by their first component."""
+    parts = key.split(':')
+    if len(parts) >= 3:
+        return '{0}:{1}'.format(parts[0], parts[2])
+    return parts[0]
+
+
+class LeaseTimes(object):
+    """Records how long the locks of each key prefix are held, as a
+    maximum that decays by ``decay`` with each further observation so that
+    it follows a creator that becomes faster, and derives lease times from
+    it.
+
+    A decaying maximum rather than a mean is kept because most holds are
+    short:  a thread that acquires the lock only to find the value already
+    created holds it for just a round trip.
+
+    :param key_prefix: a function that maps a key to its prefix
+    :param factor: the multiple of the recorded hold time to lease for
+    :param decay: the factor applied to the recorded time per observation
+    :param max_prefixes: the maximum number of prefixes recorded
+    """
+
+    def __init__(self, key_prefix=default_lock_key_prefix, factor=2.0,
+                 decay=0.9, max_prefixes=1000):
+        self.key_prefix = key_prefix
+        self.factor = factor
+        self.decay = decay
+        self.max_prefixes = max_prefixes
+        self._held = {}
+        self._lock = threading.Lock()
+
+    def record(self, key, duration):
+        prefix = self.key_prefix(key)
+        with self._lock:
+            recorded = self._held.get(prefix)
+            if recorded is None:
+                if len(self._held) >= self.max_prefixes:
+                    return
+                recorded = duration
+            self._held[prefix] = max(duration, recorded * self.decay)
+
+    def lease(self, key, minimum):
+        """Return the lease time for key, which is at least ``minimum``
+        seconds, or None when there is no minimum and no record."""
+        recorded = self._held.get(self.key_prefix(key))
+        if recorded is None:
+            return minimum
+        return max(minimum or 0, recorded * self.factor)
+
+
+class LeaseWatchdog(object):
+    """Renews the lease of every watched lock a third of the way through,
+    from a single daemon thread, until the lock is unwatched as it is
+    released.  A holder that crashes stops renewing, so its lock expires
+    within one lease.
+
+    A watched lock provides a ``renew()`` method that resets its lease, and
+    the lease time in seconds is given to :meth:`.watch`.
+    """
+
+    def __init__(self):
+        self._leases = {}
+        self._condition = threading.Condition()
+        self._thread = None
+
+    def watch(self, lock, lease):
+        with self._condition:
+            self._leases[lock] = (time.time() + lease / 3.0, lease)
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run,
+                                                name='LeaseWatchdog')
+                self._thread.daemon = True
+                self._thread.start()
+            self._condition.notify()
+
+    def unwatch(self, lock):
+        with self._condition:
+            self._leases.pop(lock, None)
+
+    def _due(self):
+        """Return the locks due for renewal, scheduling their next renewal,
+        and the time until the next lock falls due."""
+        now = time.time()
+        due = []
+        for lock, (renew_at, lease) in list(self._leases.items()):
+            if renew_at <= now:
+                due.append(lock)
+                self._leases[lock] = (now + lease / 3.0, lease)
+        wait = min([renew_at for renew_at, _ in self._leases.values()]
+                   or [now + 60]) - now
+        return due, max(wait, 0)
+
+    def _run(self):
+        while True:
+            with self._condition:
+                due, wait = self._due()
+                if not due:
+                    self._condition.wait(wait)
+                    continue
+
+            for lock in due:
+                try:
+                    lock.renew()
+                except Exception:
+                    # most likely released, or already expired
+                    logger.debug("Failed to renew the lease of %r", lock,
+                                 exc_info=True)
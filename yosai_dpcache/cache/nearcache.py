@@ -0,0 +1,372 @@
+"""
+Near Cache
+----------
+
+Provides a :class:`.ProxyBackend` that keeps recently used values in process
+memory, in front of the backend it wraps, along with the invalidation buses
+used to evict those values on every node when they change.
+
+When wrapped outside of a :class:`.SerializationProxy`, the near cache holds
+de-serialized values, so that repeated reads of the same key skip both the
+round trip to the backend and de-serialization::
+
+    region = make_region().configure(
+        'yosai_dpcache.redis',
+        expiration_time=3600,
+        arguments={'host': 'localhost'},
+        wrap=[(NearCacheProxy, None, 1000, 30),
+              (SerializationProxy, sm.serialize, sm.deserialize)]
+    )
+
+Values obtained from the near cache are shared among callers and so must
+not be modified in place.
+
+"""
+
+import json
+import logging
+import uuid
+
+from yosai_dpcache.cache import ProxyBackend
+from yosai_dpcache.cache.backends.memory import MemoryBackend
+from yosai_dpcache.cache.compat import threading
+from yosai_dpcache.cache.util import delete_in_batches
+
+logger = logging.getLogger(__name__)
+
+
+class InvalidationBus(object):
+    """Base class for the channels over which near cache invalidations
+    travel between nodes.
+
+    A message consists of the keys to invalidate and the id of the node that
+    originated it, so that a node may ignore its own messages.
+    """
+
+    def subscribe(self, callback):
+        """Register ``callback(keys, origin)`` to be called for every
+        invalidation message received.
+        """
+        raise NotImplementedError()
+
+    def publish(self, keys, origin):
+        """Broadcast the invalidation of ``keys`` to every subscriber."""
+        raise NotImplementedError()
+
+    def close(self):
+        pass
+
+
+class LocalInvalidationBus(InvalidationBus):
+    """An in-process bus, delivering messages synchronously to subscribers
+    within the same process.  Used for testing, or when all near caches live
+    in a single process.
+    """
+
+    def __init__(self):
+        self._subscribers = []
+        self._lock = threading.Lock()
+
+    def subscribe(self, callback):
+        with self._lock:
+            self._subscribers.append(callback)
+
+    def publish(self, keys, origin):
+        with self._lock:
+            subscribers = list(self._subscribers)
+        for callback in subscribers:
+            callback(keys, origin)
+
+    def close(self):
+        with self._lock:
+            self._subscribers = []
+
+
+class RedisInvalidationBus(InvalidationBus):
+    """A bus that travels over Redis pub/sub.
+
+    By default, invalidations are published to ``channel`` as a JSON message.
+    When ``keyspace_notifications`` is True, the bus instead listens for the
+    keyspace events that Redis itself publishes when a key is modified,
+    expired or evicted, and :meth:`.publish` does nothing.  This requires
+    the server's ``notify-keyspace-events`` to include at least ``Kg$x`` (or
+    ``KA``), and also catches writes made by clients that bypass the near
+    cache.
+
+    Messages published while a subscriber is disconnected are lost, so the
+    near cache's ``local_ttl`` should be kept short enough to bound the
+    staleness that may result.
+
+    :param client: a ``redis.StrictRedis`` client
+    :param channel: the pub/sub channel used for invalidation messages
+    :param keyspace_notifications: whether to listen for keyspace events
+     rather than explicit invalidation messages
+    :param key_pattern: the pattern of keys whose keyspace events are of
+     interest, only used with keyspace notifications
+    """
+
+    def __init__(self, client, channel='yosai_dpcache:invalidate',
+                 keyspace_notifications=False, key_pattern='*'):
+        self.client = client
+        self.channel = channel
+        self.keyspace_notifications = keyspace_notifications
+        self.key_pattern = key_pattern
+        self._callbacks = []
+        self._pubsub = None
+        self._thread = None
+        self._lock = threading.Lock()
+
+    def subscribe(self, callback):
+        with self._lock:
+            self._callbacks.append(callback)
+            if self._thread is None:
+                self._start()
+
+    def _start(self):
+        self._pubsub = self.client.pubsub(ignore_subscribe_messages=True)
+        if self.keyspace_notifications:
+            db = self.client.connection_pool.connection_kwargs.get('db', 0)
+            self._keyspace_prefix = '__keyspace@{0}__:'.format(db)
+            self._pubsub.psubscribe(**{
+                self._keyspace_prefix + self.key_pattern:
+                    self._on_keyspace_event})
+        else:
+            self._pubsub.subscribe(**{self.channel: self._on_message})
+        self._thread = self._pubsub.run_in_thread(sleep_time=1, daemon=True)
+
+    def _dispatch(self, keys, origin):
+        for callback in list(self._callbacks):
+            try:
+                callback(keys, origin)
+            except Exception:
+                logger.exception('Near cache invalidation failed')
+
+    def _on_message(self, message):
+        data = message['data']
+        if isinstance(data, bytes):
+            data = data.decode('utf-8')
+        payload = json.loads(data)
+        self._dispatch(payload['keys'], payload['origin'])
+
+    def _on_keyspace_event(self, message):
+        channel = message['channel']
+        if isinstance(channel, bytes):
+            channel = channel.decode('utf-8')
+        self._dispatch([channel[len(self._keyspace_prefix):]], None)
+
+    def publish(self, keys, origin):
+        if self.keyspace_notifications or not keys:
+            return
+        keys = [key.decode('utf-8') if isinstance(key, bytes) else key
+                for key in keys]
+        self.client.publish(self.channel,
+                            json.dumps({'origin': origin, 'keys': keys}))
+
+    def close(self):
+        with self._lock:
+            if self._thread is not None:
+                self._thread.stop()
+                self._thread = None
+            if self._pubsub is not None:
+                self._pubsub.close()
+                self._pubsub = None
+
+
+class NearCacheProxy(ProxyBackend):
+    """A two-tier cache: a bounded, in-process LRU cache in front of the
+    wrapped backend.
+
+    Reads are served from process memory when possible.  Writes and deletes
+    go to the wrapped backend, update this node's near cache and publish an
+    invalidation so that every other node evicts its copy.
+
+    :param bus: an :class:`.InvalidationBus`.  When None, a
+     :class:`.RedisInvalidationBus` is created from the client of the
+     wrapped Redis backend, or a :class:`.LocalInvalidationBus` if the
+     wrapped backend has no Redis client.
+    :param max_size: the maximum number of values held in process memory
+    :param local_ttl: the maximum number of seconds that a value is held in
+     process memory, bounding the staleness caused by a lost invalidation
+    :param num_shards: the number of independently locked shards of the
+     in-process cache
+    """
+
+    # the number of keys removed, and invalidated, per delete_multi call of
+    # delete_pattern
+    delete_pattern_batch_size = 500
+
+    def __init__(self, bus=None, max_size=1000, local_ttl=30, num_shards=8):
+        super(NearCacheProxy, self).__init__()
+        self.bus = bus
+        self.local_ttl = local_ttl
+        self.local = MemoryBackend({'max_size': max_size,
+                                    'num_shards': num_shards})
+        self.node_id = uuid.uuid4().hex
+
+        # bumped on every write and invalidation, so that a read racing with
+        # one doesn't repopulate the near cache with the value it replaced;
+        # it is compared and bumped under _lock, along with the change to
+        # the near cache
+        self._generation = 0
+        self._lock = threading.Lock()
+
+    def wrap(self, backend):
+        proxy = super(NearCacheProxy, self).wrap(backend)
+        if self.bus is None:
+            self.bus = self._default_bus(backend)
+        self.bus.subscribe(self._on_invalidate)
+        return proxy
+
+    def _default_bus(self, backend):
+        while isinstance(backend, ProxyBackend):
+            backend = backend.proxied
+        client = getattr(backend, 'client', None)
+        if client is None:
+            return LocalInvalidationBus()
+        return RedisInvalidationBus(client)
+
+    def _on_invalidate(self, keys, origin):
+        if origin == self.node_id:
+            return
+        self._update(deleted=keys)
+
+    def _local_expiration(self, expiration):
+        if isinstance(expiration, dict):
+            return dict((key, self._local_expiration(exp))
+                        for key, exp in expiration.items())
+        if not expiration:
+            return self.local_ttl
+        return min(expiration, self.local_ttl)
+
+    def _fill(self, generation, mapping):
+        """Hold values read from the wrapped backend, unless the near cache
+        changed since generation was read."""
+        with self._lock:
+            if generation == self._generation and mapping:
+                self.local.set_multi(mapping, self.local_ttl)
+
+    def _update(self, mapping=None, expiration=None, deleted=()):
+        """Apply a change of the wrapped backend to the near cache, moving
+        on to a new generation."""
+        with self._lock:
+            self._generation += 1
+            if mapping:
+                self.local.set_multi(mapping,
+                                     self._local_expiration(expiration))
+            if deleted:
+                self.local.delete_multi(deleted)
+
+    def invalidate_local(self, keys=None):
+        """Evict ``keys``, or every key when None, from this node's near
+        cache only.
+        """
+        if keys is not None:
+            self._update(deleted=keys)
+            return
+        with self._lock:
+            self._generation += 1
+            self.local = MemoryBackend({'max_size': self.local.max_size,
+                                        'num_shards': self.local.num_shards})
+
+    def get(self, key):
+        value = self.local.get(key)
+        if value is not None:
+            return value
+
+        generation = self._generation
+        value = self.proxied.get(key)
+        if value is not None:
+            self._fill(generation, {key: value})
+        return value
+
+    def get_multi(self, keys):
+        values = self.local.get_multi(keys)
+        missing = [key for key, value in zip(keys, values) if value is None]
+        if not missing:
+            return values
+
+        generation = self._generation
+        fetched = dict(zip(missing, self.proxied.get_multi(missing)))
+        self._fill(generation, dict((key, value) for key, value in
+                                    fetched.items() if value is not None))
+        return [fetched[key] if value is None else value
+                for key, value in zip(keys, values)]
+
+    def set(self, key, value, expiration):
+        self.proxied.set(key, value, expiration)
+        self._update({key: value}, expiration)
+        self.bus.publish([key], self.node_id)
+
+    def get_or_lease(self, key):
+        value = self.local.get(key)
+        if value is not None:
+            return value, None
+        return self.proxied.get_or_lease(key)
+
+    def set_and_release(self, key, value, expiration, lease):
+        self.proxied.set_and_release(key, value, expiration, lease)
+        self._update({key: value}, expiration)
+        self.bus.publish([key], self.node_id)
+
+    def set_multi(self, mapping, expiration):
+        self.proxied.set_multi(mapping, expiration)
+        self._update(mapping, expiration)
+        self.bus.publish(list(mapping), self.node_id)
+
+    def execute_batch(self, ops):
+        # a get is answered locally unless the batch writes its key first
+        local, written = [], set()
+        for name, args in ops:
+            if name == 'get' and args[0] not in written:
+                local.append(self.local.get(args[0]))
+            else:
+                local.append(None)
+                if name in ('set', 'delete'):
+                    written.add(args[0])
+
+        sent = [op for op, value in zip(ops, local) if value is None]
+        generation = self._generation
+        fetched = iter(self.proxied.execute_batch(sent) if sent else [])
+
+        results, fills, writes = [], {}, []
+        for (name, args), value in zip(ops, local):
+            if value is not None:
+                results.append(value)
+                continue
+            result = next(fetched)
+            results.append(result)
+            if name == 'get' and result is not None:
+                fills[args[0]] = result
+            elif name in ('set', 'delete'):
+                writes.append((name, args))
+
+        # the batch's writes are applied after the values it read, as they
+        # were made after them
+        self._fill(generation, fills)
+        for name, args in writes:
+            if name == 'set':
+                self._update({args[0]: args[1]}, args[2])
+            else:
+                self._update(deleted=[args[0]])
+
+        if written:
+            self.bus.publish(list(written), self.node_id)
+        return results
+
+    def delete(self, key):
+        self.proxied.delete(key)
+        self._update(deleted=[key])
+        self.bus.publish([key], self.node_id)
+
+    def delete_multi(self, keys):
+        keys = list(keys)
+        self.proxied.delete_multi(keys)
+        self._update(deleted=keys)
+        self.bus.publish(keys, self.node_id)
+
+    def delete_pattern(self, pattern, count=None):
+        # SCAN yields bytes, whereas the near cache is keyed as the region is
+        keys = (key.decode('utf-8') if isinstance(key, bytes) else key
+                for key in self.proxied.iter_keys(pattern, count))
+        return delete_in_batches(self.delete_multi, keys,
+                                 self.delete_pattern_batch_size)
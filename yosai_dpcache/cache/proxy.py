@@ -76,8 +76,8 @@ class ProxyBackend(CacheBackend):
     def get(self, key):
         return self.proxied.get(key)
 
-    def set(self, key, value):
-        self.proxied.set(key, value)
+    def set(self, key, value, expiration):
+        self.proxied.set(key, value, expiration)
 
     def delete(self, key):
         self.proxied.delete(key)
@@ -85,8 +85,8 @@ class ProxyBackend(CacheBackend):
     def get_multi(self, keys):
         return self.proxied.get_multi(keys)
 
-    def set_multi(self, mapping):
-        self.proxied.set_multi(mapping)
+    def set_multi(self, mapping, expiration):
+        self.proxied.set_multi(mapping, expiration)
 
     def delete_multi(self, keys):
         self.proxied.delete_multi(keys)
@@ -96,3 +96,46 @@ class ProxyBackend(CacheBackend):
 
     def keys(self, pattern):
         return self.proxied.keys(pattern)
+
+    def iter_keys(self, pattern, count=None):
+        return self.proxied.iter_keys(pattern, count)
+
+    def delete_pattern(self, pattern, count=None):
+        return self.proxied.delete_pattern(pattern, count)
+
+    def hmget(self, name, keys):
+        return self.proxied.hmget(name, keys)
+
+    def hmset(self, name, mapping, expiration):
+        return self.proxied.hmset(name, mapping, expiration)
+
+    def hmget_exists(self, name, keys):
+        return self.proxied.hmget_exists(name, keys)
+
+    def hupdate(self, name, mapping, deleted=(), expiration=None):
+        return self.proxied.hupdate(name, mapping, deleted, expiration)
+
+    def hgetall(self, name):
+        return self.proxied.hgetall(name)
+
+    def exists(self, key):
+        return self.proxied.exists(key)
+
+    def execute_batch(self, ops):
+        # a proxy that alters get, set, delete or hmget alters this as well
+        return self.proxied.execute_batch(ops)
+
+    def incr(self, key):
+        return self.proxied.incr(key)
+
+    def get_counters(self, keys):
+        return self.proxied.get_counters(keys)
+
+    def get_or_lease(self, key):
+        return self.proxied.get_or_lease(key)
+
+    def set_and_release(self, key, value, expiration, lease):
+        self.proxied.set_and_release(key, value, expiration, lease)
+
+    def release_lease(self, lease):
+        self.proxied.release_lease(lease)
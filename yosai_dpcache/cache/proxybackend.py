@@ -1,4 +1,15 @@
+import json
+import struct
+
 from yosai_dpcache.cache import ProxyBackend
+from yosai_dpcache.cache.api import CachedValue, NEGATIVE_VALUE
+
+# 0xc1 is never used by msgpack and never begins a JSON document, so a
+# serialized value can't be mistaken for a metadata envelope or for the
+# negative value token
+METADATA_MAGIC = b'\xc1ydc'
+NEGATIVE_MAGIC = b'\xc1ydn'
+_header = struct.Struct('!H')
 
 
 class SerializationProxy(ProxyBackend):
@@ -10,21 +21,66 @@ class SerializationProxy(ProxyBackend):
         self.serialize = serialize
         self.deserialize = deserialize
 
+    def dumps(self, value):
+        """
+        Serializes value.  The metadata of a CachedValue is framed in front of
+        its serialized payload:  magic | metadata length | metadata | payload
+        """
+        if not isinstance(value, CachedValue):
+            return self._serialize_payload(value)
+
+        metadata = json.dumps(value.metadata).encode('utf-8')
+        return b''.join([METADATA_MAGIC, _header.pack(len(metadata)),
+                         metadata, self._serialize_payload(value.payload)])
+
+    def loads(self, serialized):
+        """
+        De-serializes a value, returning a CachedValue when metadata was
+        framed in front of it
+        """
+        if (not isinstance(serialized, bytes) or
+                not serialized.startswith(METADATA_MAGIC)):
+            return self._deserialize_payload(serialized)
+
+        start = len(METADATA_MAGIC) + _header.size
+        length, = _header.unpack_from(serialized, len(METADATA_MAGIC))
+        metadata = json.loads(serialized[start:start + length].decode('utf-8'))
+        return CachedValue(
+            self._deserialize_payload(serialized[start + length:]), metadata)
+
+    def _serialize_payload(self, value):
+        # the negative value token is stored as is, without the serializer
+        if value is NEGATIVE_VALUE:
+            return NEGATIVE_MAGIC
+        return self.serialize(value)
+
+    def _deserialize_payload(self, serialized):
+        if serialized == NEGATIVE_MAGIC:
+            return NEGATIVE_VALUE
+        return self.deserialize(serialized)
+
     def get(self, key):
         serialized = self.proxied.get(key)
-        return self.deserialize(serialized)
+        return self.loads(serialized)
 
     def set(self, key, value, expiration):
-        serialized = self.serialize(value)
+        serialized = self.dumps(value)
         self.proxied.set(key, serialized, expiration)
 
+    def get_or_lease(self, key):
+        serialized, lease = self.proxied.get_or_lease(key)
+        return self.loads(serialized), lease
+
+    def set_and_release(self, key, value, expiration, lease):
+        serialized = self.dumps(value)
+        self.proxied.set_and_release(key, serialized, expiration, lease)
+
     def get_multi(self, keys):
         multi_serialized = self.proxied.get_multi(keys)
-        return {key: self.deserialize(value) for key, value in
-                multi_serialized.items()}
+        return [self.loads(value) for value in multi_serialized]
 
     def set_multi(self, mapping, expiration):
-        serialized_mapping = {key: self.serialize(value) for key, value in
+        serialized_mapping = {key: self.dumps(value) for key, value in
                               mapping.items()}
         self.proxied.set_multi(serialized_mapping, expiration)
 
@@ -46,4 +102,16 @@ class SerializationProxy(ProxyBackend):
     def exists(self, key):
         return self.proxied.exists(key)
 
+    def _dumps_ops(self, ops):
+        return [(name, (args[0], self.dumps(args[1]), args[2]))
+                if name == 'set' else (name, args) for name, args in ops]
+
+    def _loads_results(self, ops, results):
+        return [self.loads(result) if name == 'get' else result
+                for (name, _), result in zip(ops, results)]
+
+    def execute_batch(self, ops):
+        results = self.proxied.execute_batch(self._dumps_ops(ops))
+        return self._loads_results(ops, results)
+
     # delete, delete_multi, and get_mutext operations are inherited
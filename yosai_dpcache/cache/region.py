@@ -41,12 +41,16 @@ Comments about the yosai_dpcache fork
 from yosai_dpcache.dogpile.core import Lock, NeedRegenerationException
 from yosai_dpcache.dogpile.core.nameregistry import NameRegistry
 from . import exception
+from .api import CachedValue, NEGATIVE_VALUE, TrackedHash
 from .util import function_key_generator, PluginLoader, \
     memoized_property, coerce_string_conf, function_multi_key_generator
 from .proxy import ProxyBackend
+from .batch import Batch
 from . import compat
 import time
 import datetime
+import math
+import random
 from numbers import Number
 from functools import wraps
 import threading
@@ -137,15 +141,22 @@ class CacheRegion(object):
      in conjunction with Unicode keys.
     :param async_creation_runner:  A callable that, when specified,
      will be passed to and called by dogpile.lock when
-     there is a stale value present in the cache.  It will be passed the
-     mutex and is responsible releasing that mutex when finished.
+     there is a stale value present in the cache, which requires the
+     region to be configured with a ``stale_grace_time``.  It is called as
+     ``async_creation_runner(cache, somekey, creator, mutex)``, where
+     ``creator`` is a callable that creates the new value and stores it in
+     the cache using the expiration time that was given to
+     :meth:`.CacheRegion.get_or_create`.  The runner is responsible
+     for releasing the mutex when finished.
      This can be used to defer the computation of expensive creator
      functions to later points in the future by way of, for example, a
      background thread, a long-running queue, or a task manager system
      like Celery.
 
-     For a specific example using async_creation_runner, new values can
-     be created in a background thread like so::
+     A bounded thread pool runner is provided by
+     :class:`.ThreadPoolCreationRunner`.  For a specific example of a
+     custom async_creation_runner, new values can be created in a
+     background thread like so::
 
         import threading
 
@@ -153,8 +164,7 @@ class CacheRegion(object):
             ''' Used by dogpile.core:Lock when appropriate  '''
             def runner():
                 try:
-                    value = creator()
-                    cache.set(somekey, value)
+                    creator()
                 finally:
                     mutex.release()
 
@@ -165,12 +175,13 @@ class CacheRegion(object):
         region = make_region(
             async_creation_runner=async_creation_runner,
         ).configure(
-            'yosai_dpcache.cache.memcached',
+            'yosai_dpcache.redis',
             expiration_time=5,
             arguments={
-                'url': '127.0.0.1:11211',
+                'host': 'localhost',
                 'distributed_lock': True,
-            }
+            },
+            stale_grace_time=60
         )
 
      Remember that the first request for a key with no associated
@@ -211,6 +222,8 @@ class CacheRegion(object):
             _config_prefix=None,
             wrap=None,
             replace_existing_backend=False,
+            stale_grace_time=None,
+            early_expiration_beta=None,
     ):
         """Configure a :class:`.CacheRegion`.
 
@@ -242,6 +255,28 @@ class CacheRegion(object):
          will be replaced.  Without this flag, an exception is raised if
          a backend is already configured.
 
+        :param stale_grace_time: Optional.  Enables soft expiration for
+         :meth:`.CacheRegion.get_or_create`, which then stores each value
+         along with its creation time and keeps it in the backend for
+         ``stale_grace_time`` seconds past the expiration time given.  Once
+         the expiration time has passed, one caller regenerates the value
+         while all others are returned the stale value without blocking.
+         May be passed as an integer number of seconds, or as a
+         ``datetime.timedelta`` value.  Defaults to ``None``, in which case
+         the backend expires values and every miss blocks until the value is
+         regenerated.
+
+        :param early_expiration_beta: Optional.  Enables probabilistic early
+         expiration ("XFetch") for :meth:`.CacheRegion.get_or_create`, which
+         then stores each value along with its creation time and the time
+         its creator took to run.  Each caller considers the value expired
+         ahead of its expiration time with a probability that grows as that
+         time approaches and as the creator's duration grows, so that a hot
+         key is usually regenerated by a single caller before it expires
+         rather than by every process in the fleet at once.  Values greater
+         than ``1.0`` favor earlier regeneration; ``1.0`` is a sensible
+         default.  Defaults to ``None``, which disables early expiration.
+
          """
 
         if "backend" in self.__dict__ and not replace_existing_backend:
@@ -259,6 +294,9 @@ class CacheRegion(object):
         else:
             self.backend = backend_cls(arguments or {})
 
+        # the backend before it is wrapped in any proxies
+        self.actual_backend = self.backend
+
         if not expiration_time or isinstance(expiration_time, Number):
             self.expiration_time = expiration_time
         elif isinstance(expiration_time, datetime.timedelta):
@@ -268,6 +306,17 @@ class CacheRegion(object):
             raise exception.ValidationError(
                 'expiration_time is not a number or timedelta.')
 
+        if stale_grace_time is None or isinstance(stale_grace_time, Number):
+            self.stale_grace_time = stale_grace_time
+        elif isinstance(stale_grace_time, datetime.timedelta):
+            self.stale_grace_time = int(
+                compat.timedelta_total_seconds(stale_grace_time))
+        else:
+            raise exception.ValidationError(
+                'stale_grace_time is not a number or timedelta.')
+
+        self.early_expiration_beta = early_expiration_beta
+
         if not self._user_defined_key_mangler:
             self.key_mangler = self.backend.key_mangler
 
@@ -352,8 +401,75 @@ class CacheRegion(object):
             _config_prefix="%sarguments." % prefix,
             wrap=config_dict.get(
                 "%swrap" % prefix, None),
+            stale_grace_time=config_dict.get(
+                "%sstale_grace_time" % prefix, None),
+            early_expiration_beta=config_dict.get(
+                "%searly_expiration_beta" % prefix, None),
         )
 
+    def _unwrap(self, value):
+        if isinstance(value, CachedValue):
+            return value.payload
+        return value
+
+    @property
+    def _lock_scripts(self):
+        return getattr(self.actual_backend, 'lock_scripts', False)
+
+    @property
+    def _tracks_metadata(self):
+        return (self.stale_grace_time is not None or
+                self.early_expiration_beta is not None)
+
+    def _value(self, value, createdtime=None, duration=None):
+        """Return the value to store in the backend, which carries its
+        creation time (and the duration of its creation, when known) if soft
+        or early expiration is in use."""
+        if not self._tracks_metadata:
+            return value
+        if createdtime is None:
+            createdtime = time.time()
+        metadata = {'ct': createdtime}
+        if duration is not None:
+            metadata['d'] = duration
+        return CachedValue(value, metadata)
+
+    def _early_expiration(self):
+        """Return the XFetch multiplier for a single get_or_create call, or
+        0 when early expiration is disabled.  It is drawn once per call so
+        that both reads made by the dogpile lock reach the same decision."""
+        if not self.early_expiration_beta:
+            return 0
+        return self.early_expiration_beta * -math.log(1.0 - random.random())
+
+    def _value_and_created(self, value, early=0):
+        """Return the (payload, creation time) of a value read from the
+        backend, raising NeedRegenerationException when there is none."""
+        if value is None:
+            raise NeedRegenerationException()
+        if isinstance(value, CachedValue):
+            createdtime = value.metadata['ct']
+            if early:
+                # XFetch: treat the value as created earlier than it was, by
+                # a random multiple of the time its creation took
+                createdtime -= value.metadata.get('d', 0) * early
+            return value.payload, createdtime
+        # a value stored without metadata is considered fresh
+        return value, time.time()
+
+    def _backend_expiration(self, expiration):
+        """Return the ttl to give the backend for the given expiration,
+        which may be a number or a dict that maps keys to ttls.  With soft
+        expiration, values are kept for ``stale_grace_time`` seconds past
+        their expiration."""
+        exp = expiration if expiration else self.expiration_time
+        if self.stale_grace_time is None:
+            return exp
+        if isinstance(exp, dict):
+            return dict((key, self._backend_expiration(ttl))
+                        for key, ttl in exp.items())
+        return exp + self.stale_grace_time if exp else exp
+
     @memoized_property
     def backend(self):
         raise exception.RegionNotConfigured(
@@ -385,9 +501,28 @@ class CacheRegion(object):
         """
         if self.key_mangler:
             key = self.key_mangler(key)
-        return self.backend.get(key)
+        return self._unwrap(self.backend.get(key))
 
-    def get_or_create(self, key, creator_func, creator, expiration):
+    def get_multi(self, keys):
+        """
+        Return multiple values from the cache, based on the given keys, using
+        a single backend call.
+
+        Returns values as a list matching the keys given.  A key that is not
+        present in cache is represented by ``None``.
+
+        :param keys: Sequence of keys to be retrieved.
+        """
+        if not keys:
+            return []
+
+        if self.key_mangler:
+            keys = list(map(lambda key: self.key_mangler(key), keys))
+
+        return [self._unwrap(value) for value in self.backend.get_multi(keys)]
+
+    def get_or_create(self, key, creator_func, creator, expiration,
+                      negative_expiration=None):
         """
         Return a cached value based on the given key.
 
@@ -416,26 +551,79 @@ class CacheRegion(object):
 
         :param expiration: expiration time that will overide
          the expiration time already configured on this :class:`.CacheRegion`
+
+        :param negative_expiration: Optional.  When the creation function
+         returns None, the :data:`.NEGATIVE_VALUE` token is cached in its
+         place for this many seconds and returned, both now and by the
+         lookups that find it in cache.  When None, a value of None is
+         cached as is.
         """
 
+        orig_key = key
         if self.key_mangler:
             key = self.key_mangler(key)
 
+        exp = expiration if expiration else self.expiration_time
+        tracks_metadata = self._tracks_metadata
+        early = self._early_expiration()
+
         def get_value():
-            value = self.backend.get(key)
-            if value is None:
-                raise NeedRegenerationException()
-            return value
+            return self._value_and_created(self.backend.get(key), early)
 
         def gen_value():
+            started = time.time()
             created_value = creator_func(creator)
-            self.backend.set(key, created_value, expiration)
-            return created_value
+            createdtime = time.time()
+            if created_value is None and negative_expiration is not None:
+                self.backend.set(key,
+                                 self._value(NEGATIVE_VALUE, createdtime),
+                                 negative_expiration)
+                return NEGATIVE_VALUE, createdtime
+
+            self.backend.set(key,
+                             self._value(created_value, createdtime,
+                                         createdtime - started),
+                             self._backend_expiration(exp))
+            return created_value, createdtime
+
+        if self._lock_scripts and not tracks_metadata:
+            # read the value, or else lease the lock, in one round trip
+            value, lease = self.backend.get_or_lease(key)
+            if value is not None:
+                return value
+
+            if lease is not None:
+                try:
+                    created_value = creator_func(creator)
+                except BaseException:
+                    self.backend.release_lease(lease)
+                    raise
+
+                if created_value is None and negative_expiration is not None:
+                    self.backend.set_and_release(
+                        key, NEGATIVE_VALUE, negative_expiration, lease)
+                    return NEGATIVE_VALUE
+
+                self.backend.set_and_release(
+                    key, created_value, self._backend_expiration(exp), lease)
+                return created_value
+
+            # the lock is held elsewhere:  wait for it as usual
+
+        if tracks_metadata and self.async_creation_runner:
+            def async_creator(mutex):
+                return self.async_creation_runner(
+                    self, orig_key, lambda: gen_value()[0], mutex)
+        else:
+            async_creator = None
 
-        with Lock(self._mutex(key), gen_value, get_value) as value:
+        expiretime = exp if tracks_metadata else None
+        with Lock(self._mutex(key), gen_value, get_value,
+                  expiretime, async_creator) as value:
             return value
 
-    def hmget_or_create(self, key, keys, creator_func, creator, expiration):
+    def hmget_or_create(self, key, keys, creator_func, creator, expiration,
+                        field_creator_func=None):
         """
         Returns one or more cached values from a hash based on the given keys.
 
@@ -444,6 +632,11 @@ class CacheRegion(object):
 
         If the requested hash, not hash values, does not exist in cache, the provided
         creation function is used to re-create and persist a hash to cache.
+        The values then returned are taken from the created hash, as given by
+        the creation function, rather than read back from the backend.
+
+        The existence of the hash and its values are read with a single
+        backend call.
 
         The creation function is used when a *dogpile lock* is acquired. If the
         *dogpile lock* cannot be acquired it is because another thread or process
@@ -464,33 +657,263 @@ class CacheRegion(object):
 
         :param expiration: expiration time that will overide
          the expiration time already configured on this :class:`.CacheRegion`
+
+        :param field_creator_func: Optional.  When the hash exists but some
+         of the requested fields are missing from it, the fields are created
+         by calling ``field_creator_func(creator, missing_fields)``, which
+         returns a dict of the fields it could create, under a dogpile lock
+         per field.  The created fields are added to the hash without
+         altering its other fields or its ttl.  When None, missing fields
+         are returned as None.
         """
 
         if self.key_mangler:
             key = self.key_mangler(key)
 
         def get_value():
-            if not self.backend.exists(key):
+            exists, values = self.backend.hmget_exists(key, keys)
+            if not exists:
                 raise NeedRegenerationException()
-            return self.backend.hmget(key, keys)
+            return values, time.time()
 
         def gen_value():
             created_value = creator_func(creator)
             self.backend.hmset(key, created_value, expiration)
-            return self.backend.hmget(key, keys)
+            # answered from the created hash rather than read back
+            return [created_value.get(k) for k in keys], time.time()
 
         with Lock(self._mutex(key), gen_value, get_value) as value:
+            pass
+
+        if field_creator_func is None or None not in value:
             return value
+        return self._fill_fields(key, keys, value, field_creator_func, creator)
+
+    def _fill_fields(self, key, keys, values, field_creator_func, creator):
+        """Create the requested fields that are missing from the hash at
+        key, holding a dogpile lock per field, and add them to the hash."""
+        found = dict(zip(keys, values))
+        missing = sorted(set(k for k, v in found.items() if v is None))
+
+        mutexes = []
+        try:
+            for field in missing:
+                mutex = self._mutex('{0}:{1}'.format(key, field))
+                if mutex.acquire() is not False:
+                    mutexes.append(mutex)
+
+            # see whether other threads created some of the fields already
+            exists, refreshed = self.backend.hmget_exists(key, missing)
+            found.update(zip(missing, refreshed))
+            missing = [field for field in missing if found[field] is None]
+
+            if missing and exists:
+                created = field_creator_func(creator, missing) or {}
+                fields = dict((field, created[field]) for field in missing
+                              if created.get(field) is not None)
+                if fields and self.backend.hupdate(key, fields):
+                    found.update(fields)
+
+            return [found[k] for k in keys]
+        finally:
+            for mutex in mutexes:
+                mutex.release()
+
+    def get_or_create_multi(self, keys, creator_func, creator, expiration):
+        """
+        Return a sequence of cached values based on a sequence of keys.
+
+        All keys are retrieved from cache in a single backend call.  A dogpile
+        lock is then acquired only for those keys that were missing, in sorted
+        order so that concurrent callers with overlapping keys cannot deadlock.
+        Once the locks are held, the missing keys are read again, as another
+        thread or process may have created them in the meantime, and
+        ``creator_func`` is called once for whatever remains missing.
+
+        :param keys: Sequence of keys to retrieve
+
+        :param creator_func: function used to create the new values, called
+         as ``creator_func(creator, missing_keys)``, where ``missing_keys`` is
+         a list of the keys (as passed to this method) that require creation.
+         It must return a list of values that corresponds to ``missing_keys``.
+        :param creator: the instance to run creator_func
+
+        :param expiration: either a ttl applied to every created value or a
+         dict that maps a key to its ttl, overriding the expiration time
+         already configured on this :class:`.CacheRegion`
+
+        :returns: a list of values, corresponding to ``keys``
+        """
+        if not keys:
+            return []
+
+        sorted_unique_keys = sorted(set(keys))
+        if self.key_mangler:
+            mangled_keys = [self.key_mangler(k) for k in sorted_unique_keys]
+        else:
+            mangled_keys = sorted_unique_keys
+        orig_to_mangled = dict(zip(sorted_unique_keys, mangled_keys))
+
+        values = dict(zip(mangled_keys, map(
+            self._unwrap, self.backend.get_multi(mangled_keys))))
+
+        missing = [k for k in sorted_unique_keys
+                   if values[orig_to_mangled[k]] is None]
+        if not missing:
+            return [values[orig_to_mangled[k]] for k in keys]
+
+        mutexes = []
+        try:
+            for orig_key in missing:
+                mutex = self._mutex(orig_to_mangled[orig_key])
+                # False means the value was handed over instead of the mutex
+                if mutex.acquire() is not False:
+                    mutexes.append(mutex)
+
+            # see whether other threads created some of the values already
+            missing_mangled = [orig_to_mangled[k] for k in missing]
+            values.update(zip(missing_mangled, map(
+                self._unwrap, self.backend.get_multi(missing_mangled))))
+            missing = [k for k in missing
+                       if values[orig_to_mangled[k]] is None]
+
+            if missing:
+                created_values = creator_func(creator, missing)
+                created = dict((orig_to_mangled[k], v) for k, v in
+                               zip(missing, created_values))
+                values.update(created)
+
+                cacheable = dict((k, self._value(v)) for k, v in
+                                 created.items() if v is not None)
+                if cacheable:
+                    exp = self._backend_expiration(expiration)
+                    if isinstance(exp, dict):
+                        exp = dict((orig_to_mangled[k], exp.get(k))
+                                   for k in missing)
+                    self.backend.set_multi(cacheable, exp)
+
+            return [values[orig_to_mangled[k]] for k in keys]
+        finally:
+            for mutex in mutexes:
+                mutex.release()
 
     def set(self, key, value, expiration=None):
         """Place a new value in the cache under the given key."""
 
+        if self.key_mangler:
+            key = self.key_mangler(key)
+
+        self.backend.set(key, self._value(value),
+                         self._backend_expiration(expiration))
+
+    def set_multi(self, mapping, expiration=None):
+        """Place new values in the cache under the given keys, using a
+        single backend call.
+
+        :param mapping: a dict of keys to values
+        :param expiration: either a ttl applied to every key or a dict that
+         maps a key to its ttl, overriding the expiration time configured on
+         this :class:`.CacheRegion`
+        """
+        if not mapping:
+            return
+
+        exp = self._backend_expiration(expiration)
+        mapping = dict((k, self._value(v)) for k, v in mapping.items())
+
+        if self.key_mangler:
+            mangled = dict((self.key_mangler(k), v)
+                           for k, v in mapping.items())
+            if isinstance(exp, dict):
+                exp = dict((self.key_mangler(k), v) for k, v in exp.items())
+            mapping = mangled
+
+        self.backend.set_multi(mapping, exp)
+
+    def batch(self):
+        """Return a :class:`.Batch` that queues ``get``, ``set``,
+        ``delete`` and ``hmget`` operations on this region and sends them to
+        the backend together, as a single pipeline on Redis, when it runs.
+
+        Usage::
+
+            with region.batch() as batch:
+                session = batch.get(session_key)
+                credentials = batch.get(credentials_key)
+
+            session.result(), credentials.result()
+        """
+        return Batch(self)
+
+    def get_hash(self, key):
+        """Return the hash cached under the given key as a
+        :class:`.TrackedHash`, or None when it isn't cached."""
+
+        if self.key_mangler:
+            key = self.key_mangler(key)
+
+        value = self.backend.hgetall(key)
+        return TrackedHash.from_cache(value) if value else None
+
+    def set_hash(self, key, value, expiration=None):
+        """Cache a hash under the given key.
+
+        When value is a :class:`.TrackedHash` read by :meth:`.get_hash`,
+        only its changed fields are written, along with a reset of the ttl,
+        in a single backend call;  the rest of the cached hash is left as it
+        is.  Otherwise, or when the cached hash has since expired, every
+        field is written.
+
+        :param value: a dict or :class:`.TrackedHash`, whose changes are
+         marked clean once saved
+        :param expiration: the ttl of the hash, overriding the expiration
+         time configured on this :class:`.CacheRegion`
+        """
+
         if self.key_mangler:
             key = self.key_mangler(key)
 
         exp = expiration if expiration else self.expiration_time
+        changes = self._hash_changes(value)
+        if changes is not None:
+            if not changes[0] and not changes[1]:
+                return
+            if self.backend.hupdate(key, changes[0], changes[1], exp):
+                value.mark_clean()
+                return
+
+        fields = self._hash_fields(value)
+        if fields:
+            self.backend.hmset(key, fields, exp)
+        else:
+            self.backend.delete(key)
+        if isinstance(value, TrackedHash):
+            value.mark_clean()
 
-        self.backend.set(key, value, exp)
+    def hupdate(self, key, mapping, deleted=(), expiration=None):
+        """Set the fields of ``mapping`` within the hash cached under the
+        given key and delete the ``deleted`` fields, resetting its ttl, in a
+        single backend call.  A hash that isn't cached is left uncached.
+
+        :returns: whether the hash was cached and so updated
+        """
+
+        if self.key_mangler:
+            key = self.key_mangler(key)
+
+        return self.backend.hupdate(
+            key, mapping, deleted,
+            expiration if expiration else self.expiration_time)
+
+    def _hash_changes(self, value):
+        """Return the (mapping, deleted) changes of a hash read from the
+        cache, or None when it has to be written in full."""
+        if isinstance(value, TrackedHash) and value.loaded:
+            return value.changes()
+        return None
+
+    def _hash_fields(self, value):
+        return dict((field, v) for field, v in value.items() if v is not None)
 
     def delete(self, key):
         """Remove a value from the cache.
@@ -504,6 +927,21 @@ class CacheRegion(object):
 
         self.backend.delete(key)
 
+    def delete_multi(self, keys):
+        """Remove multiple values from the cache, using a single backend
+        call.
+
+        This operation is idempotent (can be called multiple times, or on a
+        non-existent key, safely)
+        """
+        if not keys:
+            return
+
+        if self.key_mangler:
+            keys = list(map(lambda key: self.key_mangler(key), keys))
+
+        self.backend.delete_multi(keys)
+
     def keys(self, pattern):
         """
         searches for keys matching pattern, returns accordingly
@@ -512,6 +950,52 @@ class CacheRegion(object):
         """
         return self.backend.keys(pattern)
 
+    def iter_keys(self, pattern, count=None):
+        """
+        Returns an iterator over the keys matching pattern.  For a Redis
+        backend the keys are fetched incrementally with SCAN, so the
+        iterator may yield a key more than once.
+
+        :param count: a hint for the number of keys the backend examines per
+                      round trip
+        """
+        return self.backend.iter_keys(pattern, count)
+
+    def delete_pattern(self, pattern, count=None):
+        """
+        Removes every key matching pattern, deleting the keys in batches as
+        they are found rather than collecting them all first
+
+        :returns: the number of keys deleted
+        """
+        return self.backend.delete_pattern(pattern, count)
+
+    def incr(self, key):
+        """
+        Increments the integer counter stored under key.  Counters are stored
+        as plain integers that bypass the serialization proxy, and never
+        expire.
+
+        :returns: the new value of the counter
+        """
+        if self.key_mangler:
+            key = self.key_mangler(key)
+
+        return self.backend.incr(key)
+
+    def get_counters(self, keys):
+        """
+        Return the values of multiple counters, using a single backend call.
+        A counter that has never been incremented is 0.
+        """
+        if not keys:
+            return []
+
+        if self.key_mangler:
+            keys = list(map(lambda key: self.key_mangler(key), keys))
+
+        return self.backend.get_counters(keys)
+
 
 def make_region(*arg, **kw):
     """Instantiate a new :class:`.CacheRegion`.
@@ -0,0 +1,91 @@
+"""
+Creation Runners
+----------------
+
+Provides ``async_creation_runner`` implementations, which regenerate stale
+values in the background on behalf of :meth:`.CacheRegion.get_or_create`.
+
+"""
+
+import logging
+from concurrent.futures import ThreadPoolExecutor
+
+from .compat import threading
+
+logger = logging.getLogger(__name__)
+
+
+class ThreadPoolCreationRunner(object):
+    """An ``async_creation_runner`` that regenerates values on a bounded
+    pool of threads, so that the caller that finds a stale value returns it
+    immediately rather than running the creator inline.
+
+    A key is regenerated at most once at a time:  a request to regenerate a
+    key that is already queued or running is dropped.  Likewise, once
+    ``max_queue_size`` regenerations are waiting for a free worker, further
+    requests are dropped.  A dropped request releases the dogpile mutex
+    straight away, leaving the stale value in place for a later caller to
+    refresh.
+
+    Usage::
+
+        runner = ThreadPoolCreationRunner(max_workers=4, max_queue_size=100)
+
+        region = make_region(async_creation_runner=runner).configure(
+            'yosai_dpcache.redis',
+            expiration_time=3600,
+            stale_grace_time=600
+        )
+
+    :param max_workers: the number of threads that run creators
+    :param max_queue_size: the number of regenerations that may wait for a
+     free worker
+    """
+
+    def __init__(self, max_workers=4, max_queue_size=100):
+        self.max_workers = max_workers
+        self.max_queue_size = max_queue_size
+        self._executor = ThreadPoolExecutor(max_workers=max_workers)
+        self._in_flight = set()
+        self._lock = threading.Lock()
+
+    def __call__(self, cache, somekey, creator, mutex):
+        job = (id(cache), somekey)
+        with self._lock:
+            accepted = (job not in self._in_flight and
+                        len(self._in_flight) <
+                        self.max_workers + self.max_queue_size)
+            if accepted:
+                self._in_flight.add(job)
+
+        if not accepted:
+            logger.debug('Regeneration of %r dropped', somekey)
+            mutex.release()
+            return
+
+        try:
+            self._executor.submit(self._run, job, creator, mutex)
+        except RuntimeError:
+            # the executor has been shut down
+            self._finish(job, mutex)
+
+    def _run(self, job, creator, mutex):
+        try:
+            creator()
+        except Exception:
+            logger.exception('Regeneration of %r failed', job[1])
+        finally:
+            self._finish(job, mutex)
+
+    def _finish(self, job, mutex):
+        with self._lock:
+            self._in_flight.discard(job)
+        mutex.release()
+
+    @property
+    def in_flight(self):
+        """The number of regenerations queued or running."""
+        return len(self._in_flight)
+
+    def shutdown(self, wait=True):
+        self._executor.shutdown(wait=wait)
@@ -26,6 +26,11 @@ class CacheSettings:
 
             self.region_name = region_init_config['region_name']
             self.backend = region_init_config.get('backend')
+            self.bloom_filter = region_init_config.get('bloom_filter')
+            self.write_behind = region_init_config.get('write_behind')
+            self.near_cache = region_init_config.get('near_cache')
+            self.identifier_domains = region_init_config.get(
+                'identifier_domains')
 
             server_config = cache_settings['server_config']
             self.region_arguments = server_config.get('redis')
@@ -35,6 +40,14 @@ class CacheSettings:
             self.credentials_ttl = ttl_config.get('credentials_ttl')
             self.authz_info_ttl = ttl_config.get('authz_info_ttl')
             self.session_abs_ttl = ttl_config.get('session_absolute_ttl')
+            self.stale_grace_time = ttl_config.get('stale_grace_time')
+            self.early_expiration_beta = ttl_config.get('early_expiration_beta')
+            self.generation_local_ttl = ttl_config.get('generation_local_ttl')
+            self.identifier_generations = ttl_config.get(
+                'identifier_generations', False)
+            self.negative_ttl = ttl_config.get('negative_ttl')
+            self.credentials_negative_ttl = ttl_config.get(
+                'credentials_negative_ttl', self.negative_ttl)
 
         except (AttributeError, TypeError) as exc:
             msg = ('yosai_dpcache CacheSettings requires a LazySettings instance '
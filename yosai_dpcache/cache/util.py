@@ -139,6 +139,26 @@ class memoized_property(object):
         return result
 
 
+def delete_in_batches(delete_multi, keys, batch_size):
+    """Delete the keys produced by an iterable, using one ``delete_multi``
+    call per ``batch_size`` keys.
+
+    :returns: the number of keys deleted
+    """
+    deleted = 0
+    batch = []
+    for key in keys:
+        batch.append(key)
+        if len(batch) >= batch_size:
+            delete_multi(batch)
+            deleted += len(batch)
+            batch = []
+    if batch:
+        delete_multi(batch)
+        deleted += len(batch)
+    return deleted
+
+
 def to_list(x, default=None):
     """Coerce to a list."""
     if x is None:
@@ -0,0 +1,256 @@
+"""
+Write-Behind
+------------
+
+Provides :class:`.WriteBehindProxy`, which returns from sets and deletes
+at once and writes them to the wrapped backend from a background thread,
+as pipelined batches.
+
+"""
+
+import logging
+
+from .proxy import ProxyBackend
+from .compat import threading
+
+logger = logging.getLogger(__name__)
+
+
+class WriteBehindProxy(ProxyBackend):
+    """Queues the sets and deletes made through it, so that the calling
+    thread doesn't wait for the backend, and writes them from a background
+    thread every ``flush_interval`` seconds.  Each flush sends the queued
+    writes through ``execute_batch``, a single pipeline on Redis.
+
+    A write to a key that is still queued replaces the queued write, so a
+    key written repeatedly within a flush interval is written once, with its
+    last value.  Reads through the proxy see the queued writes, so a thread
+    reads its own writes before they reach the backend;  other processes see
+    them only once flushed.
+
+    The queue holds at most ``max_pending`` keys.  A write to a new key
+    while it is full triggers a flush and waits for room.  Operations whose
+    results depend on the backend, such as the hash operations, ``incr``
+    and the scripted lock operations, first write any queued write of their
+    key, and :meth:`.keys` and :meth:`.delete_pattern` first flush the
+    whole queue.
+
+    Writes still queued when the process exits are lost, as are those of a
+    flush that fails, which is logged;  call :meth:`.flush` at shutdown to
+    write them.  The proxy belongs in front of a :class:`.SerializationProxy`
+    so that the values it holds are those of the region::
+
+        region = make_region().configure(
+            'yosai_dpcache.redis',
+            wrap=[(WriteBehindProxy, 0.05),
+                  (SerializationProxy, sm.serialize, sm.deserialize)]
+        )
+
+    :param flush_interval: the number of seconds that writes are held to
+     collect and coalesce them before a flush
+    :param max_pending: the maximum number of keys with queued writes
+    :param batch_size: the maximum number of writes sent per pipeline
+    """
+
+    def __init__(self, flush_interval=0.05, max_pending=10000,
+                 batch_size=1000):
+        super(WriteBehindProxy, self).__init__()
+        self.flush_interval = flush_interval
+        self.max_pending = max_pending
+        self.batch_size = batch_size
+        # key -> the (method, args) of its latest write
+        self._pending = {}
+        # the writes of the flush in progress
+        self._inflight = {}
+        # the writes being made by _settle, outside of a flush
+        self._settling = {}
+        self._urgent = False
+        self._condition = threading.Condition()
+        self._thread = None
+
+    def _queue(self, key, op):
+        with self._condition:
+            while (key not in self._pending and
+                   len(self._pending) >= self.max_pending):
+                self._urgent = True
+                self._condition.notify_all()
+                self._condition.wait()
+            if not self._pending:
+                self._condition.notify_all()
+            self._pending[key] = op
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run,
+                                                name='WriteBehindProxy')
+                self._thread.daemon = True
+                self._thread.start()
+
+    def _overlay(self, key):
+        """Return (True, value) when key has a queued or inflight write,
+        where a queued delete has the value None, or else (False, None)."""
+        with self._condition:
+            op = (self._pending.get(key) or self._settling.get(key) or
+                  self._inflight.get(key))
+        if op is None:
+            return False, None
+        name, args = op
+        return True, args[1] if name == 'set' else None
+
+    def _settle(self, key):
+        """Write a queued write of key now, after any inflight one."""
+        with self._condition:
+            while key in self._inflight or key in self._settling:
+                self._condition.wait()
+            op = self._pending.pop(key, None)
+            if op is None:
+                return
+            # moved from the queue while the lock is held, so that reads
+            # keep seeing the write until it is made
+            self._settling[key] = op
+            self._condition.notify_all()
+        try:
+            self.proxied.execute_batch([op])
+        finally:
+            with self._condition:
+                del self._settling[key]
+                self._condition.notify_all()
+
+    def flush(self):
+        """Write every queued write, returning once they are written."""
+        with self._condition:
+            while self._pending or self._inflight or self._settling:
+                self._urgent = True
+                self._condition.notify_all()
+                self._condition.wait()
+
+    def _run(self):
+        while True:
+            with self._condition:
+                while not self._pending:
+                    self._condition.wait()
+                if not self._urgent:
+                    self._condition.wait(self.flush_interval)
+                # a queued write mustn't overtake a settling one of its key
+                while self._settling:
+                    self._condition.wait()
+                self._urgent = False
+                self._inflight, self._pending = self._pending, {}
+                # wake writers that wait for room in the queue
+                self._condition.notify_all()
+                ops = list(self._inflight.values())
+
+            try:
+                for i in range(0, len(ops), self.batch_size):
+                    self.proxied.execute_batch(ops[i:i + self.batch_size])
+            except Exception:
+                logger.exception("Failed to write %d queued cache writes",
+                                 len(ops))
+            finally:
+                with self._condition:
+                    self._inflight = {}
+                    self._condition.notify_all()
+
+    def get(self, key):
+        found, value = self._overlay(key)
+        if found:
+            return value
+        return self.proxied.get(key)
+
+    def get_multi(self, keys):
+        overlay = [self._overlay(key) for key in keys]
+        missing = [key for key, (found, _) in zip(keys, overlay) if not found]
+        fetched = dict(zip(missing, self.proxied.get_multi(missing)
+                           if missing else []))
+        return [value if found else fetched[key]
+                for key, (found, value) in zip(keys, overlay)]
+
+    def set(self, key, value, expiration):
+        self._queue(key, ('set', (key, value, expiration)))
+
+    def set_multi(self, mapping, expiration):
+        for key, value in mapping.items():
+            if isinstance(expiration, dict):
+                self.set(key, value, expiration.get(key))
+            else:
+                self.set(key, value, expiration)
+
+    def delete(self, key):
+        self._queue(key, ('delete', (key,)))
+
+    def delete_multi(self, keys):
+        for key in keys:
+            self.delete(key)
+
+    def execute_batch(self, ops):
+        results = [None] * len(ops)
+        sent, positions = [], []
+        for i, (name, args) in enumerate(ops):
+            if name in ('set', 'delete'):
+                getattr(self, name)(*args)
+                continue
+            if name == 'get':
+                found, value = self._overlay(args[0])
+                if found:
+                    results[i] = value
+                    continue
+            else:
+                self._settle(args[0])
+            sent.append((name, args))
+            positions.append(i)
+
+        if sent:
+            for i, value in zip(positions, self.proxied.execute_batch(sent)):
+                results[i] = value
+        return results
+
+    def get_or_lease(self, key):
+        found, value = self._overlay(key)
+        if found and value is not None:
+            return value, None
+        self._settle(key)
+        return self.proxied.get_or_lease(key)
+
+    def set_and_release(self, key, value, expiration, lease):
+        self._settle(key)
+        self.proxied.set_and_release(key, value, expiration, lease)
+
+    def exists(self, key):
+        found, value = self._overlay(key)
+        if found:
+            return value is not None
+        return self.proxied.exists(key)
+
+    def hmget(self, name, keys):
+        self._settle(name)
+        return self.proxied.hmget(name, keys)
+
+    def hmset(self, name, mapping, expiration):
+        self._settle(name)
+        return self.proxied.hmset(name, mapping, expiration)
+
+    def hmget_exists(self, name, keys):
+        self._settle(name)
+        return self.proxied.hmget_exists(name, keys)
+
+    def hupdate(self, name, mapping, deleted=(), expiration=None):
+        self._settle(name)
+        return self.proxied.hupdate(name, mapping, deleted, expiration)
+
+    def hgetall(self, name):
+        self._settle(name)
+        return self.proxied.hgetall(name)
+
+    def incr(self, key):
+        self._settle(key)
+        return self.proxied.incr(key)
+
+    def keys(self, pattern):
+        self.flush()
+        return self.proxied.keys(pattern)
+
+    def iter_keys(self, pattern, count=None):
+        self.flush()
+        return self.proxied.iter_keys(pattern, count)
+
+    def delete_pattern(self, pattern, count=None):
+        self.flush()
+        return self.proxied.delete_pattern(pattern, count)
@@ -0,0 +1,168 @@
+import asyncio
+import time
+
+from .dogpile import NeedRegenerationException, NOT_REGENERATED
+
+
+def fail_creation(future, exc):
+    """Fail the future of a creation that raised exc.  The future of a
+    cancelled creation is cancelled, rather than given the
+    ``CancelledError``, so that the coroutines awaiting it with
+    :func:`.await_creation` race to create the value again instead of being
+    cancelled in turn."""
+    if isinstance(exc, asyncio.CancelledError):
+        future.cancel()
+    else:
+        future.set_exception(exc)
+        # retrieve it, so that a future no coroutine was awaiting isn't
+        # reported as an unhandled exception
+        future.exception()
+
+
+async def await_creation(future):
+    """Await the future of another coroutine's creation, returning its
+    (value, creation_time), or None if that creation was cancelled."""
+    try:
+        return await asyncio.shield(future)
+    except asyncio.CancelledError:
+        if not future.cancelled():
+            # the awaiting coroutine itself is being cancelled
+            raise
+        return None
+
+
+class AsyncMutex(object):
+    """A per-key mutex for coroutines running in a single event loop.
+
+    Rather than waiting to acquire the mutex and then reading the newly
+    created value back from the cache, the coroutines that find a creation
+    in progress await the future of the coroutine that holds the mutex and
+    are handed its result directly.
+
+    :param distributed: Optional.  A mutex that provides coroutine
+     ``acquire(wait)`` and ``release()`` methods, such as a Redis lock,
+     which the holder also acquires so as to coordinate with other
+     processes.
+
+    """
+
+    def __init__(self, distributed=None):
+        self.distributed = distributed
+        self.future = None
+
+    @property
+    def locked(self):
+        return self.future is not None
+
+
+class AsyncLock(object):
+    """asyncio counterpart of the dogpile :class:`.Lock`.
+
+    :param mutex: an :class:`.AsyncMutex`, which is expected to be shared
+     by every :class:`.AsyncLock` for the same key.
+
+    :param creator: Coroutine function which returns a tuple of the form
+     (new_value, creation_time).
+
+    :param value_and_created_fn: Coroutine function which returns
+     a tuple of the form (existing_value, creation_time), or raises
+     :class:`.NeedRegenerationException` if the value is not available.
+
+    :param expiretime: Expiration time in seconds.  Set to
+     ``None`` for never expires.
+
+    Usage::
+
+        async with AsyncLock(mutex, creator, value_and_created_fn) as value:
+            return value
+
+    """
+
+    def __init__(self, mutex, creator, value_and_created_fn, expiretime=None):
+        self.mutex = mutex
+        self.creator = creator
+        self.value_and_created_fn = value_and_created_fn
+        self.expiretime = expiretime
+
+    def _is_expired(self, createdtime):
+        """Return true if the expiration time is reached, or no
+        value is available."""
+
+        return not self._has_value(createdtime) or \
+            (
+                self.expiretime is not None and
+                time.time() - createdtime > self.expiretime
+            )
+
+    def _has_value(self, createdtime):
+        """Return true if the creation function has proceeded
+        at least once."""
+        return createdtime > 0
+
+    async def _enter(self):
+        while True:
+            try:
+                value, createdtime = await self.value_and_created_fn()
+            except NeedRegenerationException:
+                value = NOT_REGENERATED
+                createdtime = -1
+
+            if not self._is_expired(createdtime):
+                return value
+
+            if not self.mutex.locked:
+                break
+
+            # creation in progress within this process
+            if self._has_value(createdtime):
+                return value
+            created = await await_creation(self.mutex.future)
+            if created is not None:
+                return created[0]
+            # its creator was cancelled:  race to create the value again
+
+        future = self.mutex.future = \
+            asyncio.get_event_loop().create_future()
+        try:
+            value, createdtime = await self._enter_create(value, createdtime)
+        except BaseException as exc:
+            fail_creation(future, exc)
+            raise
+        else:
+            future.set_result((value, createdtime))
+            return value
+        finally:
+            self.mutex.future = None
+
+    async def _enter_create(self, value, createdtime):
+        distributed = self.mutex.distributed
+
+        if distributed is not None:
+            if self._has_value(createdtime):
+                if not await distributed.acquire(False):
+                    # creation in progress in another process
+                    return value, createdtime
+            else:
+                await distributed.acquire()
+
+        try:
+            if distributed is not None:
+                # see whether another process created the value already
+                try:
+                    value, createdtime = await self.value_and_created_fn()
+                except NeedRegenerationException:
+                    pass
+                else:
+                    if not self._is_expired(createdtime):
+                        return value, createdtime
+
+            return await self.creator()
+        finally:
+            if distributed is not None:
+                await distributed.release()
+
+    async def __aenter__(self):
+        return await self._enter()
+
+    async def __aexit__(self, type, value, traceback):
+        pass
@@ -27,7 +27,10 @@ class Lock(object):
         any shared state between multiple instances.
 
     :param mutex: A mutex object that provides ``acquire()``
-     and ``release()`` methods.
+     and ``release()`` methods.  A blocking ``acquire()`` may return False
+     to indicate that the creator holding the mutex has finished and handed
+     over its value instead, in which case the mutex is not held and the
+     value is read with value_and_created_fn.
 
     :param creator: Callable which returns a tuple of the form
      (new_value, creation_time).  "new_value" should be a newly
@@ -45,16 +48,40 @@ class Lock(object):
      value is not available, the :class:`.NeedRegenerationException`
      exception should be thrown.
 
+    :param expiretime: Expiration time in seconds.  Set to
+     ``None`` for never expires.  This timestamp is compared
+     to the creation_time result and ``time.time()`` to determine if
+     the value returned by value_and_created_fn is "expired".  An expired
+     value is returned as is to every caller that fails to acquire the
+     mutex without blocking, while the caller that acquires it
+     regenerates the value.
+
+    :param async_creator: A callable.  If specified, this callable will be
+     passed the mutex as an argument and is responsible for releasing the
+     mutex after it finishes some asynchronous value creation.  The intent is
+     for this to be used to defer invocation of the creator callable until
+     some later time.  It is only used when an expired value is present;
+     a missing value is always created synchronously.
+
     """
 
-    def __init__(self, mutex, creator, value_and_created_fn):
+    def __init__(self, mutex, creator, value_and_created_fn, expiretime=None,
+                 async_creator=None):
         self.mutex = mutex
         self.creator = creator
         self.value_and_created_fn = value_and_created_fn
+        self.expiretime = expiretime
+        self.async_creator = async_creator
+
+    def _is_expired(self, createdtime):
+        """Return true if the expiration time is reached, or no
+        value is available."""
 
-    def _no_value(self, createdtime):
-        """Return true if no value is available."""
-        return not self._has_value(createdtime)
+        return not self._has_value(createdtime) or \
+            (
+                self.expiretime is not None and
+                time.time() - createdtime > self.expiretime
+            )
 
     def _has_value(self, createdtime):
         """Return true if the creation function has proceeded
@@ -63,9 +90,8 @@ class Lock(object):
 
     def _enter(self):
         value_fn = self.value_and_created_fn
-        createdtime = 1
         try:
-            value = value_fn()
+            value, createdtime = value_fn()
         except NeedRegenerationException:
             # when cache returns a None value, the cache region raises this
             # log.debug("NeedRegenerationException")
@@ -75,10 +101,11 @@ class Lock(object):
         generated = self._enter_create(createdtime)
 
         if generated is not NOT_REGENERATED:
+            generated, createdtime = generated
             return generated
         elif value is NOT_REGENERATED:
             try:
-                value = value_fn()
+                value, createdtime = value_fn()
                 return value
             except NeedRegenerationException:
                 raise Exception("Generation function should have just been"
@@ -87,35 +114,47 @@ class Lock(object):
             return value
 
     def _enter_create(self, createdtime):
-        if not self._no_value(createdtime):
+        if not self._is_expired(createdtime):
             return NOT_REGENERATED
 
+        run_async = False
+
         if self._has_value(createdtime):
             if not self.mutex.acquire(False):
                 # log.debug("creation function in progress elsewhere, returning")
                 return NOT_REGENERATED
         else:
             # log.debug("no value, waiting for create lock")
-            self.mutex.acquire()
+            if self.mutex.acquire() is False:
+                # the mutex was released by a creator that handed over the
+                # value it created, rather than passed to this thread
+                return NOT_REGENERATED
 
         try:
             # log.debug("value creation lock %r acquired" % self.mutex)
 
             # see whether another thread created the value already
             try:
-                value = self.value_and_created_fn()
+                value, createdtime = self.value_and_created_fn()
             except NeedRegenerationException:
                 pass
             else:
-                # log.debug("value already present")
-                return value
+                if not self._is_expired(createdtime):
+                    # log.debug("value already present")
+                    return value, createdtime
+                elif self.async_creator:
+                    # log.debug("Passing creation lock to async runner")
+                    self.async_creator(self.mutex)
+                    run_async = True
+                    return value, createdtime
 
             # log.debug("Calling creation function")
             created = self.creator()
             return created
         finally:
-            self.mutex.release()
-            # log.debug("Released creation lock")
+            if not run_async:
+                self.mutex.release()
+                # log.debug("Released creation lock")
 
     def __enter__(self):
         return self._enter()
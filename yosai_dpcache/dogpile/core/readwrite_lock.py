@@ -14,14 +14,14 @@ class ReadWriteMutex(object):
     
     The Beaker package also contained a file-lock based version
     of this concept, so that readers/writers could be synchronized
-    across processes with a common filesystem.  A future Dogpile 
-    release may include this additional class at some point.
+    across processes with a common filesystem.  yosai_dpcache provides
+    it as :class:`yosai_dpcache.cache.backends.file.FileLock`.
     
     """
 
     def __init__(self):
         # counts how many asynchronous methods are executing
-        self.async = 0
+        self.async_count = 0
 
         # pointer to thread that is the current sync operation
         self.current_sync_operation = None
@@ -43,7 +43,7 @@ class ReadWriteMutex(object):
                 if self.current_sync_operation is not None:
                     return False
 
-            self.async += 1
+            self.async_count += 1
             log.debug("%s acquired read lock", self)
         finally:
             self.condition.release()
@@ -55,16 +55,16 @@ class ReadWriteMutex(object):
         """Release the 'read' lock."""
         self.condition.acquire()
         try:
-            self.async -= 1
+            self.async_count -= 1
 
             # check if we are the last asynchronous reader thread 
             # out the door.
-            if self.async == 0:
+            if self.async_count == 0:
                 # yes. so if a sync operation is waiting, notifyAll to wake
                 # it up
                 if self.current_sync_operation is not None:
                     self.condition.notifyAll()
-            elif self.async < 0:
+            elif self.async_count < 0:
                 raise LockError("Synchronizer error - too many "
                                 "release_read_locks called")
             log.debug("%s released read lock", self)
@@ -94,7 +94,7 @@ class ReadWriteMutex(object):
             self.current_sync_operation = threading.currentThread()
 
             # now wait again for asyncs to finish
-            if self.async > 0:
+            if self.async_count > 0:
                 if wait:
                     # wait
                     self.condition.wait()